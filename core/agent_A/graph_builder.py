@@ -1,45 +1,89 @@
 from langgraph.graph import StateGraph, END
 
-from core.nodes.identify_brand import identify_brand
-from core.nodes.identify_relevant_tables import identify_relevant_tables
-from core.nodes.load_schema import load_schema
-from core.nodes.enrich_schema import enrich_schema
-from core.nodes.select_schema import select_schema
-from core.nodes.load_table_relationships import load_table_relationships
-from core.nodes.generate_sql_os import generate_sql_os
-from core.nodes.run_sql import run_sql
+from core.nodes.generate_sql_os import generate_sql_os, agenerate_sql_os
+from core.nodes.generate_sql_candidates import make_generate_sql_candidates
+from core.nodes.validate_sql import validate_sql, route_after_validation
+from core.nodes.check_sql_cost import check_sql_cost, acheck_sql_cost, route_after_cost_check
+from core.nodes.run_sql import run_sql, arun_sql
 from core.nodes.log_attempt import log_attempt
-from core.nodes.answer import answer_from_result
+from core.nodes.summarize_result import summarize_result
+from core.nodes.answer import answer_from_result, aanswer_from_result
+from core.nodes.answer_cache import store_answer_cache
 
 from core.state import AgentState
+from core.tracing import traced
+from core.graph_utils import add_context_stages, as_async
 
 
-def build_agent_graph() -> StateGraph:
+def build_agent_graph(parallel: bool = False, sql_candidates: int = 1, candidate_selection: str = "first_valid",
+                      include_answer: bool = True, async_nodes: bool = False,
+                      answer_cache: bool = False) -> StateGraph:
+    """
+    :param parallel: Marken- und Tabellenerkennung sowie Schema-Kette und Beziehungen als parallele Zweige
+    :param sql_candidates: Anzahl parallel generierter SQL-Kandidaten (1 = eine SQL wie bisher)
+    :param candidate_selection: "first_valid" oder "majority" (siehe make_generate_sql_candidates)
+    :param include_answer: False = Graph endet vor der Antwort, z.B. um sie mit stream_answer zu streamen
+    :param async_nodes: Async-Varianten der Nodes (ainvoke, nicht blockierende BigQuery-Jobs); der kompilierte
+                        Graph ist dann nur noch über ainvoke nutzbar
+    :param answer_cache: Antwort-Cache (siehe core.answer_cache): Treffer beenden den Graphen nach identify_brand,
+                         erfolgreiche Antworten werden nach answer_from_result gespeichert
+    """
     graph = StateGraph(AgentState)
+    make_async = as_async if async_nodes else (lambda node: node)
+    generate = agenerate_sql_os if async_nodes else generate_sql_os
+    generate_node = "generate_sql_os" if sql_candidates <= 1 else "generate_sql_candidates"
     
-    # Nodes hinzufügen
-    graph.add_node("identify_brand", identify_brand)
-    graph.add_node("identify_relevant_tables", identify_relevant_tables)
-    graph.add_node("load_schema", load_schema)
-    graph.add_node("enrich_schema", enrich_schema)
-    graph.add_node("select_schema", select_schema)
-    graph.add_node("load_table_relationships", load_table_relationships)
-    graph.add_node("generate_sql_os", generate_sql_os)
-    graph.add_node("run_sql", run_sql)
-    graph.add_node("log_attempt", log_attempt)
-    graph.add_node("answer_from_result", answer_from_result)
+    # Nodes hinzufügen (jeder Node wird für das Tracing umhüllt)
+    if sql_candidates <= 1:
+        graph.add_node("generate_sql_os", traced("generate_sql_os", generate))
+        graph.add_node("validate_sql", traced("validate_sql", make_async(validate_sql)))
+        graph.add_node("check_sql_cost", traced("check_sql_cost", acheck_sql_cost if async_nodes else check_sql_cost))
+    else:
+        # Kandidaten werden im Node selbst validiert und per Dry-Run geprüft
+        graph.add_node("generate_sql_candidates", traced(
+            "generate_sql_candidates", make_generate_sql_candidates(generate, sql_candidates, candidate_selection)))
+    graph.add_node("run_sql", traced("run_sql", arun_sql if async_nodes else run_sql))
+    graph.add_node("log_attempt", traced("log_attempt", make_async(log_attempt)))
+    graph.add_node("summarize_result", traced("summarize_result", make_async(summarize_result)))
+    if include_answer:
+        graph.add_node("answer_from_result", traced(
+            "answer_from_result", aanswer_from_result if async_nodes else answer_from_result))
+        if answer_cache:
+            graph.add_node("store_answer_cache", traced("store_answer_cache", make_async(store_answer_cache)))
     
+    # Kontext-Nodes (Marke, Tabellen, Schema, Beziehungen) samt Edges bis zur SQL-Generierung
+    add_context_stages(graph, generate_node, parallel=parallel, async_nodes=async_nodes,
+                       answer_cache=answer_cache)
+
     # Edges definieren
-    graph.set_entry_point("identify_brand")
-    graph.add_edge("identify_brand", "identify_relevant_tables")
-    graph.add_edge("identify_relevant_tables", "load_schema")
-    graph.add_edge("load_schema", "enrich_schema")
-    graph.add_edge("enrich_schema", "select_schema")
-    graph.add_edge("select_schema", "load_table_relationships")
-    graph.add_edge("load_table_relationships", "generate_sql_os")
-    graph.add_edge("generate_sql_os", "run_sql")
+    if sql_candidates <= 1:
+        graph.add_edge("generate_sql_os", "validate_sql")
+
+        # Statische SQL-Prüfung gegen schema.json: ungültige SQL wird nicht an BigQuery geschickt
+        graph.add_conditional_edges("validate_sql", route_after_validation, {
+            "valid": "check_sql_cost",
+            "invalid": "log_attempt"
+        })
+
+    # Dry-Run-Kostenprüfung: abgelehnte SQL wird nicht ausgeführt, sondern direkt geloggt
+    if sql_candidates > 1 and candidate_selection == "majority":
+        # Mehrheitswahl hat den gewählten Kandidaten bereits ausgeführt und das Ergebnis übernommen
+        graph.add_edge(generate_node, "log_attempt")
+    else:
+        graph.add_conditional_edges("check_sql_cost" if sql_candidates <= 1 else generate_node, route_after_cost_check, {
+            "run": "run_sql",
+            "rejected": "log_attempt"
+        })
     graph.add_edge("run_sql", "log_attempt")
-    graph.add_edge("log_attempt", "answer_from_result")
-    graph.add_edge("answer_from_result", END)
+
+    # Ergebnis zusammenfassen (Kennzahlen statt der ersten Zeilen), dann Antwort
+    graph.add_edge("log_attempt", "summarize_result")
+    if include_answer:
+        graph.add_edge("summarize_result", "answer_from_result")
+        graph.add_edge("answer_from_result", "store_answer_cache" if answer_cache else END)
+    else:
+        graph.add_edge("summarize_result", END)
+    if include_answer and answer_cache:
+        graph.add_edge("store_answer_cache", END)
     
-    return graph
\ No newline at end of file
+    return graph
@@ -1,102 +1,48 @@
-from core.agent_A.graph_builder import build_agent_graph
+from core.batch import arun_questions, get_agent, get_default_llm, iter_questions, run_questions, stream_question
+from core.llm_cache import CachingLLM
 from core.logger import EvalLogger
-from core.state import AgentState
-from langchain_core.messages import HumanMessage
-from typing import List, Dict
-from core.llm_setup import get_llm
+from typing import Any, Iterator, List, Dict, Optional
 
-llm = get_llm()
 
-def run_batch_questions(questions: List[str], append_logs: bool = True, agent_id: str = "agent_A") -> List[Dict]:
+def __getattr__(name: str):
+    # runner.llm bleibt verfügbar, wird aber erst beim ersten Zugriff erzeugt
+    if name == "llm":
+        return get_default_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _state_llm(llm_cache_mode: Optional[str]) -> Any:
+    # LLM ggf. mit persistentem Antwort-Cache umhüllen
+    llm = get_default_llm()
+    return CachingLLM(llm, mode=llm_cache_mode) if llm_cache_mode else llm
+
+
+def run_batch_questions(questions: List[str], append_logs: bool = True, agent_id: str = "agent_A", max_workers: int = 1,
+                        llm_cache_mode: Optional[str] = None, parallel: bool = False,
+                        sql_candidates: int = 1, candidate_selection: str = "first_valid",
+                        answer_cache: bool = False) -> List[Dict]:
     """
-    Führt eine Liste von Fragen nacheinander durch den Agenten.
+    Führt eine Liste von Fragen durch den Agenten.
     
     :param questions: Liste von Nutzerfragen
     :param append_logs: Ob die Logs nach Abschluss gespeichert werden sollen
-    :return: Liste von Dictionaries mit Frage und Antwort
+    :param max_workers: Anzahl gleichzeitig bearbeiteter Fragen (1 = nacheinander)
+    :param llm_cache_mode: "read_through", "record_only" oder "bypass" für den LLM-Antwort-Cache (None = ohne Cache)
+    :param parallel: Graph mit parallelen Zweigen (siehe build_agent_graph)
+    :param sql_candidates: Anzahl parallel generierter SQL-Kandidaten (siehe build_agent_graph)
+    :param candidate_selection: "first_valid" oder "majority"; "majority" führt jeden gültigen Kandidaten
+        auf dem Warehouse aus (bis zu sql_candidates Abfragen und entsprechende Kosten pro Frage)
+    :param answer_cache: Antwort-Cache für wiederkehrende Fragen (siehe core.answer_cache)
+    :return: Liste von Dictionaries mit Frage und Antwort (in der Reihenfolge der Fragen)
     """
     # Logging-Instanz
     eval_logger = EvalLogger(agent_id=agent_id)
-    #print(f"🔍 Logger agent_id: {eval_logger.agent_id}")
-
-    # Graph aufbauen und kompilieren
-    graph = build_agent_graph()
-    agent = graph.compile()
-
-    results = []
-
-    for i, question in enumerate(questions, start=1):
-        print(f"\n🔹 Frage {i}/{len(questions)}")
-
-        # Initialer State
-        state: AgentState = {
-            "messages": [HumanMessage(content=question)],
-             # SQL-Informationen
-            "sql_query": "",
-            "sql_result": "",
-            "generated_sql": "",
-            "sql_analyse": None,  # Neu hinzugefügt
-            "sql_failed": False,
-            "sql_error_type": "",  # Hinzugefügt
-            "prev_sql_error": None,
-            "prev_sql": None,
-            
-            # Marken- / Schema-Infos
-            "brand": [],
-            "schema": [],  # Korrekt: Liste statt String
-            "relevant_tables": [],
-            "bq_tables": [],  # Hinzugefügt
-            "bq_base_tables": [],  # Hinzugefügt
-            
-            # LLM
-            "llm": llm,
-            
-            # Beziehungs-Informationen
-            "relationship_info": [],
-            
-            # Angereicherte Schema-Daten
-            "enriched_schema": [],
-            "selected_schema": [],
-            
-            # Antworten
-            "natural_answer": "",  # Hinzugefügt
-            "agent_id": agent_id,
-            
-            # Retry-Infos
-            "retry_count": 0,
-        }
-
-        try:
-            # Logging starten
-            eval_logger.start_session(question)
-
-            # Agent ausführen
-            state = agent.invoke(state)
-
-            # Antwort aus State abrufen
-            natural_answer = state.get("natural_answer", "Keine Antwort generiert.")
-
-            results.append({
-                "question": question,
-                "answer": natural_answer,
-                "sql_failed": state.get("sql_failed", False),
-                "sql_query": state.get("sql_query", ""),
-                "sql_result": state.get("sql_result", "")
-            })
-
-            # Logging beenden
-            eval_logger.end_session()
-
-        except Exception as e:
-            print(f"❌ Fehler bei der Ausführung der Frage '{question}': {e}")
-            eval_logger.end_session()
-            results.append({
-                "question": question,
-                "answer": f"Fehler: {e}",
-                "sql_failed": True,
-                "sql_query": "",
-                "sql_result": ""
-            })
+
+    # Kompilierten Graphen holen (wird pro Prozess nur einmal gebaut)
+    agent = get_agent("A", parallel=parallel, sql_candidates=sql_candidates,
+                      candidate_selection=candidate_selection, answer_cache=answer_cache)
+
+    results = run_questions(agent, questions, _state_llm(llm_cache_mode), agent_id, max_workers=max_workers)
 
     # Logs speichern
     if append_logs:
@@ -105,3 +51,57 @@ def run_batch_questions(questions: List[str], append_logs: bool = True, agent_id
 
     return results
 
+
+def iter_batch_questions(questions: List[str], append_logs: bool = True, agent_id: str = "agent_A", max_workers: int = 1,
+                         llm_cache_mode: Optional[str] = None, parallel: bool = False,
+                         sql_candidates: int = 1, answer_cache: bool = False) -> Iterator[Dict]:
+    """
+    Wie run_batch_questions, liefert aber jedes Ergebnis (samt "index" und geloggten "attempts"),
+    sobald seine Frage fertig ist. Die Logs werden gespeichert, wenn alle Ergebnisse gelesen wurden
+    oder der Aufrufer vorher abbricht (z.B. break in der Schleife): dann mit allen bis dahin fertigen Fragen.
+    """
+    eval_logger = EvalLogger(agent_id=agent_id)
+    agent = get_agent("A", parallel=parallel, sql_candidates=sql_candidates, answer_cache=answer_cache)
+
+    try:
+        yield from iter_questions(agent, questions, _state_llm(llm_cache_mode), agent_id, max_workers=max_workers)
+    finally:
+        if append_logs:
+            eval_logger.to_csv(append=True)
+            eval_logger.to_json(append=True)
+
+
+def stream_answer(question: str, append_logs: bool = True, agent_id: str = "agent_A",
+                  llm_cache_mode: Optional[str] = None, parallel: bool = False, sql_candidates: int = 1,
+                  answer_cache: bool = False) -> Iterator[str]:
+    """
+    Beantwortet eine Frage und liefert die Antwort stückweise, sobald das LLM sie erzeugt.
+    Die Session wird gespeichert, sobald der Stream endet (auch bei vorzeitigem Abbruch).
+    """
+    eval_logger = EvalLogger(agent_id=agent_id)
+    agent = get_agent("A", parallel=parallel, sql_candidates=sql_candidates, answer_cache=answer_cache, include_answer=False)
+    try:
+        yield from stream_question(agent, question, _state_llm(llm_cache_mode), agent_id, eval_logger)
+    finally:
+        if append_logs:
+            eval_logger.to_csv(append=True)
+            eval_logger.to_json(append=True)
+
+
+async def arun_batch_questions(questions: List[str], append_logs: bool = True, agent_id: str = "agent_A",
+                               max_concurrency: int = 50, llm_cache_mode: Optional[str] = None,
+                               parallel: bool = False, sql_candidates: int = 1, answer_cache: bool = False) -> List[Dict]:
+    """
+    Async-Variante von run_batch_questions: alle Fragen teilen sich einen Event-Loop (Async-Nodes),
+    höchstens max_concurrency gleichzeitig. In Notebooks mit laufendem Loop: await arun_batch_questions(...)
+    """
+    eval_logger = EvalLogger(agent_id=agent_id)
+    agent = get_agent("A", parallel=parallel, sql_candidates=sql_candidates, answer_cache=answer_cache, async_nodes=True)
+
+    results = await arun_questions(agent, questions, _state_llm(llm_cache_mode), agent_id, max_concurrency=max_concurrency)
+
+    if append_logs:
+        eval_logger.to_csv(append=True)
+        eval_logger.to_json(append=True)
+
+    return results
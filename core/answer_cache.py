@@ -0,0 +1,98 @@
+import re
+import threading
+import unicodedata
+from datetime import date
+from typing import Iterable, Optional
+
+from core.cache import LRUCache, SQLiteCache
+
+
+def normalize_question(question: str) -> str:
+    """
+    Kanonische Form einer Nutzerfrage für den Cache-Schlüssel:
+    Unicode-normalisiert (NFKC), klein geschrieben, Whitespace zusammengefasst,
+    ohne Satzzeichen am Ende ("Wie viele Nutzer?" == "wie viele  nutzer").
+    """
+    text = unicodedata.normalize("NFKC", question or "").lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?!.… ").strip()
+
+
+def date_bucket(day: date, window_days: int = 1) -> str:
+    """
+    Zeitfenster, in dem eine Antwort gültig bleibt: die SQL-Prompts enthalten das heutige Datum,
+    Fragen wie "gestern" hängen also vom Tag ab. window_days=1 -> pro Kalendertag.
+    """
+    return str(day.toordinal() // max(1, window_days))
+
+
+class AnswerCache:
+    """
+    Cache für komplette Antworten (finale SQL, Ergebnis, natural_answer) pro Frage.
+    Schlüssel: normalisierte Frage, sortierte Marken, agent_id und Datumsfenster.
+    Mit path wird eine SQLite-Datei verwendet, sonst ein In-Memory-LRU (jeweils mit TTL).
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[float] = 24 * 3600,
+                 path: Optional[str] = None, date_window_days: int = 1):
+        if path:
+            self.backend = SQLiteCache(path, max_entries=max_entries, ttl_seconds=ttl_seconds)
+        else:
+            self.backend = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.date_window_days = date_window_days
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, question: str, brands: Iterable[str], agent_id: str, day: Optional[date] = None) -> str:
+        bucket = date_bucket(day or date.today(), self.date_window_days)
+        return "|".join([agent_id or "", ",".join(sorted(set(brands or []))), bucket, normalize_question(question)])
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self.backend.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, key: str, entry: dict):
+        self.backend.set(key, entry)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """Trefferstatistik: wie viele Fragen ohne LLM- und Warehouse-Aufrufe beantwortet wurden."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self.backend),
+            }
+
+
+_answer_cache: Optional[AnswerCache] = AnswerCache()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Gibt den prozessweiten Antwort-Cache zurück (None, wenn deaktiviert)."""
+    return _answer_cache
+
+
+def configure_answer_cache(enabled: bool = True, max_entries: int = 1000, ttl_seconds: Optional[float] = 24 * 3600,
+                           path: Optional[str] = None, date_window_days: int = 1) -> Optional[AnswerCache]:
+    """
+    Ersetzt den prozessweiten Antwort-Cache, z.B. persistent und eine Woche gültig:
+    configure_answer_cache(path="output/answer_cache.sqlite", ttl_seconds=7 * 24 * 3600, date_window_days=7)
+    Genutzt wird er nur von Graphen mit build_agent_graph(answer_cache=True).
+    """
+    global _answer_cache
+    _answer_cache = AnswerCache(max_entries=max_entries, ttl_seconds=ttl_seconds, path=path,
+                                date_window_days=date_window_days) if enabled else None
+    return _answer_cache
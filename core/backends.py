@@ -0,0 +1,378 @@
+import abc
+import asyncio
+import glob
+import os
+import re
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd  # wird erst bei der ersten Abfrage importiert
+
+PROJECT_ID = "hier der projektname!" #korrekten namen für verbindung zu bq einfüllen
+DATASET = "bachelor_mlh"
+
+
+class ExecutionBackend(abc.ABC):
+    """
+    Schnittstelle für die SQL-Ausführung, an die run_sql und check_sql_cost delegieren.
+    execute liefert (frame, total_rows, bytes_processed), dry_run die geschätzten Bytes.
+    aexecute/adry_run sind die awaitable Varianten; standardmäßig laufen execute/dry_run in einem Worker-Thread.
+    """
+
+    name = "base"
+
+    @property
+    def cache_namespace(self) -> str:
+        """Namensraum im SQL-Cache; Backends mit anderen Daten (Projekt, Fixtures) dürfen keine Ergebnisse teilen."""
+        return self.name
+
+    @abc.abstractmethod
+    def execute(self, sql: str, max_rows: int) -> tuple["pd.DataFrame", int, Optional[int]]:
+        ...
+
+    async def aexecute(self, sql: str, max_rows: int) -> tuple["pd.DataFrame", int, Optional[int]]:
+        return await asyncio.to_thread(self.execute, sql, max_rows)
+
+    @abc.abstractmethod
+    def dry_run(self, sql: str) -> int:
+        ...
+
+    async def adry_run(self, sql: str) -> int:
+        return await asyncio.to_thread(self.dry_run, sql)
+
+
+class BigQueryBackend(ExecutionBackend):
+    """
+    Ausführung auf BigQuery. Alle Threads teilen sich einen Client (und damit Credentials und
+    Verbindungspool), erzeugt erst bei der ersten Abfrage bzw. in warm_up.
+    Jobs werden abgeschickt (submit) und erst beim Abholen (fetch) abgewartet; aexecute pollt den Job
+    mit wachsendem Intervall, ohne einen Thread für die gesamte Laufzeit zu blockieren.
+    :param priority: "INTERACTIVE" oder "BATCH"
+    :param labels: Job-Labels, z.B. {"app": "text_to_sql"}
+    :param maximum_bytes_billed: harte Obergrenze pro Job, BigQuery bricht darüber ab
+    :param client_factory: erzeugt einen Client aus dem Projektnamen (z.B. einen Fake für Offline-Läufe)
+    """
+
+    name = "bigquery"
+    page_size = 500       # Zeilen pro API-Seite beim Abholen
+    poll_initial = 0.1    # erstes Poll-Intervall in Sekunden
+    poll_max = 2.0        # größtes Poll-Intervall in Sekunden
+    poll_factor = 1.5
+
+    def __init__(self, project: str = PROJECT_ID, priority: str = "INTERACTIVE", labels: Optional[dict] = None,
+                 maximum_bytes_billed: Optional[int] = None, client_factory: Optional[Callable[[str], Any]] = None):
+        self.project = project
+        self.priority = priority
+        self.labels = labels or {}
+        self.maximum_bytes_billed = maximum_bytes_billed
+        self.client_factory = client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}:{self.project}"
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    if self.client_factory is not None:
+                        self._client = self.client_factory(self.project)
+                    else:
+                        from google.cloud import bigquery
+                        self._client = bigquery.Client(project=self.project)
+        return self._client
+
+    def job_config(self, dry_run: bool = False):
+        """
+        QueryJobConfig mit den Job-Einstellungen des Backends. Ist google-cloud-bigquery nicht installiert
+        und ein client_factory gesetzt (Fake-Client), genügt ein Objekt mit denselben Attributen.
+        """
+        if dry_run:
+            settings = {"dry_run": True, "use_query_cache": False, "labels": self.labels}
+        else:
+            settings = {"priority": self.priority, "labels": self.labels}
+            if self.maximum_bytes_billed is not None:
+                # None würde QueryJobConfig als Text "None" übernehmen
+                settings["maximum_bytes_billed"] = self.maximum_bytes_billed
+
+        try:
+            from google.cloud import bigquery
+        except ImportError:
+            if self.client_factory is None:
+                raise
+            return SimpleNamespace(**settings)
+        return bigquery.QueryJobConfig(**settings)
+
+    def submit(self, sql: str):
+        """Schickt die Abfrage ab und gibt sofort den laufenden Job zurück."""
+        return self.client.query(sql, job_config=self.job_config())
+
+    def fetch(self, query_job, max_rows: int) -> tuple["pd.DataFrame", int, Optional[int]]:
+        """Wartet auf den Job und holt höchstens max_rows Zeilen seitenweise ab (Spaltentypen laut BigQuery-Schema)."""
+        import pandas as pd
+
+        row_iterator = query_job.result(page_size=self.page_size, max_results=max_rows)
+        columns = [field.name for field in row_iterator.schema]
+
+        records = []
+        for page in row_iterator.pages:
+            records.extend(tuple(row.values()) for row in page)
+
+        frame = _typed_frame(pd.DataFrame.from_records(records, columns=columns), row_iterator.schema)
+        total_rows = row_iterator.total_rows if row_iterator.total_rows is not None else len(frame)
+        return frame, total_rows, query_job.total_bytes_processed
+
+    def execute(self, sql: str, max_rows: int) -> tuple["pd.DataFrame", int, Optional[int]]:
+        return self.fetch(self.submit(sql), max_rows)
+
+    async def aexecute(self, sql: str, max_rows: int, timeout: Optional[float] = None) -> tuple["pd.DataFrame", int, Optional[int]]:
+        """Schickt den Job ab und pollt job.done() mit Backoff; bei Timeout wird der Job abgebrochen."""
+        query_job = await asyncio.to_thread(self.submit, sql)
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        interval = self.poll_initial
+
+        while not await asyncio.to_thread(query_job.done):
+            if deadline is not None and loop.time() >= deadline:
+                await asyncio.to_thread(query_job.cancel)
+                raise TimeoutError(f"BigQuery-Job {getattr(query_job, 'job_id', '')} nach {timeout}s abgebrochen")
+            await asyncio.sleep(interval)
+            interval = min(interval * self.poll_factor, self.poll_max)
+
+        return await asyncio.to_thread(self.fetch, query_job, max_rows)
+
+    def dry_run(self, sql: str) -> int:
+        query_job = self.client.query(sql, job_config=self.job_config(dry_run=True))
+        return query_job.total_bytes_processed or 0
+
+
+# BigQuery-Feldtyp -> pandas-Typ (nullable, damit NULLs den Typ nicht ändern)
+_BQ_PANDAS_TYPES = {
+    "INTEGER": "Int64", "INT64": "Int64",
+    "FLOAT": "float64", "FLOAT64": "float64",
+    "NUMERIC": "float64", "BIGNUMERIC": "float64",  # Decimal -> float (für Kennzahlen genau genug)
+    "BOOLEAN": "boolean", "BOOL": "boolean",
+    "DATE": "datetime64[ns]", "DATETIME": "datetime64[ns]",
+}
+
+
+def _typed_frame(frame: "pd.DataFrame", schema) -> "pd.DataFrame":
+    """Wandelt die Spalten anhand des BigQuery-Schemas in feste pandas-Typen (ARRAY/STRUCT bleiben Objekte)."""
+    import pandas as pd
+
+    for field in schema:
+        field_type = (getattr(field, "field_type", None) or "").upper()
+        if getattr(field, "mode", None) == "REPEATED" or field.name not in frame:
+            continue
+        try:
+            if field_type == "TIMESTAMP":
+                frame[field.name] = pd.to_datetime(frame[field.name], utc=True)
+            elif field_type in ("DATE", "DATETIME"):
+                frame[field.name] = pd.to_datetime(frame[field.name])
+            elif field_type in ("NUMERIC", "BIGNUMERIC"):
+                frame[field.name] = pd.to_numeric(frame[field.name], errors="coerce")
+            elif field_type in _BQ_PANDAS_TYPES:
+                frame[field.name] = frame[field.name].astype(_BQ_PANDAS_TYPES[field_type])
+        except (TypeError, ValueError, OverflowError):
+            continue  # z.B. DATE außerhalb des pandas-Bereichs: Spalte bleibt unverändert
+    return frame
+
+
+# --- BigQuery -> DuckDB Dialekt-Shim ---
+
+_DATE_PARTS = r"(DAY|WEEK|MONTH|QUARTER|YEAR)"
+_BQ_TYPES = {"INT64": "BIGINT", "FLOAT64": "DOUBLE", "NUMERIC": "DECIMAL(38, 9)", "BOOL": "BOOLEAN", "STRING": "VARCHAR"}
+
+_DUCKDB_MACROS = [
+    "CREATE OR REPLACE MACRO safe_divide(a, b) AS CASE WHEN b = 0 THEN NULL ELSE a / b END",
+    "CREATE OR REPLACE MACRO format_date(fmt, d) AS strftime(d, fmt)",
+    "CREATE OR REPLACE MACRO parse_date(fmt, s) AS CAST(strptime(s, fmt) AS DATE)",
+]
+
+
+def translate_bigquery_sql(sql: str, wildcard_tables: dict) -> str:
+    """
+    Übersetzt die von den Agenten erzeugte BigQuery-SQL in DuckDB-SQL.
+    :param wildcard_tables: Wildcard-Name (bachelor_mlh.base_*suffix) -> [(Tabellenname, _TABLE_SUFFIX)]
+    """
+    def replace_backticks(match):
+        parts = match.group(1).split(".")
+        if len(parts) > 2:  # projekt.dataset.tabelle -> dataset.tabelle
+            parts = parts[-2:]
+        name = ".".join(parts)
+        if name in wildcard_tables:
+            if not wildcard_tables[name]:
+                raise ValueError(f"Keine Tabellen für Wildcard {name} vorhanden")
+            selects = " UNION ALL BY NAME ".join(
+                f"SELECT *, '{suffix}' AS _TABLE_SUFFIX FROM {DATASET}.\"{table}\""
+                for table, suffix in wildcard_tables[name]
+            )
+            return f"({selects})"
+        return ".".join(f'"{part}"' for part in parts)
+
+    sql = re.sub(r"`([^`]*)`", replace_backticks, sql)
+
+    # DATE_SUB/DATE_ADD(x, INTERVAL n TEIL) -> CAST(x -/+ INTERVAL n TEIL AS DATE)
+    sql = re.sub(
+        rf"\bDATE_(SUB|ADD)\(\s*(.+?)\s*,\s*INTERVAL\s+(-?\d+)\s+{_DATE_PARTS}\s*\)",
+        lambda m: f"CAST(({m.group(2)}) {'-' if m.group(1).upper() == 'SUB' else '+'} INTERVAL {m.group(3)} {m.group(4)} AS DATE)",
+        sql, flags=re.IGNORECASE
+    )
+    # DATE_TRUNC(x, TEIL) -> date_trunc('teil', x)
+    sql = re.sub(
+        rf"\bDATE_TRUNC\(\s*(.+?)\s*,\s*{_DATE_PARTS}\s*\)",
+        lambda m: f"CAST(date_trunc('{m.group(2).lower()}', {m.group(1)}) AS DATE)",
+        sql, flags=re.IGNORECASE
+    )
+    # DATE_DIFF(a, b, TEIL) -> date_diff('teil', b, a)
+    sql = re.sub(
+        rf"\bDATE_DIFF\(\s*(.+?)\s*,\s*(.+?)\s*,\s*{_DATE_PARTS}\s*\)",
+        lambda m: f"date_diff('{m.group(3).lower()}', {m.group(2)}, {m.group(1)})",
+        sql, flags=re.IGNORECASE
+    )
+    sql = re.sub(r"\bSAFE_CAST\(", "TRY_CAST(", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bCOUNTIF\(", "count_if(", sql, flags=re.IGNORECASE)
+    sql = re.sub(
+        r"\bAS\s+(INT64|FLOAT64|NUMERIC|BOOL|STRING)\b",
+        lambda m: f"AS {_BQ_TYPES[m.group(1).upper()]}",
+        sql, flags=re.IGNORECASE
+    )
+    return sql
+
+
+class DuckDBBackend(ExecutionBackend):
+    """
+    Lokale Ausführung auf DuckDB mit Fixture-Daten in der Form der bachelor_mlh-Tabellen.
+    Fixtures sind CSV- oder Parquet-Dateien namens <base>_<brand><suffix>.csv|.parquet im fixture_dir,
+    alternativ per add_table() aus einem DataFrame. Wildcard-Tabellen (bachelor_mlh.<base>_*<suffix>)
+    werden auf die passenden Fixture-Tabellen mit _TABLE_SUFFIX-Spalte abgebildet.
+    """
+
+    name = "duckdb"
+
+    def __init__(self, fixture_dir: Optional[str] = None, database: str = ":memory:"):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("Für das lokale Backend wird das Paket 'duckdb' benötigt (pip install duckdb).") from e
+
+        self._conn = duckdb.connect(database)
+        self._lock = threading.Lock()
+        if database == ":memory:":
+            # per add_table befüllte In-Memory-Datenbanken unterscheiden sich je Instanz
+            source = f"memory-{id(self):x}"
+        else:
+            source = os.path.abspath(database)
+        self._cache_namespace = f"{self.name}:{source}:{os.path.abspath(fixture_dir) if fixture_dir else ''}"
+        self._conn.execute(f"CREATE SCHEMA IF NOT EXISTS {DATASET}")
+        for macro in _DUCKDB_MACROS:
+            self._conn.execute(macro)
+
+        if fixture_dir:
+            for path in sorted(glob.glob(os.path.join(fixture_dir, "*.csv")) + glob.glob(os.path.join(fixture_dir, "*.parquet"))):
+                table_name, ext = os.path.splitext(os.path.basename(path))
+                reader = "read_parquet" if ext == ".parquet" else "read_csv_auto"
+                self._conn.execute(
+                    f"CREATE OR REPLACE TABLE {DATASET}.\"{table_name}\" AS SELECT * FROM {reader}(?)", [path]
+                )
+
+    @property
+    def cache_namespace(self) -> str:
+        return self._cache_namespace
+
+    def add_table(self, table_name: str, frame: "pd.DataFrame"):
+        """Legt bachelor_mlh.<table_name> aus einem DataFrame an (z.B. für Tests)."""
+        with self._lock:
+            self._conn.register("_fixture_frame", frame)
+            self._conn.execute(f"CREATE OR REPLACE TABLE {DATASET}.\"{table_name}\" AS SELECT * FROM _fixture_frame")
+            self._conn.unregister("_fixture_frame")
+
+    def table_names(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT table_name FROM information_schema.tables WHERE table_schema = ?", [DATASET]
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _wildcard_tables(self, sql: str) -> dict:
+        """Wildcard-Namen aus der SQL -> passende Fixture-Tabellen samt _TABLE_SUFFIX-Wert."""
+        wildcard_tables = {}
+        names = self.table_names()
+        for prefix, suffix in re.findall(rf"`(?:[\w-]+\.)?{DATASET}\.(\w*)\*(\w*)`", sql):
+            pattern = re.compile(rf"^{re.escape(prefix)}(\w+?){re.escape(suffix)}$")
+            matches = [(name, m.group(1)) for name in names for m in [pattern.match(name)] if m]
+            wildcard_tables[f"{DATASET}.{prefix}*{suffix}"] = matches
+        return wildcard_tables
+
+    def translate(self, sql: str) -> str:
+        return translate_bigquery_sql(sql, self._wildcard_tables(sql))
+
+    def execute(self, sql: str, max_rows: int) -> tuple["pd.DataFrame", int, Optional[int]]:
+        translated = self.translate(sql).strip().rstrip(";")
+        with self._lock:
+            cursor = self._conn.cursor()
+        import pandas as pd
+
+        try:
+            # typisierte Chunks (je 2048 Zeilen) bis max_rows, statt Tupel-Zeilen
+            cursor.execute(translated)
+            chunks, fetched = [], 0
+            while not chunks or fetched < max_rows:
+                chunk = cursor.fetch_df_chunk()
+                if chunk.empty:
+                    chunks = chunks or [chunk]  # leeres Ergebnis behält Spalten und Typen
+                    break
+                chunks.append(chunk)
+                fetched += len(chunk)
+            frame = (pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]).head(max_rows)
+
+            # Gesamtzahl nur bei abgeschnittenem Ergebnis per COUNT(*) ermitteln, statt die Zeilen abzuholen
+            total_rows = len(frame)
+            if fetched >= max_rows:
+                total_rows = cursor.execute(f"SELECT COUNT(*) FROM ({translated}) AS _counted").fetchone()[0]
+        finally:
+            cursor.close()
+
+        return frame, total_rows, None
+
+    def dry_run(self, sql: str) -> int:
+        """Grobe Schätzung: Zeilen x Spalten x 8 Byte aller referenzierten Tabellen (Syntax wird per EXPLAIN geprüft)."""
+        translated = self.translate(sql).strip().rstrip(";")
+        with self._lock:
+            cursor = self._conn.cursor()
+        try:
+            cursor.execute(f"EXPLAIN {translated}")
+            estimate = 0
+            for table_name in self.table_names():
+                if re.search(rf"\b{re.escape(table_name)}\b", translated):
+                    rows = cursor.execute(f"SELECT COUNT(*) FROM {DATASET}.\"{table_name}\"").fetchone()[0]
+                    cols = len(cursor.execute(f"SELECT * FROM {DATASET}.\"{table_name}\" LIMIT 0").description)
+                    estimate += rows * cols * 8
+        finally:
+            cursor.close()
+        return estimate
+
+
+_backend: Optional[ExecutionBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> ExecutionBackend:
+    """Gibt das aktive Ausführungs-Backend zurück (standardmäßig BigQuery)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = BigQueryBackend()
+    return _backend
+
+
+def set_backend(backend: ExecutionBackend):
+    """Setzt das Ausführungs-Backend, z.B. set_backend(DuckDBBackend("fixtures/")) für Offline-Läufe."""
+    global _backend
+    _backend = backend
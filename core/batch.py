@@ -0,0 +1,313 @@
+import asyncio
+import contextvars
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.messages import HumanMessage
+
+from core.logger import EvalLogger
+from core.nodes.answer import stream_answer
+from core.nodes.answer_cache import store_answer_cache
+from core.state import AgentState
+from core.tracing import traced_stream
+
+_default_llm = None
+_compiled_agents: Dict[tuple, Any] = {}
+_init_lock = threading.Lock()
+
+
+def get_default_llm() -> Any:
+    """Erzeugt das Standard-LLM (core.llm_setup.get_llm) beim ersten Aufruf und gibt danach dieselbe Instanz zurück."""
+    global _default_llm
+    if _default_llm is None:
+        with _init_lock:
+            if _default_llm is None:
+                from core.llm_setup import get_llm
+                _default_llm = get_llm()
+    return _default_llm
+
+
+def get_agent(variant: str, **options) -> Any:
+    """
+    Gibt den kompilierten Graphen von agent_<variant> zurück; pro Variante und Builder-Optionen
+    wird nur einmal gebaut und kompiliert.
+    """
+    key = (variant, tuple(sorted(options.items())))
+    if key not in _compiled_agents:
+        with _init_lock:
+            if key not in _compiled_agents:
+                graph_builder = importlib.import_module(f"core.agent_{variant}.graph_builder")
+                _compiled_agents[key] = graph_builder.build_agent_graph(**options).compile()
+    return _compiled_agents[key]
+
+
+def warm_up(variant: str, llm: bool = True, backend: bool = True, **options) -> Dict[str, float]:
+    """
+    Lädt vorab Kontext-Dateien und Suchindizes, kompiliert den Graphen und baut LLM- und
+    Backend-Verbindung auf, damit die erste Frage nicht die Startkosten trägt.
+    Gibt die Dauer der einzelnen Schritte in Sekunden zurück.
+    """
+    from core.backends import get_backend
+    from core.context_store import get_context_store
+    from core.retrieval import build_indexes
+
+    timings = {}
+
+    start = time.perf_counter()
+    store = get_context_store()
+    store.table_lookup()
+    store.schema_lookup()
+    store.attribute_lookup()
+    store.joins_by_table()
+    store.join_graph()
+    store.join_paths()
+    build_indexes()
+    timings["context"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    get_agent(variant, **options)
+    timings["graph"] = time.perf_counter() - start
+
+    if llm:
+        start = time.perf_counter()
+        get_default_llm()
+        timings["llm"] = time.perf_counter() - start
+
+    if backend:
+        start = time.perf_counter()
+        active_backend = get_backend()
+        getattr(active_backend, "client", None)  # BigQuery: gemeinsamen Client (und Credentials) jetzt erzeugen
+        timings["backend"] = time.perf_counter() - start
+
+    return timings
+
+
+def initial_state(question: str, llm: Any, agent_id: str) -> AgentState:
+    """Erzeugt den initialen State für eine Nutzerfrage."""
+    return {
+        "messages": [HumanMessage(content=question)],
+         # SQL-Informationen
+        "sql_query": "",
+        "sql_result": "",
+        "sql_result_frame": None,
+        "sql_total_rows": None,
+        "sql_summary": None,
+        "generated_sql": "",
+        "sql_variant_hint": None,
+        "sql_candidates": None,
+        "sql_analyse": None,
+        "sql_failed": False,
+        "sql_error_type": "",
+        "sql_bytes_estimate": None,
+        "prev_sql_error": None,
+        "prev_sql": None,
+
+        # Marken- / Schema-Infos
+        "brand": [],
+        "schema": [],
+        "relevant_tables": [],
+        "bq_tables": [],
+        "bq_base_tables": [],
+
+        # LLM
+        "llm": llm,
+
+        # Konfiguration
+        "table_top_k": None,
+        "column_top_k": None,
+        "max_bytes_budget": None,
+        "schema_token_budget": None,
+
+        # Beziehungs-Informationen
+        "relationship_info": [],
+
+        # Angereicherte Schema-Daten
+        "enriched_schema": [],
+        "selected_schema": [],
+        "schema_render_info": None,
+
+        # Antworten
+        "natural_answer": "",
+        "agent_id": agent_id,
+        "answer_cache_key": None,
+        "answer_cache_hit": False,
+
+        # Retry-Infos
+        "retry_count": 0,
+        "stage_inputs": {},
+    }
+
+
+def run_question(agent, question: str, llm: Any, agent_id: str, eval_logger: EvalLogger) -> Dict:
+    """
+    Führt eine einzelne Frage durch den kompilierten Graphen und loggt sie in einer eigenen Session.
+    Fehler werden abgefangen und als Ergebnis mit sql_failed=True zurückgegeben.
+    Das Ergebnis enthält zusätzlich die geloggten Versuche der Frage ("attempts").
+    """
+    state = initial_state(question, llm, agent_id)
+
+    try:
+        # Logging starten
+        eval_logger.start_session(question)
+
+        # Agent ausführen
+        state = agent.invoke(state)
+        result = _question_result(question, state, eval_logger)
+
+        # Logging beenden
+        eval_logger.end_session()
+
+    except Exception as e:
+        result = _question_error(question, e, eval_logger)
+
+    return result
+
+
+async def arun_question(agent, question: str, llm: Any, agent_id: str, eval_logger: EvalLogger) -> Dict:
+    """Async-Variante von run_question (agent.ainvoke, z.B. mit einem Graphen aus build_agent_graph(async_nodes=True))."""
+    state = initial_state(question, llm, agent_id)
+
+    try:
+        eval_logger.start_session(question)
+        state = await agent.ainvoke(state)
+        result = _question_result(question, state, eval_logger)
+        eval_logger.end_session()
+
+    except Exception as e:
+        result = _question_error(question, e, eval_logger)
+
+    return result
+
+
+def _question_result(question: str, state: AgentState, eval_logger: EvalLogger) -> Dict:
+    # Antwort aus State abrufen
+    natural_answer = state.get("natural_answer", "Keine Antwort generiert.")
+
+    return {
+        "question": question,
+        "answer": natural_answer,
+        "sql_failed": state.get("sql_failed", False),
+        "sql_query": state.get("sql_query", ""),
+        "sql_result": state.get("sql_result", ""),
+        "attempts": _session_attempts(eval_logger)
+    }
+
+
+def _question_error(question: str, e: Exception, eval_logger: EvalLogger) -> Dict:
+    print(f"❌ Fehler bei der Ausführung der Frage '{question}': {e}")
+    attempts = _session_attempts(eval_logger)
+    eval_logger.end_session()
+    return {
+        "question": question,
+        "answer": f"Fehler: {e}",
+        "sql_failed": True,
+        "sql_query": "",
+        "sql_result": "",
+        "attempts": attempts
+    }
+
+
+def _session_attempts(eval_logger: EvalLogger) -> List[dict]:
+    session = eval_logger.current_session
+    return list(session["attempts"]) if session is not None else []
+
+
+def stream_question(agent, question: str, llm: Any, agent_id: str, eval_logger: EvalLogger) -> Iterator[str]:
+    """
+    Wie run_question, liefert aber die Antwort stückweise, sobald das LLM sie erzeugt.
+    agent muss ohne Antwort-Node gebaut sein (include_answer=False); die Antwort kommt aus stream_answer
+    (bzw. bei answer_cache=True und einem Treffer als ein Stück aus dem Antwort-Cache).
+    Fehler werden als ein Text-Stück "Fehler: ..." geliefert.
+    """
+    state = initial_state(question, llm, agent_id)
+    eval_logger.start_session(question)
+    try:
+        state = agent.invoke(state)
+        if state.get("answer_cache_hit", False):
+            yield state["natural_answer"]
+            return
+        yield from traced_stream("answer_from_result", stream_answer)(state)
+        store_answer_cache(state)
+    except Exception as e:
+        print(f"❌ Fehler bei der Ausführung der Frage '{question}': {e}")
+        yield f"Fehler: {e}"
+    finally:
+        eval_logger.end_session()
+
+
+def run_questions(agent, questions: List[str], llm: Any, agent_id: str, max_workers: int = 1) -> List[Dict]:
+    """
+    Führt eine Liste von Fragen durch den kompilierten Graphen.
+    Bei max_workers > 1 laufen bis zu max_workers Fragen gleichzeitig (I/O-gebunden: LLM und BigQuery).
+    Die Ergebnisse bleiben in der Reihenfolge der Eingabe, jede Frage bekommt ihre eigene Log-Session.
+    """
+    eval_logger = EvalLogger(agent_id=agent_id)
+
+    if max_workers <= 1:
+        results = []
+        for i, question in enumerate(questions, start=1):
+            print(f"\n🔹 Frage {i}/{len(questions)}")
+            results.append(run_question(agent, question, llm, agent_id, eval_logger))
+        return results
+
+    def _task(i: int, question: str) -> Dict:
+        print(f"\n🔹 Frage {i}/{len(questions)}")
+        return run_question(agent, question, llm, agent_id, eval_logger)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # eigener Kontext pro Frage -> eigene current_session im EvalLogger
+        futures = [
+            executor.submit(contextvars.copy_context().run, _task, i, question)
+            for i, question in enumerate(questions, start=1)
+        ]
+        return [future.result() for future in futures]
+
+
+def iter_questions(agent, questions: List[str], llm: Any, agent_id: str, max_workers: int = 1) -> Iterator[Dict]:
+    """
+    Wie run_questions, liefert aber jedes Ergebnis, sobald seine Frage fertig ist (bei max_workers > 1
+    also nicht in Eingabereihenfolge). Jedes Ergebnis trägt seine Position in questions als "index".
+    Wird der Generator vorzeitig geschlossen, starten keine weiteren Fragen mehr.
+    """
+    eval_logger = EvalLogger(agent_id=agent_id)
+
+    if max_workers <= 1:
+        for i, question in enumerate(questions):
+            print(f"\n🔹 Frage {i + 1}/{len(questions)}")
+            yield {"index": i, **run_question(agent, question, llm, agent_id, eval_logger)}
+        return
+
+    def _task(i: int, question: str) -> Dict:
+        print(f"\n🔹 Frage {i + 1}/{len(questions)}")
+        return {"index": i, **run_question(agent, question, llm, agent_id, eval_logger)}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [
+            executor.submit(contextvars.copy_context().run, _task, i, question)
+            for i, question in enumerate(questions)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def arun_questions(agent, questions: List[str], llm: Any, agent_id: str, max_concurrency: int = 50) -> List[Dict]:
+    """
+    Async-Variante von run_questions: alle Fragen laufen als Tasks auf einem Event-Loop, höchstens
+    max_concurrency gleichzeitig (Semaphore). Reihenfolge der Ergebnisse wie in questions.
+    """
+    eval_logger = EvalLogger(agent_id=agent_id)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _task(i: int, question: str) -> Dict:
+        async with semaphore:
+            print(f"\n🔹 Frage {i}/{len(questions)}")
+            # jede Task hat ihren eigenen Kontext -> eigene current_session im EvalLogger
+            return await arun_question(agent, question, llm, agent_id, eval_logger)
+
+    return await asyncio.gather(*(_task(i, question) for i, question in enumerate(questions, start=1)))
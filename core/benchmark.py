@@ -0,0 +1,410 @@
+"""
+Offline-Benchmark der Agenten-Graphen ohne Live-LLM und ohne BigQuery.
+
+Beispiel:
+    python -m core.benchmark --agent E --questions notebooks/input/fragen.json \\
+        --responses benchmark_responses.json --llm-latency lognormal:0.8:0.4 \\
+        --sql-latency constant:0.2 --workers 4 --output output/benchmark_E.json
+"""
+import argparse
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from langchain_core.messages import AIMessage
+
+from core.backends import BigQueryBackend, ExecutionBackend, DuckDBBackend, set_backend
+from core.batch import get_agent, initial_state
+from core.llm_cache import CachingLLM, get_llm_cache_store, messages_key
+from core.logger import EvalLogger
+from core.sql_cache import configure_sql_cache
+from core.answer_cache import get_answer_cache
+
+# Standard-Antworten, falls weder Aufzeichnung noch Regel greift: gültig für OS- und CoT-Prompting
+DEFAULT_SQL_RESPONSE = '{"analyse": "", "sql": "SELECT 1 AS n;"}'
+
+
+class LatencyModel:
+    """
+    Verteilung der künstlichen Latenz in Sekunden, z.B. "constant:0.5", "uniform:0.2:1.0"
+    oder "lognormal:<median>:<sigma>".
+    """
+
+    def __init__(self, spec: str = "constant:0", seed: Optional[int] = None):
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        self.spec = spec
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        if kind not in ("constant", "uniform", "lognormal"):
+            raise ValueError(f"Unbekannte Latenzverteilung '{kind}'")
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "constant":
+                return self.params[0] if self.params else 0.0
+            if self.kind == "uniform":
+                return self._random.uniform(self.params[0], self.params[1])
+            median, sigma = self.params
+            return self._random.lognormvariate(np.log(median), sigma)
+
+
+class ScriptedLLM:
+    """
+    Deterministisches Fake-LLM für Benchmarks.
+    Antworten kommen (1) aus einer aufgezeichneten LLM-Cache-Datei (siehe core.llm_cache), sonst
+    (2) aus Regeln {"match": <Teilstring des System-Prompts>, "response": ...}, sonst (3) aus default.
+    Jeder Aufruf schläft eine aus der Latenzverteilung gezogene Zeit.
+    """
+
+    def __init__(self, rules: Optional[List[dict]] = None, default: str = DEFAULT_SQL_RESPONSE,
+                 latency: Optional[LatencyModel] = None, recordings: Optional[str] = None,
+                 model_name: str = "scripted"):
+        self.rules = rules or []
+        self.default = default
+        self.latency = latency or LatencyModel()
+        self.store = get_llm_cache_store(recordings) if recordings else None
+        self.model_name = model_name
+
+    def _respond(self, messages: List[Any], args: tuple = (), kwargs: Optional[dict] = None) -> str:
+        if self.store is not None:
+            # gleicher Schlüssel wie beim Aufzeichnen über CachingLLM (inkl. Aufruf-Optionen)
+            key = messages_key(self.model_name, messages, CachingLLM._options(args, kwargs or {}))
+            recorded = self.store.get(key)
+            if recorded is not None:
+                return recorded["content"]
+
+        system_prompt = messages[0]["content"] if isinstance(messages[0], dict) else messages[0].content
+        for rule in self.rules:
+            if rule["match"] in system_prompt:
+                return rule["response"]
+        return self.default
+
+    def invoke(self, messages: List[Any], *args, **kwargs) -> AIMessage:
+        content = self._respond(messages, args, kwargs)
+        time.sleep(self.latency.sample())
+        return AIMessage(content=content)
+
+    async def ainvoke(self, messages: List[Any], *args, **kwargs) -> AIMessage:
+        content = self._respond(messages, args, kwargs)
+        await asyncio.sleep(self.latency.sample())
+        return AIMessage(content=content)
+
+
+class FakeBackend(ExecutionBackend):
+    """Ausführungs-Backend, das nach künstlicher Latenz immer dasselbe kleine Ergebnis liefert."""
+
+    name = "fake"
+
+    def __init__(self, latency: Optional[LatencyModel] = None, frame: Optional[pd.DataFrame] = None):
+        self.latency = latency or LatencyModel()
+        self.frame = frame if frame is not None else pd.DataFrame({"n": [1]})
+
+    def execute(self, sql: str, max_rows: int):
+        time.sleep(self.latency.sample())
+        return self.frame.head(max_rows), len(self.frame), 0
+
+    async def aexecute(self, sql: str, max_rows: int):
+        await asyncio.sleep(self.latency.sample())
+        return self.frame.head(max_rows), len(self.frame), 0
+
+    def dry_run(self, sql: str) -> int:
+        return 0
+
+
+class FakeQueryJob:
+    """Nachbildung eines BigQuery-QueryJobs: läuft `duration` Sekunden und liefert dann `frame` seitenweise."""
+
+    def __init__(self, job_id: str, frame: pd.DataFrame, duration: float, bytes_processed: int):
+        self.job_id = job_id
+        self.frame = frame
+        self.total_bytes_processed = bytes_processed
+        self._finished_at = time.monotonic() + duration
+        self.cancelled = False
+
+    def done(self) -> bool:
+        return self.cancelled or time.monotonic() >= self._finished_at
+
+    def cancel(self) -> bool:
+        self.cancelled = True
+        return True
+
+    def result(self, page_size: Optional[int] = None, max_results: Optional[int] = None):
+        remaining = self._finished_at - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        if self.cancelled:
+            raise RuntimeError(f"Job {self.job_id} wurde abgebrochen")
+
+        rows = [SimpleNamespace(values=lambda r=r: r) for r in self.frame.head(max_results).itertuples(index=False, name=None)]
+        page_size = page_size or len(rows) or 1
+        return SimpleNamespace(
+            schema=[SimpleNamespace(name=column) for column in self.frame.columns],
+            total_rows=len(self.frame),
+            pages=[rows[i:i + page_size] for i in range(0, len(rows), page_size)],
+        )
+
+
+class FakeBigQueryClient:
+    """
+    Lokale Fake-Job-API für BigQueryBackend (client_factory), z.B. für Offline-Läufe von submit/poll/fetch:
+        BigQueryBackend(client_factory=lambda project: FakeBigQueryClient(latency=LatencyModel("constant:0.5")))
+    Abgeschickte Abfragen und ihre Job-Konfiguration stehen in `queries`.
+    """
+
+    def __init__(self, frame: Optional[pd.DataFrame] = None, latency: Optional[LatencyModel] = None,
+                 bytes_processed: int = 0):
+        self.frame = frame if frame is not None else pd.DataFrame({"n": [1]})
+        self.latency = latency or LatencyModel()
+        self.bytes_processed = bytes_processed
+        self.queries = []
+        self._counter = itertools.count(1)
+
+    def query(self, sql: str, job_config: Any = None) -> FakeQueryJob:
+        self.queries.append((sql, job_config))
+        duration = 0.0 if getattr(job_config, "dry_run", False) else self.latency.sample()
+        return FakeQueryJob(f"fake_job_{next(self._counter)}", self.frame, duration, self.bytes_processed)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    arr = np.asarray(values, dtype=float)
+    return {
+        "count": int(arr.size),
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "p99": float(np.percentile(arr, 99)),
+        "max": float(arr.max()),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def _run_one(agent, question: str, llm: Any, agent_id: str, eval_logger: EvalLogger) -> dict:
+    """Führt eine Frage aus und misst Gesamt- und Node-Latenzen (Zeit zwischen den Graph-Updates)."""
+    state = initial_state(question, llm, agent_id)
+    node_timings = []
+    error = None
+
+    eval_logger.start_session(question)
+    start = last = time.perf_counter()
+    try:
+        for update in agent.stream(state, stream_mode="updates"):
+            now = time.perf_counter()
+            for node_name in update:
+                node_timings.append({"node": node_name, "seconds": now - last})
+            last = now
+    except Exception as e:
+        error = str(e)
+    total = time.perf_counter() - start
+    eval_logger.end_session()
+
+    return {"question": question, "seconds": total, "nodes": node_timings, "error": error}
+
+
+async def _arun_one(agent, question: str, llm: Any, agent_id: str, eval_logger: EvalLogger) -> dict:
+    """Async-Variante von _run_one (agent.astream)."""
+    state = initial_state(question, llm, agent_id)
+    node_timings = []
+    error = None
+
+    eval_logger.start_session(question)
+    start = last = time.perf_counter()
+    try:
+        async for update in agent.astream(state, stream_mode="updates"):
+            now = time.perf_counter()
+            for node_name in update:
+                node_timings.append({"node": node_name, "seconds": now - last})
+            last = now
+    except Exception as e:
+        error = str(e)
+    total = time.perf_counter() - start
+    eval_logger.end_session()
+
+    return {"question": question, "seconds": total, "nodes": node_timings, "error": error}
+
+
+async def _arun_all(agent, questions: List[str], llm: Any, agent_id: str, eval_logger: EvalLogger, workers: int) -> List[dict]:
+    semaphore = asyncio.Semaphore(max(1, workers))
+
+    async def _task(question: str) -> dict:
+        async with semaphore:
+            return await _arun_one(agent, question, llm, agent_id, eval_logger)
+
+    return await asyncio.gather(*(_task(q) for q in questions))
+
+
+def run_benchmark(agent_name: str, questions: List[str], llm: Any, workers: int = 1, **graph_options) -> dict:
+    """
+    Führt alle Fragen durch den Graphen von agent_<agent_name> und berechnet die Kennzahlen.
+    Mit async_nodes=True laufen die Fragen auf einem Event-Loop (workers = max. gleichzeitige Fragen).
+    """
+    agent = get_agent(agent_name, **graph_options)
+    agent_id = f"benchmark_{agent_name}"
+    eval_logger = EvalLogger(agent_id=agent_id)
+
+    start = time.perf_counter()
+    if graph_options.get("async_nodes"):
+        runs = asyncio.run(_arun_all(agent, questions, llm, agent_id, eval_logger, workers))
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, _run_one, agent, q, llm, agent_id, eval_logger)
+                for q in questions
+            ]
+            runs = [future.result() for future in futures]
+    wall_time = time.perf_counter() - start
+
+    per_node: Dict[str, List[float]] = {}
+    for run in runs:
+        for timing in run["nodes"]:
+            per_node.setdefault(timing["node"], []).append(timing["seconds"])
+
+    report = {
+        "agent": agent_name,
+        "questions": len(questions),
+        "workers": workers,
+        "errors": sum(1 for run in runs if run["error"]),
+        "wall_time_seconds": wall_time,
+        "throughput_qps": len(questions) / wall_time if wall_time else 0.0,
+        "question_latency": _percentiles([run["seconds"] for run in runs]),
+        "node_latency": {node: _percentiles(values) for node, values in per_node.items()},
+        "runs": runs,
+    }
+    if graph_options.get("answer_cache") and get_answer_cache() is not None:
+        report["answer_cache"] = get_answer_cache().stats()
+    return report
+
+
+_COLD_START_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import core.agent_{agent}.runner
+imported = time.perf_counter()
+from core.batch import warm_up
+steps = warm_up("{agent}", llm=False, backend=False)
+print(json.dumps({{"import_seconds": imported - start, "warm_up_seconds": time.perf_counter() - imported, "warm_up_steps": steps}}))
+"""
+
+
+def measure_cold_start(agent_name: str, repeats: int = 3) -> dict:
+    """
+    Misst in frischen Python-Prozessen die Importzeit des Runners und die Dauer von warm_up()
+    (Kontext, Indizes, Graph; ohne LLM- und Backend-Verbindung).
+    """
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.check_output(
+            [sys.executable, "-c", _COLD_START_SCRIPT.format(agent=agent_name)],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), text=True
+        )
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "import_seconds": _percentiles([run["import_seconds"] for run in runs]),
+        "warm_up_seconds": _percentiles([run["warm_up_seconds"] for run in runs]),
+        "runs": runs,
+    }
+
+
+def load_questions(path: str, question_key: str = "frage") -> List[str]:
+    """Liest Fragen aus einer JSON-Datei (Liste von Strings oder von Dicts wie in fragen.json)."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [item if isinstance(item, str) else item[question_key] for item in data]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline-Benchmark der Agenten-Graphen")
+    parser.add_argument("--agent", default="E", help="Agenten-Variante, z.B. A oder E")
+    parser.add_argument("--questions", required=True, help="JSON-Datei mit Fragen (z.B. fragen.json)")
+    parser.add_argument("--question-key", default="frage")
+    parser.add_argument("--responses", help='JSON: {"rules": [{"match": ..., "response": ...}], "default": ...}')
+    parser.add_argument("--recordings", help="SQLite-Datei des LLM-Caches mit aufgezeichneten Antworten")
+    parser.add_argument("--model-name", default="scripted", help="Modellkennung der Aufzeichnungen")
+    parser.add_argument("--llm-latency", default="constant:0", help="z.B. constant:0.5, uniform:0.2:1, lognormal:0.8:0.4")
+    parser.add_argument("--sql-latency", default="constant:0")
+    parser.add_argument("--fixtures", help="Fixture-Verzeichnis für das DuckDB-Backend (sonst Fake-Backend)")
+    parser.add_argument("--fake-bigquery", action="store_true", help="BigQueryBackend gegen die lokale Fake-Job-API statt Fake-Backend")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--parallel", action="store_true", help="Graph mit parallelen Zweigen (build_agent_graph(parallel=True))")
+    parser.add_argument("--async", dest="async_nodes", action="store_true", help="Async-Nodes auf einem Event-Loop (workers = max. gleichzeitige Fragen)")
+    parser.add_argument("--sql-candidates", type=int, default=1, help="parallel generierte SQL-Kandidaten pro Frage")
+    parser.add_argument("--candidate-selection", default="first_valid", help="first_valid oder majority")
+    parser.add_argument("--answer-cache", action="store_true", help="Antwort-Cache (Treffer enden nach identify_brand)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-sql-cache", action="store_true", help="SQL-Ergebnis-Cache deaktivieren")
+    parser.add_argument("--cold-start", action="store_true", help="zusätzlich Kaltstart (Import + warm_up) in frischen Prozessen messen")
+    parser.add_argument("--output", help="Pfad der JSON-Ergebnisdatei (Standard: output/benchmark_<agent>_<zeit>.json)")
+    args = parser.parse_args(argv)
+
+    rules, default = [], DEFAULT_SQL_RESPONSE
+    if args.responses:
+        with open(args.responses, "r", encoding="utf-8") as f:
+            responses = json.load(f)
+        rules, default = responses.get("rules", []), responses.get("default", DEFAULT_SQL_RESPONSE)
+
+    llm = ScriptedLLM(rules, default, LatencyModel(args.llm_latency, args.seed), args.recordings, args.model_name)
+    if args.fixtures:
+        set_backend(DuckDBBackend(args.fixtures))
+    elif args.fake_bigquery:
+        sql_latency = LatencyModel(args.sql_latency, args.seed)
+        set_backend(BigQueryBackend(client_factory=lambda project: FakeBigQueryClient(latency=sql_latency)))
+    else:
+        set_backend(FakeBackend(LatencyModel(args.sql_latency, args.seed)))
+    configure_sql_cache(enabled=not args.no_sql_cache)
+
+    questions = load_questions(args.questions, args.question_key)
+    report = run_benchmark(args.agent, questions, llm, args.workers, parallel=args.parallel,
+                           sql_candidates=args.sql_candidates, candidate_selection=args.candidate_selection,
+                           async_nodes=args.async_nodes, answer_cache=args.answer_cache)
+    report.update({
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": _git_commit(),
+        "config": vars(args),
+    })
+    if args.cold_start:
+        report["cold_start"] = measure_cold_start(args.agent)
+
+    output = args.output or os.path.join("output", f"benchmark_{args.agent}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    latency = report["question_latency"]
+    print(f"Agent {args.agent}: {report['questions']} Fragen, {report['errors']} Fehler, "
+          f"{report['throughput_qps']:.2f} Fragen/s")
+    print(f"Latenz pro Frage: p50={latency.get('p50', 0):.3f}s p95={latency.get('p95', 0):.3f}s p99={latency.get('p99', 0):.3f}s")
+    for node, stats in report["node_latency"].items():
+        print(f"  {node:<28} p50={stats['p50']:.4f}s p95={stats['p95']:.4f}s")
+    if "answer_cache" in report:
+        print(f"Antwort-Cache: {report['answer_cache']['hits']} Treffer, Hit-Rate {report['answer_cache']['hit_rate']:.0%}")
+    if "cold_start" in report:
+        cold_start = report["cold_start"]
+        print(f"Kaltstart: Import p50={cold_start['import_seconds']['p50']:.3f}s, "
+              f"warm_up p50={cold_start['warm_up_seconds']['p50']:.3f}s")
+    print(f"Ergebnisse gespeichert unter {output}")
+
+
+if __name__ == "__main__":
+    main()
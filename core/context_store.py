@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Tuple
+
+CONTEXT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "context")  # agent/core/context/
+
+
+class ContextStore:
+    """
+    Prozessweiter Speicher für die Kontext-JSON-Dateien (tables_enriched.json, schema.json, ...).
+    Jede Datei wird nur einmal geparst und erst bei geänderter mtime neu geladen.
+    Abgeleitete Indizes (z.B. table_name -> Schema-Eintrag) werden pro Dateiversion gecacht.
+    """
+
+    def __init__(self, context_dir: str = CONTEXT_DIR):
+        self.context_dir = context_dir
+        self._files: Dict[str, Dict[str, Any]] = {}  # filename -> {"mtime", "data", "derived"}
+        self._lock = threading.RLock()
+
+    def _entry(self, filename: str) -> Dict[str, Any]:
+        path = os.path.join(self.context_dir, filename)
+        mtime = os.stat(path).st_mtime_ns  # FileNotFoundError wird bewusst durchgereicht
+
+        with self._lock:
+            entry = self._files.get(filename)
+            if entry is None or entry["mtime"] != mtime:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                entry = {"mtime": mtime, "data": data, "derived": {}}
+                self._files[filename] = entry
+            return entry
+
+    def load(self, filename: str) -> Any:
+        """Gibt den geparsten Inhalt einer Kontext-Datei zurück (neu geladen nur bei geänderter mtime)."""
+        return self._entry(filename)["data"]
+
+    def derived(self, filename: str, key: str, builder: Callable[[Any], Any]) -> Any:
+        """
+        Baut eine aus der Datei abgeleitete Struktur einmal pro Dateiversion auf.
+        Wird die Datei neu geladen, werden auch alle abgeleiteten Strukturen verworfen.
+        """
+        entry = self._entry(filename)
+        with self._lock:
+            if key not in entry["derived"]:
+                entry["derived"][key] = builder(entry["data"])
+            return entry["derived"][key]
+
+    def clear(self):
+        """Verwirft alle geladenen Dateien (z.B. für Tests oder nach manuellem Austausch)."""
+        with self._lock:
+            self._files.clear()
+
+    # --- tables_enriched.json ---
+    def tables(self) -> List[dict]:
+        return self.load("tables_enriched.json")
+
+    def table_lookup(self) -> Dict[str, dict]:
+        """table_name -> Tabellen-Metadaten (Beschreibung, Suffix, ...)"""
+        return self.derived(
+            "tables_enriched.json", "table_lookup",
+            lambda data: {entry["table_name"]: entry for entry in data}
+        )
+
+    # --- schema.json ---
+    def schema_lookup(self) -> Dict[str, dict]:
+        """table_name -> Schema-Eintrag"""
+        return self.derived(
+            "schema.json", "schema_lookup",
+            lambda data: {entry["table_name"]: entry for entry in data}
+        )
+
+    # --- attributes.json ---
+    def attribute_lookup(self) -> Dict[str, dict]:
+        """attribute_name -> {"description", "value_examples"}"""
+        return self.derived(
+            "attributes.json", "attribute_lookup",
+            lambda data: {
+                item["attribute_name"]: {
+                    "description": item.get("description", ""),
+                    "value_examples": item.get("value_examples", [])
+                }
+                for item in data
+            }
+        )
+
+    # --- relationships.json ---
+    def relationships(self) -> List[dict]:
+        return self.load("relationships.json")
+
+    def joins_by_table(self) -> Dict[str, List[dict]]:
+        """table_name -> JOIN-Definitionen, deren erste zwei tables_for_join-Einträge die Tabelle enthalten"""
+        return self.derived("relationships.json", "joins_by_table", _build_joins_by_table)
+
+    def join_graph(self) -> Dict[str, Dict[str, dict]]:
+        """table_name -> {Nachbartabelle: JOIN-Definition} (ungerichtet, aus den ersten zwei tables_for_join-Einträgen)"""
+        return self.derived("relationships.json", "join_graph", _build_join_graph)
+
+    def join_paths(self) -> Dict[Tuple[str, str], List[str]]:
+        """(start, ziel) -> kürzester Tabellenpfad über JOINs, für alle verbundenen Paare vorberechnet"""
+        return self.derived("relationships.json", "join_paths", lambda data: _build_join_paths(self.join_graph()))
+
+
+def _build_joins_by_table(relationship_metadata: List[dict]) -> Dict[str, List[dict]]:
+    joins_by_table: Dict[str, List[dict]] = {}
+    for join_def in relationship_metadata:
+        try:
+            tables_for_join = join_def.get("tables_for_join", [])
+            if len(tables_for_join) >= 2:
+                table1, table2 = tables_for_join[0], tables_for_join[1]
+                joins_by_table.setdefault(table1, []).append(join_def)
+                if table2 != table1:
+                    joins_by_table.setdefault(table2, []).append(join_def)
+        except (AttributeError, KeyError, IndexError, TypeError):
+            continue
+    return joins_by_table
+
+
+def _build_join_graph(relationship_metadata: List[dict]) -> Dict[str, Dict[str, dict]]:
+    join_graph: Dict[str, Dict[str, dict]] = {}
+    for table, join_defs in _build_joins_by_table(relationship_metadata).items():
+        for join_def in join_defs:
+            table1, table2 = join_def["tables_for_join"][0], join_def["tables_for_join"][1]
+            neighbor = table2 if table == table1 else table1
+            if neighbor != table:
+                # bei mehreren JOINs zwischen zwei Tabellen gilt der erste
+                join_graph.setdefault(table, {}).setdefault(neighbor, join_def)
+    return join_graph
+
+
+def _build_join_paths(join_graph: Dict[str, Dict[str, dict]]) -> Dict[Tuple[str, str], List[str]]:
+    # Breitensuche von jeder Tabelle aus; Pfade über die Vorgänger rekonstruieren
+    join_paths: Dict[Tuple[str, str], List[str]] = {}
+    for start in join_graph:
+        parents = {start: None}
+        queue = deque([start])
+        while queue:
+            table = queue.popleft()
+            for neighbor in join_graph.get(table, {}):
+                if neighbor not in parents:
+                    parents[neighbor] = table
+                    queue.append(neighbor)
+
+        for target in parents:
+            if target == start:
+                continue
+            path = [target]
+            while parents[path[-1]] is not None:
+                path.append(parents[path[-1]])
+            join_paths[(start, target)] = path[::-1]
+    return join_paths
+
+
+_store = ContextStore()
+
+
+def get_context_store() -> ContextStore:
+    """Gibt die prozessweite ContextStore-Instanz zurück."""
+    return _store
@@ -0,0 +1,175 @@
+import functools
+import inspect
+from typing import Callable, Dict
+
+from langgraph.graph import StateGraph, START, END
+
+from core.nodes.identify_brand import identify_brand
+from core.nodes.identify_relevant_tables import identify_relevant_tables, aidentify_relevant_tables
+from core.nodes.expand_table_names import expand_table_names
+from core.nodes.load_schema import load_schema
+from core.nodes.enrich_schema import enrich_schema
+from core.nodes.select_schema import select_schema, aselect_schema
+from core.nodes.load_table_relationships import load_table_relationships
+from core.nodes.answer_cache import check_answer_cache, route_after_answer_cache
+from core.tracing import traced
+
+
+def as_async(node: Callable[[dict], dict]) -> Callable[[dict], dict]:
+    """
+    Macht einen schnellen, nicht blockierenden Node (ohne LLM- oder BigQuery-Aufruf) zum Async-Node.
+    Im Async-Graphen läuft er dann direkt im Event-Loop statt in einem Worker-Thread.
+    """
+    @functools.wraps(node)
+    async def wrapper(state):
+        return node(state)
+
+    return wrapper
+
+
+def returns_keys(node: Callable[[dict], dict], *keys: str) -> Callable[[dict], dict]:
+    """
+    Für Nodes in parallelen Zweigen: der Node läuft auf einer Kopie des States und gibt nur die
+    angegebenen Keys zurück. Würden beide Zweige den ganzen State zurückgeben, schrieben sie im
+    selben Schritt dieselben Kanäle (InvalidUpdateError).
+    """
+    if inspect.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(state):
+            result = await node(dict(state))
+            return {key: result[key] for key in keys if key in result}
+
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(state):
+        result = node(dict(state))
+        return {key: result[key] for key in keys if key in result}
+
+    return wrapper
+
+
+def reuse_if_unchanged(node: Callable[[dict], dict], stage: str, *input_keys: str) -> Callable[[dict], dict]:
+    """
+    Überspringt den Node, wenn seine Eingaben (input_keys) seit seinem letzten Lauf gleich geblieben sind,
+    z.B. load_schema im Retry mit unveränderten relevant_tables. Der Fingerprint der Eingaben steht
+    pro Stage in state["stage_inputs"].
+    """
+    if inspect.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(state):
+            fingerprint = repr([state.get(key) for key in input_keys])
+            stage_inputs = state.get("stage_inputs") or {}
+            if stage_inputs.get(stage) == fingerprint:
+                return state
+            result = await node(state)
+            result["stage_inputs"] = {**stage_inputs, stage: fingerprint}
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(state):
+        fingerprint = repr([state.get(key) for key in input_keys])
+        stage_inputs = state.get("stage_inputs") or {}
+        if stage_inputs.get(stage) == fingerprint:
+            return state
+        result = node(state)
+        result["stage_inputs"] = {**stage_inputs, stage: fingerprint}
+        return result
+
+    return wrapper
+
+
+def add_context_stages(graph: StateGraph, next_node: str, parallel: bool = False,
+                       async_nodes: bool = False, answer_cache: bool = False) -> Dict[str, str]:
+    """
+    Fügt die Kontext-Nodes (Marke, Tabellen, Schema, Beziehungen) hinzu und verbindet sie mit next_node.
+    Sequenziell: identify_brand -> identify_relevant_tables -> load_schema -> enrich_schema
+                 -> select_schema -> load_table_relationships -> next_node
+    Parallel:    identify_brand || identify_relevant_tables -> expand_table_names
+                 -> (load_schema -> enrich_schema -> select_schema) || load_table_relationships -> next_node
+    load_schema, enrich_schema und load_table_relationships laufen nur neu, wenn sich Tabellen (bzw. Marken)
+    geändert haben.
+    Gibt die Einstiegs-Nodes für Retries zurück: "tables" (neue Tabellenauswahl) und "columns" (neue
+    Spaltenauswahl). Im parallelen Graphen sind das eigene Nodes (reidentify_relevant_tables,
+    reselect_schema), da die Joins sonst auf Zweige warten würden, die im Retry nicht mehr laufen.
+    async_nodes: LLM-Nodes als Async-Varianten (ainvoke), übrige Nodes laufen direkt im Event-Loop
+    (nur für ainvoke des kompilierten Graphen). identify_brand bleibt synchron.
+    answer_cache: direkt nach identify_brand prüft check_answer_cache den Antwort-Cache und beendet den
+    Graphen bei einem Treffer. Im parallelen Graphen läuft identify_relevant_tables dann erst nach einem
+    Fehltreffer (statt parallel zu identify_brand), damit Treffer keinen LLM-Aufruf für die Tabellenauswahl kosten.
+    """
+    make_async = as_async if async_nodes else (lambda node: node)
+    tables_node = aidentify_relevant_tables if async_nodes else identify_relevant_tables
+    select_node = aselect_schema if async_nodes else select_schema
+    expand_node = make_async(expand_table_names)
+    load_schema_node = reuse_if_unchanged(make_async(load_schema), "load_schema", "relevant_tables")
+    enrich_schema_node = reuse_if_unchanged(make_async(enrich_schema), "enrich_schema", "relevant_tables")
+    relationships_node = reuse_if_unchanged(
+        make_async(load_table_relationships), "load_table_relationships", "relevant_tables", "brand")
+
+    if not parallel:
+        graph.add_node("identify_brand", traced("identify_brand", identify_brand))
+        graph.add_node("identify_relevant_tables", traced("identify_relevant_tables", tables_node))
+        graph.add_node("load_schema", traced("load_schema", load_schema_node))
+        graph.add_node("enrich_schema", traced("enrich_schema", enrich_schema_node))
+        graph.add_node("select_schema", traced("select_schema", select_node))
+        graph.add_node("load_table_relationships", traced("load_table_relationships", relationships_node))
+
+        graph.set_entry_point("identify_brand")
+        if answer_cache:
+            graph.add_node("check_answer_cache", traced("check_answer_cache", make_async(check_answer_cache)))
+            graph.add_edge("identify_brand", "check_answer_cache")
+            graph.add_conditional_edges("check_answer_cache", route_after_answer_cache, {
+                "hit": END,
+                "miss": "identify_relevant_tables"
+            })
+        else:
+            graph.add_edge("identify_brand", "identify_relevant_tables")
+        graph.add_edge("identify_relevant_tables", "load_schema")
+        graph.add_edge("load_schema", "enrich_schema")
+        graph.add_edge("enrich_schema", "select_schema")
+        graph.add_edge("select_schema", "load_table_relationships")
+        graph.add_edge("load_table_relationships", next_node)
+        return {"tables": "identify_relevant_tables", "columns": "select_schema"}
+
+    # Zweige geben nur ihre eigenen Keys zurück
+    graph.add_node("identify_brand", traced("identify_brand", returns_keys(identify_brand, "brand")))
+    graph.add_node("identify_relevant_tables", traced(
+        "identify_relevant_tables", returns_keys(tables_node, "relevant_tables")))
+    graph.add_node("reidentify_relevant_tables", traced(
+        "reidentify_relevant_tables", returns_keys(tables_node, "relevant_tables")))
+    graph.add_node("expand_table_names", traced("expand_table_names", expand_node))
+    graph.add_node("load_schema", traced("load_schema", returns_keys(load_schema_node, "schema", "stage_inputs")))
+    graph.add_node("enrich_schema", traced(
+        "enrich_schema", returns_keys(enrich_schema_node, "enriched_schema", "stage_inputs")))
+    graph.add_node("select_schema", traced("select_schema", returns_keys(select_node, "selected_schema")))
+    graph.add_node("reselect_schema", traced("reselect_schema", returns_keys(select_node, "selected_schema")))
+    graph.add_node("load_table_relationships", traced(
+        "load_table_relationships", returns_keys(relationships_node, "relationship_info", "stage_inputs")))
+
+    graph.add_edge(START, "identify_brand")
+    if answer_cache:
+        # Cache-Prüfung vor der Tabellenauswahl: Treffer sparen den LLM-Aufruf von identify_relevant_tables
+        graph.add_node("check_answer_cache", traced("check_answer_cache", make_async(check_answer_cache)))
+        graph.add_edge("identify_brand", "check_answer_cache")
+        graph.add_conditional_edges("check_answer_cache", route_after_answer_cache, {
+            "hit": END,
+            "miss": "identify_relevant_tables"
+        })
+        graph.add_edge("identify_relevant_tables", "expand_table_names")
+    else:
+        # Fan-out ab START, Join vor expand_table_names
+        graph.add_edge(START, "identify_relevant_tables")
+        graph.add_edge(["identify_brand", "identify_relevant_tables"], "expand_table_names")
+    graph.add_edge("reidentify_relevant_tables", "expand_table_names")
+
+    # Schema-Kette und Beziehungen parallel, Join vor next_node
+    graph.add_edge("expand_table_names", "load_schema")
+    graph.add_edge("expand_table_names", "load_table_relationships")
+    graph.add_edge("load_schema", "enrich_schema")
+    graph.add_edge("enrich_schema", "select_schema")
+    graph.add_edge(["select_schema", "load_table_relationships"], next_node)
+    graph.add_edge("reselect_schema", next_node)
+    return {"tables": "reidentify_relevant_tables", "columns": "reselect_schema"}
@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+
+from core.cache import SQLiteCache
+
+LLM_CACHE_MODES = ("read_through", "record_only", "bypass")
+DEFAULT_LLM_CACHE_PATH = os.path.join("output", "llm_cache.sqlite")
+
+_stores: Dict[str, SQLiteCache] = {}
+_stores_lock = threading.Lock()
+
+
+def get_llm_cache_store(path: str = DEFAULT_LLM_CACHE_PATH, max_entries: int = 20000) -> SQLiteCache:
+    """Gibt die (pro Pfad geteilte) SQLite-Ablage für LLM-Antworten zurück."""
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = SQLiteCache(path, max_entries=max_entries, ttl_seconds=None)
+        return _stores[path]
+
+
+def model_id(llm: Any) -> str:
+    """Bestimmt eine möglichst eindeutige Modellkennung des LLM-Objekts."""
+    for attr in ("model_name", "model", "model_id", "deployment_name"):
+        value = getattr(llm, attr, None)
+        if isinstance(value, str) and value:
+            return value
+    return type(llm).__name__
+
+
+def _message_payload(message: Any) -> Dict[str, Any]:
+    if isinstance(message, dict):
+        return {"role": message.get("role"), "content": message.get("content")}
+    if isinstance(message, BaseMessage):
+        return {"role": message.type, "content": message.content}
+    return {"role": None, "content": str(message)}
+
+
+def messages_key(model: str, messages: List[Any], options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Cache-Schlüssel aus Modellkennung und Hash der Nachrichtenliste samt Aufruf-Optionen (stop, temperature,
+    tools, ...), damit Aufrufe mit anderen Optionen nicht dieselbe Antwort bekommen. Ohne Optionen bleibt
+    der Schlüssel wie bisher (bestehende Aufzeichnungen gelten weiter).
+    """
+    payload = [_message_payload(m) for m in messages]
+    if options:
+        payload = {"messages": payload, "options": options}
+    payload = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+class CachingLLM:
+    """
+    Wrapper um das LLM-Objekt im AgentState, der Antworten persistent zwischenspeichert.
+    Modi:
+        read_through: Treffer aus dem Cache, sonst LLM aufrufen und speichern
+        record_only:  immer LLM aufrufen, Antwort speichern (Cache neu befüllen)
+        bypass:       Cache komplett umgehen
+    Alle übrigen Attribute werden an das eigentliche LLM durchgereicht.
+    """
+
+    def __init__(self, llm: Any, mode: str = "read_through", store: Optional[SQLiteCache] = None):
+        if mode not in LLM_CACHE_MODES:
+            raise ValueError(f"Unbekannter LLM-Cache-Modus '{mode}', erlaubt: {LLM_CACHE_MODES}")
+        self.llm = llm
+        self.mode = mode
+        self.store = store if store is not None else get_llm_cache_store()
+        self.model = model_id(llm)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "llm":  # z.B. beim Kopieren, bevor __init__ gelaufen ist
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def invoke(self, messages: List[Any], *args, **kwargs) -> Any:
+        if self.mode == "bypass":
+            return self.llm.invoke(messages, *args, **kwargs)
+
+        key, cached = self._lookup(messages, args, kwargs)
+        if cached is not None:
+            return cached
+        return self._remember(key, self.llm.invoke(messages, *args, **kwargs))
+
+    async def ainvoke(self, messages: List[Any], *args, **kwargs) -> Any:
+        if self.mode == "bypass":
+            return await self.llm.ainvoke(messages, *args, **kwargs)
+
+        # SQLite-Zugriffe in einem Worker-Thread, damit der Event-Loop nicht blockiert
+        key, cached = await asyncio.to_thread(self._lookup, messages, args, kwargs)
+        if cached is not None:
+            return cached
+        response = await self.llm.ainvoke(messages, *args, **kwargs)
+        return await asyncio.to_thread(self._remember, key, response)
+
+    @staticmethod
+    def _options(args: tuple, kwargs: dict) -> Dict[str, Any]:
+        # config (Callbacks, Tags, Metadaten) ändert die Antwort nicht und gehört nicht in den Schlüssel
+        options = {name: value for name, value in kwargs.items() if name != "config"}
+        if args:
+            options["args"] = list(args)
+        return options
+
+    def _lookup(self, messages: List[Any], args: tuple = (), kwargs: Optional[dict] = None) -> tuple:
+        """(Schlüssel, Treffer als AIMessage oder None)"""
+        key = messages_key(self.model, messages, self._options(args, kwargs or {}))
+        if self.mode == "read_through":
+            cached = self.store.get(key)
+            if cached is not None:
+                with self._lock:
+                    self.hits += 1
+                return key, AIMessage(content=cached["content"], response_metadata={"llm_cache": "hit"})
+        return key, None
+
+    def _remember(self, key: str, response: Any) -> Any:
+        with self._lock:
+            self.misses += 1
+        self.store.set(key, {"model": self.model, "content": response.content})
+        return response
+
+    def stream(self, messages: List[Any], *args, **kwargs) -> Iterator[Any]:
+        """Wie invoke, aber chunkweise; ein Treffer kommt als ein einziger Chunk, gespeichert wird nach dem letzten Chunk."""
+        if self.mode == "bypass":
+            yield from self.llm.stream(messages, *args, **kwargs)
+            return
+
+        key, cached = self._lookup(messages, args, kwargs)
+        if cached is not None:
+            yield AIMessageChunk(content=cached.content, response_metadata=cached.response_metadata)
+            return
+
+        parts = []
+        for chunk in self.llm.stream(messages, *args, **kwargs):
+            parts.append(str(getattr(chunk, "content", "") or ""))
+            yield chunk
+        self._remember(key, AIMessage(content="".join(parts)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self.store),
+            }
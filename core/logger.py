@@ -1,7 +1,29 @@
-import pandas as pd
+import csv
 import json
 from datetime import datetime
 import os
+import atexit
+import contextvars
+import itertools
+import queue
+import threading
+import uuid
+from collections import deque
+
+# Aktive Session pro Ausführungskontext (Thread bzw. Task), damit parallele Fragen sich nicht mischen
+_current_session = contextvars.ContextVar("eval_logger_current_session", default=None)
+
+MAX_BUFFERED_SESSIONS = 1000  # beendete Sessions, die im Speicher gehalten werden
+
+ATTEMPT_FIELDS = [
+    "session_id", "agent_id", "user_question", "total_attempts", "final_success", "attempt_number",
+    "attempt_timestamp", "generated_sql", "execution_success", "sql_result", "natural_answer",
+]
+SPAN_FIELDS = [
+    "session_id", "agent_id", "user_question", "node", "retry_count", "start", "end", "seconds",
+    "llm_calls", "llm_seconds", "prompt_chars", "prompt_tokens", "response_chars", "response_tokens",
+    "tokens_estimated",
+]
 
 
 class EvalLogger:
@@ -12,26 +34,47 @@ class EvalLogger:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self, agent_id: str = "default", log_dir: str = "."):
+    def __init__(self, agent_id: str = "default", log_dir: str = ".", max_buffered_sessions: int = MAX_BUFFERED_SESSIONS):
         if hasattr(self, "_initialized") and self._initialized:
             return  # Bereits initialisiert
         self.agent_id = agent_id
         self.log_dir = log_dir
-        self.logs = []
-        self.current_session = None
+        # nur die letzten Sessions bleiben im Speicher; ältere, noch nicht geschriebene werden vorher ausgelagert
+        self.logs = deque(maxlen=max_buffered_sessions)
+        self._ended = 0  # Anzahl aller bisher in self.logs aufgenommenen Sessions
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._written = {}  # Dateipfad -> Anzahl bereits geschriebener Sessions
+        self._sinks = {}  # Dateipfad -> (Format, filename) aller per append beschriebenen Dateien
+        self.stream_formats = ()  # siehe stream_to()
+
+        # beendete Sessions gehen über eine Queue an einen Hintergrund-Thread, der puffert und schreibt
+        self._queue = queue.SimpleQueue()
+        self._writer = None
         self._initialized = True
 
+    @property
+    def current_session(self):
+        """Die Session des aktuellen Ausführungskontexts (None, wenn keine aktiv ist)."""
+        return _current_session.get()
+
+    @current_session.setter
+    def current_session(self, session):
+        _current_session.set(session)
+
     def start_session(self, question: str):
         """Startet eine neue Logging-Session für eine Frage."""
         self.current_session = {
-            "session_id": datetime.now().isoformat(),
+            "session_id": str(uuid.uuid4()),  # eindeutig auch bei parallelen Sessions (Join-Key der CSVs)
+            "started_at": datetime.now().isoformat(),
             "agent_id": self.agent_id,
             "user_question": question,
-            "attempts": []
+            "attempts": [],
+            "spans": []
         }
 
-    def log_attempt(self, *, generated_sql, execution_success=None, sql_result=None): #executed_sql=None,
-        """Loggt einen Versuch (erster Versuch oder Retry) automatisch nummeriert."""
+    def log_attempt(self, *, generated_sql, execution_success=None, sql_result=None, cached=False): #executed_sql=None,
+        """Loggt einen Versuch (erster Versuch oder Retry) automatisch nummeriert; cached=True bei Antwort aus dem Antwort-Cache."""
         if self.current_session is None:
             raise ValueError("Keine aktive Session. Rufe start_session() zuerst auf.")
 
@@ -42,10 +85,16 @@ class EvalLogger:
             "generated_sql": generated_sql,
             #"executed_sql": executed_sql,
             "execution_success": execution_success,
-            "sql_result": sql_result
+            "sql_result": sql_result,
+            "cached": cached
         }
         self.current_session["attempts"].append(attempt)
 
+    def log_span(self, span: dict):
+        """Hängt einen Node-Span (siehe core.tracing) an die aktive Session; ohne Session wird er verworfen."""
+        if self.current_session is not None:
+            self.current_session.setdefault("spans", []).append(span)
+
     def log_final_answer(self, natural_answer: str):
         """Logs the final natural language answer."""
         if self.current_session is not None:
@@ -61,71 +110,204 @@ class EvalLogger:
                 self.current_session["attempts"][-1]["execution_success"]
                 if self.current_session["attempts"] else False
             )
-            self.logs.append(self.current_session)
+            self._ensure_writer()
+            self._queue.put(self.current_session)
             self.current_session = None
 
+    def _ensure_writer(self):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._writer_loop, name="EvalLoggerWriter", daemon=True)
+                    self._writer.start()
+                    atexit.register(self.flush)
+
+    def _writer_loop(self):
+        """Nimmt beendete Sessions aus der Queue, puffert sie und hängt sie an die Stream-Dateien an."""
+        while True:
+            item = self._queue.get()
+            if isinstance(item, threading.Event):  # Marker von _drain()
+                item.set()
+                continue
+            try:
+                if len(self.logs) == self.logs.maxlen:
+                    self._spill_oldest()
+                with self._lock:
+                    self.logs.append(item)
+                    self._ended += 1
+                for fmt in self.stream_formats:
+                    getattr(self, f"to_{fmt}")(append=True)
+            except Exception as e:
+                print(f"[Warning] Schreiben der Logs fehlgeschlagen: {e}")
+
+    def _spill_oldest(self):
+        """
+        Die älteste Session fällt gleich aus dem Puffer: jede Datei, die sie noch nicht enthält, bekommt
+        vorher alle neuen Sessions angehängt. Das sind die Standard-Dateien der Runner (JSONL, CSV samt
+        Spans) und alle bisher per append beschriebenen Dateien; sonst fehlten dort ausgelagerte Sessions.
+        """
+        self._sinks.setdefault(self._output_path(f"eval_log_{self.agent_id}.jsonl"), ("json", None))
+        self._sinks.setdefault(self._output_path(f"eval_log_{self.agent_id}.csv"), ("csv", None))
+        oldest = self._ended - len(self.logs)
+        for path, (fmt, filename) in list(self._sinks.items()):
+            if self._written.get(path, 0) <= oldest:
+                getattr(self, f"to_{fmt}")(filename, append=True)
+
+    def _drain(self):
+        """Wartet, bis der Writer alle bisher beendeten Sessions übernommen hat."""
+        if self._writer is None or threading.current_thread() is self._writer:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def _output_path(self, filename: str) -> str:
+        # Output-Ordner erstellen falls nicht vorhanden
+        output_dir = os.path.join(self.log_dir, "output")
+        os.makedirs(output_dir, exist_ok=True)
+        return os.path.join(output_dir, filename)
+
+    def _pending_sessions(self, path: str, append: bool) -> tuple[list, int]:
+        """Sessions, die noch nicht in die Datei geschrieben wurden (bei append=False alle gepufferten), und der neue Stand."""
+        with self._lock:
+            first = self._ended - len(self.logs)
+            start = self._written.get(path, 0) if append else first
+            return list(itertools.islice(self.logs, max(0, start - first), None)), self._ended
+
+    @staticmethod
+    def _flat_attempts(sessions: list) -> list:
+        """Flache Struktur: jeder Versuch als eigene Zeile."""
+        return [
+            {
+                "session_id": session["session_id"],
+                "agent_id": session["agent_id"],
+                "user_question": session["user_question"],
+                "total_attempts": session["total_attempts"],
+                "final_success": session["final_success"],
+                "attempt_number": attempt["attempt_number"],
+                "attempt_timestamp": attempt["timestamp"],
+                "generated_sql": attempt["generated_sql"],
+                #"executed_sql": attempt["executed_sql"],
+                "execution_success": attempt["execution_success"],
+                "sql_result": attempt["sql_result"],
+                "natural_answer": session.get("final_answer")
+            }
+            for session in sessions
+            for attempt in session["attempts"]
+        ]
+
+    @staticmethod
+    def _flat_spans(sessions: list) -> list:
+        """Node-Spans (Tracing): eine Zeile pro Node-Aufruf."""
+        return [
+            {"session_id": session["session_id"], "agent_id": session["agent_id"],
+             "user_question": session["user_question"], **span}
+            for session in sessions
+            for span in session.get("spans", [])
+        ]
+
+    @staticmethod
+    def _write_csv(path: str, fieldnames: list, rows: list, append: bool):
+        """Schreibt Zeilen per csv.DictWriter; der Header nur, wenn die Datei neu angelegt wird."""
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        with open(path, "a" if append else "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+            if write_header:
+                writer.writeheader()
+            writer.writerows(rows)
+
     def to_csv(self, filename: str = None, append: bool = False):
         """
         Speichert die Logs als CSV in einem flachen Format für bessere Analyse.
-        Jeder Versuch wird als separate Zeile gespeichert.
+        Jeder Versuch wird als separate Zeile gespeichert, Node-Spans landen in eval_spans_<agent>.csv.
+        Mit append=True werden nur die seit dem letzten Schreiben beendeten Sessions angehängt.
         """
         if filename is None:
             filename = f"eval_log_{self.agent_id}.csv"
+        path = self._output_path(filename)
 
-        # Output-Ordner erstellen falls nicht vorhanden
-        output_dir = os.path.join(self.log_dir, "output")
-        os.makedirs(output_dir, exist_ok=True)
-        path = os.path.join(output_dir, filename)
-        
-        # Flache Struktur für CSV erstellen
-        flat_logs = []
-        for session in self.logs:
-            for attempt in session["attempts"]:
-                flat_entry = {
-                    "session_id": session["session_id"],
-                    "agent_id": session["agent_id"],
-                    "user_question": session["user_question"],
-                    "total_attempts": session["total_attempts"],
-                    "final_success": session["final_success"],
-                    "attempt_number": attempt["attempt_number"],
-                    "attempt_timestamp": attempt["timestamp"],
-                    "generated_sql": attempt["generated_sql"],
-                    #"executed_sql": attempt["executed_sql"],
-                    "execution_success": attempt["execution_success"],
-                    "sql_result": attempt["sql_result"],
-                    "natural_answer": session.get("final_answer")
-                }
-                flat_logs.append(flat_entry)
-        
-        df = pd.DataFrame(flat_logs)
-        
-        if append and os.path.exists(path):
-            df.to_csv(path, mode="a", header=False, index=False)
-        else:
-            df.to_csv(path, index=False)
+        root, ext = os.path.splitext(filename)
+        spans_name = f"eval_spans_{self.agent_id}.csv" if root == f"eval_log_{self.agent_id}" else f"{root}_spans{ext}"
+        spans_path = self._output_path(spans_name)
+
+        self._drain()
+        with self._write_lock:
+            if append:
+                self._sinks[path] = ("csv", filename)
+            sessions, end = self._pending_sessions(path, append)
+            self._write_csv(path, ATTEMPT_FIELDS, self._flat_attempts(sessions), append)
+            self._written[path] = end
+
+            sessions, end = self._pending_sessions(spans_path, append)
+            flat_spans = self._flat_spans(sessions)
+            if flat_spans:
+                self._write_csv(spans_path, SPAN_FIELDS, flat_spans, append)
+            self._written[spans_path] = end
 
     def to_json(self, filename: str = None, append: bool = False):
         """
-        Speichert die Logs als JSON mit der vollständigen Session-Struktur.
+        Speichert die Logs als JSON Lines (eine Zeile pro Session mit der vollständigen Session-Struktur).
+        Mit append=True werden nur neue Sessions ans Dateiende geschrieben, die bestehende Datei wird
+        weder gelesen noch neu geschrieben.
         """
         if filename is None:
-            filename = f"eval_log_{self.agent_id}.json"
-        
-        # Output-Ordner erstellen falls nicht vorhanden
-        output_dir = os.path.join(self.log_dir, "output")
-        os.makedirs(output_dir, exist_ok=True)
-        path = os.path.join(output_dir, filename)
-        
-        if append and os.path.exists(path):
-            # Bestehende Logs laden und erweitern
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    existing_logs = json.load(f)
-                combined_logs = existing_logs + self.logs
-            except (json.JSONDecodeError, FileNotFoundError):
-                combined_logs = self.logs
-        else:
-            combined_logs = self.logs
-        
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(combined_logs, f, ensure_ascii=False, indent=2)
+            filename = f"eval_log_{self.agent_id}.jsonl"
+        path = self._output_path(filename)
+
+        self._drain()
+        with self._write_lock:
+            if append:
+                self._sinks[path] = ("json", filename)
+            sessions, end = self._pending_sessions(path, append)
+            with open(path, "a" if append else "w", encoding="utf-8") as f:
+                for session in sessions:
+                    f.write(json.dumps(session, ensure_ascii=False, default=str) + "\n")
+            self._written[path] = end
+
+    def to_parquet(self, filename: str = None, append: bool = False):
+        """
+        Speichert die Versuche (flach wie in to_csv) als Parquet für die Analyse, benötigt pyarrow.
+        Parquet-Dateien lassen sich nicht erweitern: mit append=True wird pro Aufruf eine neue
+        part-Datei im Verzeichnis eval_log_<agent>_parquet/ geschrieben.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Für to_parquet wird das Paket 'pyarrow' benötigt (pip install pyarrow).") from e
+
+        if filename is None:
+            filename = f"eval_log_{self.agent_id}_parquet" if append else f"eval_log_{self.agent_id}.parquet"
+        path = self._output_path(filename)
+
+        self._drain()
+        with self._write_lock:
+            if append:
+                self._sinks[path] = ("parquet", filename)
+            sessions, end = self._pending_sessions(path, append)
+            rows = self._flat_attempts(sessions)
+            if append:
+                if rows:
+                    os.makedirs(path, exist_ok=True)
+                    part = os.path.join(path, f"part-{datetime.now():%Y%m%d_%H%M%S_%f}.parquet")
+                    pq.write_table(pa.Table.from_pylist(rows), part)
+            else:
+                pq.write_table(pa.Table.from_pylist(rows), path)
+            self._written[path] = end
+
+    def flush(self):
+        """Wartet auf den Writer und hängt alle neuen Sessions an die per stream_to() aktivierten Dateien an."""
+        self._drain()
+        for fmt in self.stream_formats:
+            getattr(self, f"to_{fmt}")(append=True)
+
+    def stream_to(self, *formats: str):
+        """
+        Aktiviert das Schreiben beim Session-Ende, z.B. stream_to("json", "csv").
+        Jede beendete Session wird vom Hintergrund-Writer angehängt (Aufwand nur für die neue Session).
+        Ohne Argumente wird das Streaming abgeschaltet.
+        """
+        unknown = [fmt for fmt in formats if fmt not in ("json", "csv", "parquet")]
+        if unknown:
+            raise ValueError(f"Unbekanntes Log-Format: {unknown}")
+        self.stream_formats = tuple(formats)
@@ -1,17 +1,23 @@
+from typing import Iterator, List
+
 from core.state import AgentState 
 from core.logger import EvalLogger
 
-def answer_from_result(state: AgentState) -> AgentState:
-    """Formuliert natürlich-sprachliche Antwort basierend auf SQL-Ergebnissen"""
+
+def _session_logger(state: AgentState) -> EvalLogger:
     agent_id = state.get('agent_id', 'default') 
     eval_logger = EvalLogger()
     eval_logger.agent_id = agent_id
     if eval_logger.current_session is not None:
         eval_logger.current_session["agent_id"] = agent_id
+    return eval_logger
+
 
-    sql_result = state.get("sql_result", "")
+def answer_messages(state: AgentState) -> List[dict]:
+    """Baut die Nachrichten für die Antwort aus Nutzerfrage und SQL-Ergebnis (bzw. dessen Zusammenfassung)."""
+    # Zusammenfassung aus summarize_result (feste Größe), sonst das gekürzte Ergebnis bzw. die Fehlermeldung
+    sql_result = state.get("sql_summary") or state.get("sql_result", "")
     question = state["messages"][-1].content
-    llm = state["llm"]
 
     system_prompt = (
         "You are a helpful assistant that converts SQL query results into natural language answers.\n"
@@ -29,16 +35,50 @@ def answer_from_result(state: AgentState) -> AgentState:
     "Formuliere eine verständliche Antwort basierend auf diesem Ergebnis."
 )
 
-    final_response = llm.invoke([
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
-    ])
+    ]
 
+
+def _apply_answer(state: AgentState, final_response) -> AgentState:
     natural_answer = final_response.content.strip()
     #print(f"\nAI: {natural_answer}")
 
     #State und logging
     state["natural_answer"] = natural_answer
-    eval_logger.log_final_answer(natural_answer)
+    _session_logger(state).log_final_answer(natural_answer)
+
+    return state
 
-    return state
\ No newline at end of file
+
+def answer_from_result(state: AgentState) -> AgentState:
+    """Formuliert natürlich-sprachliche Antwort basierend auf SQL-Ergebnissen"""
+    final_response = state["llm"].invoke(answer_messages(state))
+    return _apply_answer(state, final_response)
+
+
+async def aanswer_from_result(state: AgentState) -> AgentState:
+    """Async-Variante von answer_from_result (llm.ainvoke)."""
+    final_response = await state["llm"].ainvoke(answer_messages(state))
+    return _apply_answer(state, final_response)
+
+
+def stream_answer(state: AgentState) -> Iterator[str]:
+    """
+    Wie answer_from_result, liefert die Antwort aber stückweise über llm.stream, sobald das LLM sie erzeugt.
+    natural_answer und das Logging werden gesetzt, wenn der Stream vollständig gelesen wurde.
+    """
+    eval_logger = _session_logger(state)
+    llm = state["llm"]
+
+    parts = []
+    for chunk in llm.stream(answer_messages(state)):
+        text = str(getattr(chunk, "content", chunk) or "")
+        if text:
+            parts.append(text)
+            yield text
+
+    natural_answer = "".join(parts).strip()
+    state["natural_answer"] = natural_answer
+    eval_logger.log_final_answer(natural_answer)
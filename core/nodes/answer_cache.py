@@ -0,0 +1,59 @@
+from core.state import AgentState
+from core.logger import EvalLogger
+from core.answer_cache import get_answer_cache
+
+
+def check_answer_cache(state: AgentState) -> AgentState:
+    """
+    Sucht direkt nach identify_brand eine gespeicherte Antwort (Frage, Marken, agent_id, Datumsfenster).
+    Bei einem Treffer werden SQL, Ergebnis und Antwort übernommen und als (gecachter) Versuch geloggt;
+    route_after_answer_cache beendet den Graphen dann. Speichert answer_cache_key für store_answer_cache.
+    """
+    cache = get_answer_cache()
+    state["answer_cache_hit"] = False
+    if cache is None:
+        state["answer_cache_key"] = None
+        return state
+
+    key = cache.key(state["messages"][-1].content, state.get("brand", []), state.get("agent_id", "default"))
+    state["answer_cache_key"] = key
+    entry = cache.get(key)
+    if entry is None:
+        return state
+
+    state["answer_cache_hit"] = True
+    state["sql_query"] = entry["sql_query"]
+    state["generated_sql"] = entry["sql_query"]
+    state["sql_result"] = entry["sql_result"]
+    state["sql_total_rows"] = entry.get("sql_total_rows")
+    state["sql_failed"] = False
+    state["sql_error_type"] = ""
+    state["natural_answer"] = entry["natural_answer"]
+
+    eval_logger = EvalLogger()
+    if eval_logger.current_session is not None:
+        eval_logger.log_attempt(generated_sql=entry["sql_query"], execution_success=True,
+                                sql_result=entry["sql_result"], cached=True)
+        eval_logger.log_final_answer(entry["natural_answer"])
+
+    return state
+
+
+def route_after_answer_cache(state: AgentState) -> str:
+    return "hit" if state.get("answer_cache_hit", False) else "miss"
+
+
+def store_answer_cache(state: AgentState) -> AgentState:
+    """Speichert finale SQL, Ergebnis und Antwort unter answer_cache_key (nur erfolgreiche Antworten)."""
+    cache = get_answer_cache()
+    key = state.get("answer_cache_key")
+    if cache is None or not key or state.get("sql_failed", False) or state.get("answer_cache_hit", False):
+        return state
+
+    cache.set(key, {
+        "sql_query": state.get("sql_query", ""),
+        "sql_result": state.get("sql_result", ""),
+        "sql_total_rows": state.get("sql_total_rows"),
+        "natural_answer": state.get("natural_answer", ""),
+    })
+    return state
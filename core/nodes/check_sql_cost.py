@@ -0,0 +1,102 @@
+from typing import Callable, Optional
+
+from core.state import AgentState
+from core.backends import get_backend
+from core.sql_cache import get_sql_cache
+
+MAX_BYTES_PER_QUESTION = 10 * 1024**3  # Standard-Budget pro Frage: 10 GiB verarbeitete Bytes
+
+
+# austauschbar, z.B. durch eine lokale Schätzung in Tests: set_cost_estimator(lambda sql: 0)
+# None = Dry-Run des aktiven Ausführungs-Backends
+_cost_estimator: Optional[Callable[[str], int]] = None
+
+
+def set_cost_estimator(estimator: Optional[Callable[[str], int]]):
+    """Setzt die Funktion, die für eine SQL die zu verarbeitenden Bytes schätzt (None = Backend-Dry-Run)."""
+    global _cost_estimator
+    _cost_estimator = estimator
+
+
+def _format_bytes(num_bytes: int) -> str:
+    return f"{num_bytes / 1024**3:.2f} GB"
+
+
+def _is_cached(sql: str) -> bool:
+    # liegt das Ergebnis im SQL-Cache, fragt run_sql das Warehouse nicht an
+    sql_cache = get_sql_cache()
+    try:
+        return sql_cache is not None and sql_cache.peek(sql, namespace=get_backend().cache_namespace) is not None
+    except Exception:
+        return False  # Cache-Probleme sollen keine SQL ablehnen, dann eben mit Dry-Run
+
+
+def check_sql_cost(state: AgentState) -> AgentState:
+    """
+    Prüft die generierte SQL vor der Ausführung per Dry-Run gegen das Byte-Budget der Frage.
+    Bei Überschreitung (oder wenn der Dry-Run scheitert) wird die SQL nicht ausgeführt, sondern
+    als fehlgeschlagener Versuch markiert, sodass der bestehende Retry-Pfad greift.
+    Liegt das Ergebnis bereits im SQL-Cache, entfällt der Dry-Run (geschätzt: 0 Bytes).
+    Speichert:
+        - sql_bytes_estimate
+        - bei Ablehnung: sql_result, sql_failed, sql_error_type ("over_budget", "execution_error"), prev_sql(_error)
+    """
+    sql = state.get("sql_query", "")
+    try:
+        if _is_cached(sql):
+            return _apply_cost_estimate(state, sql, 0)
+        estimator = _cost_estimator or get_backend().dry_run
+        return _apply_cost_estimate(state, sql, estimator(sql))
+    except Exception as e:
+        return _apply_cost_estimate(state, sql, error=e)
+
+
+async def acheck_sql_cost(state: AgentState) -> AgentState:
+    """Async-Variante von check_sql_cost (backend.adry_run; ein gesetzter cost_estimator läuft direkt)."""
+    sql = state.get("sql_query", "")
+    try:
+        if _is_cached(sql):
+            return _apply_cost_estimate(state, sql, 0)
+        bytes_estimate = _cost_estimator(sql) if _cost_estimator else await get_backend().adry_run(sql)
+        return _apply_cost_estimate(state, sql, bytes_estimate)
+    except Exception as e:
+        return _apply_cost_estimate(state, sql, error=e)
+
+
+def _apply_cost_estimate(state: AgentState, sql: str, bytes_estimate: Optional[int] = None,
+                         error: Optional[Exception] = None) -> AgentState:
+    budget = state.get("max_bytes_budget") or MAX_BYTES_PER_QUESTION
+
+    error_text, error_type = "", ""
+    if error is not None:
+        state["sql_bytes_estimate"] = None
+        error_type = "execution_error"
+        error_text = f"Fehler bei der SQL-Ausführung (Dry-Run): {str(error)}"
+    else:
+        state["sql_bytes_estimate"] = bytes_estimate
+
+        if bytes_estimate > budget:
+            error_type = "over_budget"
+            error_text = (
+                f"Abfrage abgelehnt: sie würde {_format_bytes(bytes_estimate)} verarbeiten, "
+                f"das Budget pro Frage liegt bei {_format_bytes(budget)}. "
+                "Schränke Zeitraum, Spalten und Marken (_TABLE_SUFFIX) ein und vermeide SELECT *."
+            )
+
+    state["sql_failed"] = bool(error_type)
+    state["sql_error_type"] = error_type
+
+    if error_type:
+        state["sql_result"] = error_text
+        state["sql_result_frame"] = None
+        state["sql_total_rows"] = None
+        state["prev_sql_error"] = error_text
+        state["prev_sql"] = sql
+        print(f"\n[SQL Result - Fehler ({error_type})]")
+
+    return state
+
+
+def route_after_cost_check(state: AgentState) -> str:
+    """Abgelehnte SQL geht direkt zum Logging (und damit ggf. in den Retry), sonst zur Ausführung."""
+    return "rejected" if state.get("sql_failed", False) else "run"
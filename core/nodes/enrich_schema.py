@@ -1,6 +1,5 @@
-import json
-import os
 from core.state import AgentState
+from core.context_store import get_context_store
 
 def enrich_schema(state: AgentState) -> AgentState:
     """
@@ -9,22 +8,8 @@ def enrich_schema(state: AgentState) -> AgentState:
     Ergebnis wird in `state["enriched_schema"]` gespeichert.
     """
 
-    # --- JSON laden ---
-    current_dir = os.path.dirname(os.path.abspath(__file__))  # agent/core/nodes/
-    core_dir = os.path.dirname(current_dir)
-    metadata_path = os.path.join(core_dir, "context", "attributes.json")
-
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        attributes_list = json.load(f)
-
-    # --- schnelle Lookup-Struktur ---
-    attribute_lookup = {
-        item["attribute_name"]: {
-            "description": item.get("description", ""),
-            "value_examples": item.get("value_examples", [])
-        }
-        for item in attributes_list
-    }
+    # --- schnelle Lookup-Struktur (aus dem ContextStore, nur bei Dateiänderung neu aufgebaut) ---
+    attribute_lookup = get_context_store().attribute_lookup()
 
     schema_list = state.get("schema", [])
     enriched_schema = []
@@ -0,0 +1,25 @@
+from core.state import AgentState
+from core.context_store import get_context_store
+import itertools
+
+def expand_table_names(state: AgentState) -> AgentState:
+    """Erzeugt aus Marken und relevanten Basis-Tabellen die vollständigen BigQuery-Tabellennamen."""
+    table_lookup = get_context_store().table_lookup()
+
+    #Tabellennamen für state
+    brands = state.get("brand", [])
+    state["bq_tables"] = []
+    state["bq_base_tables"] = []
+
+    for brand, base_name in itertools.product(brands, state.get("relevant_tables", [])):
+        suffix = table_lookup.get(base_name, {}).get("suffix", "")
+        table_full = f"bachelor_mlh.{base_name}_{brand}{suffix}"
+        #vollständige namen
+        state["bq_tables"].append(table_full)
+        # Namen mit Wildcard für Multi-Brand (nur einmal pro base_name)
+        base_wildcard = f"bachelor_mlh.{base_name}_*{suffix}"
+        if base_wildcard not in state["bq_base_tables"]:
+            state["bq_base_tables"].append(base_wildcard)
+
+    #print(f"[Full BigQuery Tables] {state['bq_tables']}")
+    return state
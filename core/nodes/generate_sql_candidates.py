@@ -0,0 +1,212 @@
+import asyncio
+import contextvars
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+
+from core.state import AgentState
+from core.nodes.validate_sql import validate_sql
+from core.nodes.check_sql_cost import check_sql_cost, acheck_sql_cost
+from core.nodes.run_sql import execute_sql, aexecute_sql, _apply_sql_result
+
+# Prompt-Varianten für die Kandidaten (Kandidat i nutzt Variante i mod len)
+SQL_VARIANT_HINTS = [
+    "",
+    "Bevorzuge eine möglichst einfache Abfrage, ideal mit nur einer Tabelle und ohne Unterabfragen.",
+    "Prüfe jeden Spaltennamen gegen die Schema-Übersicht und nutze CTEs (WITH) für Zwischenschritte.",
+    "Schränke den Zeitraum explizit über die Spalte date ein und wähle nur die benötigten Spalten aus.",
+]
+SELECTION_MODES = ("first_valid", "majority")
+
+
+def _generate_and_check(generate_node: Callable[[dict], dict], state: AgentState, hint: str,
+                        cancelled: Optional[threading.Event] = None) -> Optional[AgentState]:
+    """
+    Ein Kandidat: SQL generieren, statisch prüfen und per Dry-Run gegen das Budget prüfen (auf einer Kopie des States).
+    Ist cancelled gesetzt, werden LLM-Aufruf bzw. Dry-Run gar nicht erst gestartet (Ergebnis None).
+    """
+    if cancelled is not None and cancelled.is_set():
+        return None
+    candidate = dict(state)
+    candidate["sql_variant_hint"] = hint
+    candidate = generate_node(candidate)
+    candidate = validate_sql(candidate)
+    if cancelled is not None and cancelled.is_set():
+        return None
+    if not candidate.get("sql_failed", False):
+        candidate = check_sql_cost(candidate)
+    return candidate
+
+
+async def _agenerate_and_check(generate_node: Callable[[dict], dict], state: AgentState, hint: str) -> AgentState:
+    """Async-Variante von _generate_and_check."""
+    candidate = dict(state)
+    candidate["sql_variant_hint"] = hint
+    candidate = await generate_node(candidate)
+    candidate = validate_sql(candidate)
+    if not candidate.get("sql_failed", False):
+        candidate = await acheck_sql_cost(candidate)
+    return candidate
+
+
+def _result_fingerprint(result: dict) -> str:
+    """
+    Fingerprint eines Abfrageergebnisses (Spalten und Werte); Fehler ergeben keinen Fingerprint.
+    Nicht hashbare Zellen (ARRAY/STRUCT als list/dict) werden als Text gehasht, notfalls zählt result_text.
+    """
+    if result["is_error"]:
+        return ""
+    frame = result["frame"]
+    if frame is None:
+        return result["result_text"]
+    import pandas as pd
+    columns = "|" + ",".join(map(str, frame.columns))
+    try:
+        return str(int(pd.util.hash_pandas_object(frame, index=False).sum())) + columns
+    except TypeError:
+        pass
+    try:
+        return str(int(pd.util.hash_pandas_object(frame.astype(str), index=False).sum())) + columns
+    except Exception:
+        return result["result_text"]
+
+
+def _hints(n_candidates: int) -> List[str]:
+    return [SQL_VARIANT_HINTS[i % len(SQL_VARIANT_HINTS)] for i in range(n_candidates)]
+
+
+def _valid(candidates: List[Optional[AgentState]]) -> List[AgentState]:
+    return [c for c in candidates if c is not None and not c.get("sql_failed", False)]
+
+
+def _majority(valid: List[AgentState], fingerprints: List[str]) -> int:
+    """Index (in valid) des ersten Kandidaten der größten Gruppe gleicher Ergebnis-Fingerprints (bei Gleichstand der frühere)."""
+    groups = {}
+    for i, fingerprint in enumerate(fingerprints):
+        if fingerprint:
+            groups.setdefault(fingerprint, []).append(i)
+    return max(groups.values(), key=len)[0] if groups else 0
+
+
+def make_generate_sql_candidates(generate_node: Callable[[dict], dict], n_candidates: int = 3,
+                                 selection: str = "first_valid") -> Callable[[AgentState], AgentState]:
+    """
+    Erzeugt einen Node, der n_candidates SQL-Kandidaten mit unterschiedlichen Prompt-Varianten parallel
+    generiert und jeweils validiert und per Dry-Run prüft (ersetzt generate -> validate_sql -> check_sql_cost).
+    selection:
+        "first_valid" - der erste gültige Kandidat gewinnt, die übrigen werden abgebrochen bzw. verworfen
+        "majority"    - alle gültigen Kandidaten werden ausgeführt; gewählt wird die größte Gruppe mit
+                        gleichem Ergebnis-Fingerprint (bei Gleichstand der frühere Kandidat). Dessen Ergebnis
+                        wird direkt in den State übernommen (wie run_sql) und der Graph geht an run_sql
+                        vorbei (build_agent_graph), die gewählte SQL läuft also nicht zweimal.
+                        Achtung: bis zu n_candidates Abfragen pro Frage auf dem Warehouse (Kosten!).
+    Ist kein Kandidat gültig, geht der erste mit seinem Fehler weiter (Logging bzw. Retry wie bisher).
+    Speichert zusätzlich sql_candidates (SQL, Variante, Fehlertyp je Kandidat).
+    Ist generate_node ein Async-Node, ist auch der erzeugte Node async (Kandidaten als Tasks im Event-Loop).
+    Abbruch bei "first_valid": im Async-Node werden laufende Kandidaten-Tasks gecancelt. Im Sync-Node lassen sich
+    laufende LLM-Aufrufe nicht unterbrechen; ein gemeinsames Abbruch-Flag verhindert aber, dass übrige Kandidaten
+    danach noch einen LLM-Aufruf oder einen Dry-Run starten (ihr Ergebnis wird verworfen).
+    """
+    if selection not in SELECTION_MODES:
+        raise ValueError(f"Unbekannter Auswahlmodus '{selection}', erlaubt: {SELECTION_MODES}")
+
+    def generate_sql_candidates(state: AgentState) -> AgentState:
+        hints = _hints(n_candidates)
+        candidates: List[AgentState] = [None] * n_candidates
+        chosen = None
+        cancelled = threading.Event()
+
+        executor = ThreadPoolExecutor(max_workers=n_candidates)
+        try:
+            futures = {
+                executor.submit(contextvars.copy_context().run, _generate_and_check, generate_node, state, hint,
+                                cancelled): i
+                for i, hint in enumerate(hints)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    candidates[i] = future.result()
+                except Exception as e:
+                    print(f"[Warning] SQL-Kandidat {i + 1} fehlgeschlagen: {e}")
+                    continue
+                if selection == "first_valid" and not candidates[i].get("sql_failed", False):
+                    chosen = candidates[i]
+                    break
+        finally:
+            # restliche Kandidaten abbrechen: noch nicht gestartete verwerfen, laufende per Flag stoppen
+            # (ein bereits laufender LLM-Aufruf läuft noch zu Ende, wird aber nicht mehr abgewartet)
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        valid = _valid(candidates)
+        result = None
+        if selection == "majority" and valid:
+            with ThreadPoolExecutor(max_workers=len(valid)) as execute_executor:
+                results = list(execute_executor.map(lambda c: execute_sql(c["sql_query"]), valid))
+            best = _majority(valid, [_result_fingerprint(r) for r in results])
+            chosen, result = valid[best], results[best]
+
+        return _apply_choice(state, candidates, chosen, valid, result)
+
+    async def agenerate_sql_candidates(state: AgentState) -> AgentState:
+        async def indexed(i: int, hint: str):
+            try:
+                return i, await _agenerate_and_check(generate_node, state, hint)
+            except Exception as e:
+                print(f"[Warning] SQL-Kandidat {i + 1} fehlgeschlagen: {e}")
+                return i, None
+
+        candidates: List[AgentState] = [None] * n_candidates
+        chosen = None
+
+        tasks = [asyncio.ensure_future(indexed(i, hint)) for i, hint in enumerate(_hints(n_candidates))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                i, candidates[i] = await next_done
+                if selection == "first_valid" and candidates[i] is not None and not candidates[i].get("sql_failed", False):
+                    chosen = candidates[i]
+                    break
+        finally:
+            # hier lassen sich auch laufende LLM-Aufrufe abbrechen
+            for task in tasks:
+                task.cancel()
+
+        valid = _valid(candidates)
+        result = None
+        if selection == "majority" and valid:
+            results = await asyncio.gather(*(aexecute_sql(c["sql_query"]) for c in valid))
+            best = _majority(valid, [_result_fingerprint(r) for r in results])
+            chosen, result = valid[best], results[best]
+
+        return _apply_choice(state, candidates, chosen, valid, result)
+
+    def _apply_choice(state: AgentState, candidates: List[AgentState], chosen: Optional[AgentState],
+                      valid: List[AgentState], result: Optional[dict] = None) -> AgentState:
+        if chosen is None:
+            chosen = next((c for c in candidates if c is not None), None)
+        if chosen is None:
+            raise RuntimeError("Kein SQL-Kandidat konnte generiert werden.")
+
+        state.update(chosen)
+        state["sql_variant_hint"] = None
+        state["sql_candidates"] = [
+            {
+                "variant": i,
+                "sql": c.get("sql_query", "") if c is not None else None,
+                "error_type": c.get("sql_error_type", "") if c is not None else "not_finished",
+                "chosen": c is chosen,
+            }
+            for i, c in enumerate(candidates)
+        ]
+        print(f"[SQL-Kandidaten] {sum(c is not None for c in candidates)}/{n_candidates} fertig, "
+              f"{len(valid)} gültig, gewählt: Variante {next(i for i, c in enumerate(candidates) if c is chosen)}")
+        if result is not None:
+            # Ergebnis der Mehrheitswahl übernehmen, statt die SQL in run_sql erneut auszuführen
+            _apply_sql_result(state, state.get("sql_query", ""), result)
+        return state
+
+    if inspect.iscoroutinefunction(generate_node):
+        return agenerate_sql_candidates
+    return generate_sql_candidates
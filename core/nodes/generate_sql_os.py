@@ -1,12 +1,13 @@
 from core.state import AgentState
+from typing import List
+from core.schema_render import render_schema, SCHEMA_TOKEN_BUDGET
 from datetime import date
 #from collections import defaultdict
 import re
 import json
 
-def generate_sql_os(state: AgentState) -> AgentState:
-    """Generiert SQL basierend auf der Nutzerfrage, Teilschema oder Basic-Schema und JOIN-Informationen"""
-    llm = state["llm"]
+def generate_sql_os_messages(state: AgentState) -> List[dict]:
+    """Baut System- und User-Prompt für generate_sql_os (setzt dabei schema_render_info)."""
     brands = state["brand"]
     bq_tables = state.get("bq_tables", []) 
     bq_base_tables = state.get("bq_base_tables", [])
@@ -84,19 +85,28 @@ def generate_sql_os(state: AgentState) -> AgentState:
 
     # Schema-Informationen hinzufügen
     if schema_to_use:
-        user_prompt += f"Schema-Übersicht:\n{schema_to_use}\n"
+        # kompakte Textform mit Token-Budget statt repr() der Dict-Liste
+        schema_text, render_info = render_schema(schema_to_use, state.get("schema_token_budget") or SCHEMA_TOKEN_BUDGET)
+        state["schema_render_info"] = render_info
+        user_prompt += f"Schema-Übersicht:\n{schema_text}\n"
     else:
         user_prompt += "Keine Schema-Informationen verfügbar\n"
 
     if join_options:
         user_prompt += f"JOIN-Informationen:\n{join_options}\n"
 
-    # === LLM AUFRUF ===
-    sql_response = llm.invoke([
+    # Prompt-Variante bei mehreren parallelen Kandidaten (siehe generate_sql_candidates)
+    if state.get("sql_variant_hint"):
+        user_prompt += f"Zusätzlicher Hinweis: {state['sql_variant_hint']}\n"
+
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
-    ])
+    ]
 
+
+def _apply_sql_response(state: AgentState, sql_response) -> AgentState:
+    """Extrahiert die SQL aus der LLM-Antwort und schreibt sie in den State."""
     # --- SQL extraction (no JSON expected with os-prompting) ---
     response_text = (sql_response.content or "").strip()
 
@@ -127,4 +137,16 @@ def generate_sql_os(state: AgentState) -> AgentState:
     state["sql_query"] = sql_text
     state["generated_sql"] = sql_text
 
-    return state
\ No newline at end of file
+    return state
+
+
+def generate_sql_os(state: AgentState) -> AgentState:
+    """Generiert SQL basierend auf der Nutzerfrage, Teilschema oder Basic-Schema und JOIN-Informationen"""
+    sql_response = state["llm"].invoke(generate_sql_os_messages(state))
+    return _apply_sql_response(state, sql_response)
+
+
+async def agenerate_sql_os(state: AgentState) -> AgentState:
+    """Async-Variante von generate_sql_os (llm.ainvoke)."""
+    sql_response = await state["llm"].ainvoke(generate_sql_os_messages(state))
+    return _apply_sql_response(state, sql_response)
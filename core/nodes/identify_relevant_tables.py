@@ -1,11 +1,12 @@
 from core.state import AgentState
+from core.context_store import get_context_store
+from core.retrieval import retrieve_tables, TABLE_TOP_K
+from core.nodes.expand_table_names import expand_table_names
+from typing import List, Tuple
 import json
-import os
-import itertools
 
-def identify_relevant_tables(state: AgentState) -> AgentState:
-    """Identifiziert relevante Tabellen basierend auf der Nutzerfrage."""
-    llm = state["llm"]
+def identify_relevant_tables_messages(state: AgentState) -> Tuple[List[dict], List[dict]]:
+    """Baut System- und User-Prompt; gibt sie zusammen mit den Kandidaten-Tabellen (Metadaten) zurück."""
     user_question = state["messages"][-1].content
 
     retry_note = ""
@@ -17,13 +18,19 @@ def identify_relevant_tables(state: AgentState) -> AgentState:
         "Überdenke ggf. die Tabellenauswahl.\n\n"
         )
 
-    #pfad
-    current_dir = os.path.dirname(os.path.abspath(__file__))  # agent/core/nodes/
-    core_dir = os.path.dirname(current_dir)  # agent/core/
-    metadata_path = os.path.join(core_dir, "context", "tables_enriched.json") #hier wahlweise für agent c und d auch tables.json
-    
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        table_metadata = json.load(f)
+    # Metadaten aus dem prozessweiten ContextStore (hier wahlweise für agent c und d auch tables.json)
+    context_store = get_context_store()
+    table_lookup = context_store.table_lookup()
+
+    # Vorauswahl per BM25: nur die top-k Kandidaten gehen in den Prompt (Prompt-Größe unabhängig vom Katalog)
+    top_k = state.get("table_top_k") or TABLE_TOP_K
+    table_metadata = retrieve_tables(user_question, top_k)
+    # beim Retry die zuvor gewählten Tabellen als Kandidaten behalten
+    candidate_names = {table["table_name"] for table in table_metadata}
+    for name in state.get("relevant_tables", []):
+        if name in table_lookup and name not in candidate_names:
+            table_metadata = table_metadata + [table_lookup[name]]
+            candidate_names.add(name)
 
     system_prompt = (
     "You are a SQL expert working with BigQuery datasets. Your task is to identify the relevant tables needed to answer a user question, based on a list of available tables and their descriptions.\n"
@@ -38,39 +45,41 @@ def identify_relevant_tables(state: AgentState) -> AgentState:
 
     user_prompt = retry_note + f"Frage: {user_question}\n\nmögliche Tabellen:\n{json.dumps(table_metadata, indent=2, ensure_ascii=False)}"
 
-    response = llm.invoke([
+    messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
-    ])
+    ]
+    return messages, table_metadata
+
+
+def _apply_tables_response(state: AgentState, response, table_metadata: List[dict]) -> AgentState:
+    """Übernimmt die gültigen Tabellen aus der LLM-Antwort (sonst alle Kandidaten)."""
+    table_lookup = get_context_store().table_lookup()
 
     # Nur gültige table_names aus der Metadaten behalten
-    valid_table_names = {table['table_name'] for table in table_metadata}
     raw_tables = [t.strip() for t in response.content.split(",") if t.strip()]
-    tables = [t for t in raw_tables if t in valid_table_names]
-    # Falls keine gültigen Tabellen gefunden wurden, alle verfügbaren Tabellen als Fallback
+    tables = [t for t in raw_tables if t in table_lookup]
+    # Falls keine gültigen Tabellen gefunden wurden, alle Kandidaten-Tabellen als Fallback
     if not tables:
         tables = [table['table_name'] for table in table_metadata]
-        print(f"[Warning] Keine gültigen Tabellen identifiziert, verwende alle verfügbaren Tabellen: {tables}")
+        print(f"[Warning] Keine gültigen Tabellen identifiziert, verwende alle Kandidaten-Tabellen: {tables}")
     
-    #Tabellennamen für state
-    brands = state["brand"]
-    state["bq_tables"] = []
-    state["bq_base_tables"] = []
+    state["relevant_tables"] = tables
+    #print(f"\n[Relevant Tables] {tables}")
 
-    # Dictionary für schnellen Zugriff auf Suffixe
-    suffix_lookup = {entry["table_name"]: entry.get("suffix", "") for entry in table_metadata}
+    # vollständige Tabellennamen (braucht die Marken; im parallelen Graphen erst nach dem Join)
+    return expand_table_names(state)
 
-    for brand, base_name in itertools.product(brands, tables):
-        suffix = suffix_lookup.get(base_name, "")
-        table_full = f"bachelor_mlh.{base_name}_{brand}{suffix}"
-        #vollständige namen
-        state["bq_tables"].append(table_full)
-        # Namen mit Wildcard für Multi-Brand (nur einmal pro base_name)
-        base_wildcard = f"bachelor_mlh.{base_name}_*{suffix}"
-        if base_wildcard not in state["bq_base_tables"]:
-            state["bq_base_tables"].append(base_wildcard)
 
-    state["relevant_tables"] = tables
-    #print(f"\n[Relevant Tables] {tables}")
-    #print(f"[Full BigQuery Tables] {state['bq_tables']}")
-    return state
\ No newline at end of file
+def identify_relevant_tables(state: AgentState) -> AgentState:
+    """Identifiziert relevante Tabellen basierend auf der Nutzerfrage."""
+    messages, table_metadata = identify_relevant_tables_messages(state)
+    response = state["llm"].invoke(messages)
+    return _apply_tables_response(state, response, table_metadata)
+
+
+async def aidentify_relevant_tables(state: AgentState) -> AgentState:
+    """Async-Variante von identify_relevant_tables (llm.ainvoke)."""
+    messages, table_metadata = identify_relevant_tables_messages(state)
+    response = await state["llm"].ainvoke(messages)
+    return _apply_tables_response(state, response, table_metadata)
@@ -1,28 +1,14 @@
-from google.cloud import bigquery
-import itertools
-import json
 #import importlib.resources
-import os
 
 from core.state import AgentState
+from core.context_store import get_context_store
 
 def load_schema(state: AgentState) -> AgentState:
     """Lädt Schema-Informationen für die relevanten Tabellen und Marken aus lokaler JSON-Datei."""
     table_names = state.get("relevant_tables", [])
 
-    #pfad
-    current_dir = os.path.dirname(os.path.abspath(__file__))  # agent/core/nodes/
-    core_dir = os.path.dirname(current_dir)  # agent/core/
-    schema_path = os.path.join(core_dir, "context", "schema.json")
-
-    #öffnen
-    with open(schema_path, "r", encoding="utf-8") as f:
-        all_schemas = json.load(f)
-
-    relevant_schemas = {}
-    for schema_entry in all_schemas:
-        if schema_entry["table_name"] in table_names:
-            relevant_schemas[schema_entry["table_name"]] = schema_entry
+    # table_name -> Schema-Eintrag (einmal pro Prozess bzw. Dateiänderung aufgebaut)
+    relevant_schemas = get_context_store().schema_lookup()
 
     state["schema"] = []
 
@@ -1,45 +1,87 @@
 from core.state import AgentState 
+from core.context_store import get_context_store
 
 #import importlib.resources
 import json
-import os
+import itertools
 
 def load_table_relationships(state: AgentState) -> AgentState:
-    """Lädt JOIN-Informationen für die relevanten Tabellen und speichert sie strukturiert im State."""
+    """
+    Lädt JOIN-Informationen für die relevanten Tabellen und speichert sie strukturiert im State.
+    Tabellenpaare ohne direkten JOIN werden über den kürzesten Pfad mit Brückentabellen verbunden,
+    aber nur, wenn sie nicht schon über bisher gewählte JOINs (inkl. früherer Brücken) verbunden sind.
+    So kommt für dieselbe Tabellenmenge nicht je Paar eine andere Brücke hinzu.
+    """
     relevant_tables = state.get("relevant_tables", [])
 
-    # Lade JOIN-Metadaten
+    # Lade JOIN-Index (table_name -> JOIN-Definitionen) und die vorberechneten JOIN-Pfade
+    context_store = get_context_store()
     try:
-        #pfad
-        current_dir = os.path.dirname(os.path.abspath(__file__))  # agent/core/nodes/
-        core_dir = os.path.dirname(current_dir)  # agent/core/
-        relationship_path = os.path.join(core_dir, "context", "relationships.json")
-        
-        #print(f"Suche Datei hier: {metadata_path}")
-        with open(relationship_path, "r", encoding="utf-8") as f:
-            relationship_metadata = json.load(f)
+        joins_by_table = context_store.joins_by_table()
+        join_graph = context_store.join_graph()
+        join_paths = context_store.join_paths()
 
     except (FileNotFoundError, json.JSONDecodeError):
         state["relationship_info"] = []
         return state
 
+    relevant_set = set(relevant_tables)
     relevant_joins = []
+    seen = set()
 
-    for join_def in relationship_metadata:
-        try:
+    # Zusammenhangskomponenten der bisher gewählten JOINs (Union-Find)
+    components = {}
+
+    def find(table):
+        while components.get(table, table) != table:
+            table = components[table]
+        return table
+
+    def connect(table1, table2):
+        components[find(table1)] = find(table2)
+
+    for table in relevant_tables:
+        for join_def in joins_by_table.get(table, []):
+            if id(join_def) in seen:
+                continue
             tables_for_join = join_def.get("tables_for_join", [])
-            
+            table1, table2 = tables_for_join[0], tables_for_join[1]
+
             # Prüfe ob beide Tabellen in den relevanten Tabellen sind
-            if len(tables_for_join) >= 2:
-                table1, table2 = tables_for_join[0], tables_for_join[1]
-                
-                if table1 in relevant_tables and table2 in relevant_tables:
-                    # Füge das komplette JOIN-Objekt hinzu (keine Umformatierung)
-                    relevant_joins.append(join_def)
-                    
-        except (KeyError, IndexError):
-            continue
+            if table1 in relevant_set and table2 in relevant_set:
+                # Füge das komplette JOIN-Objekt hinzu (keine Umformatierung)
+                seen.add(id(join_def))
+                relevant_joins.append(join_def)
+                connect(table1, table2)
+
+    # Mehrstufige JOINs: Tabellenpaare ohne direkten JOIN über Brückentabellen verbinden
+    table_lookup = context_store.table_lookup()
+    for table1, table2 in itertools.combinations(relevant_tables, 2):
+        if find(table1) == find(table2):
+            continue  # schon verbunden (direkt, über relevante Tabellen oder eine frühere Brücke)
+        path = join_paths.get((table1, table2), [])
+        bridge_tables = [table for table in path[1:-1] if table not in relevant_set]
+        if not bridge_tables:
+            continue  # direkt verbunden, über andere relevante Tabellen verbunden oder gar nicht
+
+        for left, right in zip(path, path[1:]):
+            join_def = join_graph[left][right]
+            connect(left, right)
+            if id(join_def) not in seen:
+                seen.add(id(join_def))
+                relevant_joins.append(join_def)
+
+        bridge_bq_tables = []
+        for bridge in bridge_tables:
+            suffix = table_lookup.get(bridge, {}).get("suffix", "")
+            bridge_bq_tables.extend(f"bachelor_mlh.{bridge}_{brand}{suffix}" for brand in state.get("brand", []))
+            bridge_bq_tables.append(f"bachelor_mlh.{bridge}_*{suffix}")
 
+        relevant_joins.append({
+            "join_path": path,
+            "bridge_tables": bridge_tables,
+            "bridge_bq_tables": bridge_bq_tables,
+        })
 
     state["relationship_info"] = relevant_joins
 
@@ -1,38 +1,120 @@
+from datetime import datetime, time
+from typing import Optional, TYPE_CHECKING
+
 from core.state import AgentState
+from core.sql_cache import get_sql_cache
+from core.backends import get_backend
 
-from google.cloud import bigquery
+if TYPE_CHECKING:
+    import pandas as pd
 
-PROJECT_ID = "hier der projektname!" #korrekten namen für verbindung zu bq einfüllen
-bq_client = bigquery.Client(project=PROJECT_ID)
+MAX_FETCH_ROWS = 1000   # Obergrenze der heruntergeladenen Zeilen, unabhängig von der generierten SQL
+PREVIEW_ROWS = 25       # Zeilen in der Textdarstellung für Prompts und Logs
 
 
-def run_bigquery_sql(sql: str) -> tuple[str, bool, str]:
+def _format_value(value) -> str:
+    """NULLs als None, Datumswerte (datetime64 aus DATE-Spalten) ohne Uhrzeit 00:00:00."""
+    import pandas as pd
+
+    if value is None or value is pd.NA or value is pd.NaT:
+        return "None"
+    if isinstance(value, datetime) and value.tzinfo is None and value.time() == time(0):
+        return str(value.date())
+    return str(value)
+
+
+def render_result(frame: "pd.DataFrame", total_rows: Optional[int] = None, max_rows: int = PREVIEW_ROWS) -> str:
+    """Textdarstellung der ersten max_rows Zeilen (nur diese werden formatiert)."""
+    output = [", ".join(str(column) for column in frame.columns)]
+    for row in frame.head(max_rows).itertuples(index=False, name=None):
+        output.append(", ".join(_format_value(value) for value in row))
+
+    total_rows = len(frame) if total_rows is None else total_rows
+    if total_rows > max_rows:
+        output.append(f"... ({min(max_rows, len(frame))} von {total_rows} Zeilen angezeigt)")
+    return "\n".join(output)
+
+
+def execute_sql(sql: str) -> dict:
     """
-    Führt SQL auf BigQuery aus.
-    Returns:
-        result_text (str): Ausgabe oder Fehlermeldung
-        is_error (bool): True, wenn ein Fehler aufgetreten ist
-        error_type (str): Typ des Fehlers ("no_results", "execution_error")
+    Führt SQL auf dem aktiven Backend aus (bzw. holt das Ergebnis aus dem SQL-Cache) und gibt alle Ergebnisteile zurück:
+        result_text, is_error, error_type ("no_results", "execution_error"),
+        frame (pd.DataFrame | None), total_rows (int | None), bytes_processed (int | None)
+    Gleiche Abfragen (bis auf Whitespace, Schlüsselwort-Schreibweise, Semikolon) kommen aus dem SQL-Cache.
     """
+    backend = get_backend()
+    cached = _cached_result(backend, sql)
+    if cached is not None:
+        return cached
+
     try:
-        query_job = bq_client.query(sql)
-        result = query_job.result()
+        frame, total_rows, bytes_processed = backend.execute(sql, MAX_FETCH_ROWS)
+    except Exception as e:
+        return _store_result(backend, sql, error=e)
+    return _store_result(backend, sql, frame, total_rows, bytes_processed)
 
-        headers = result.schema
-        rows = list(result)
 
-        if not rows:
-            return "Die Abfrage ergab keine Ergebnisse.", True, "no_results"
+async def aexecute_sql(sql: str) -> dict:
+    """Async-Variante von execute_sql (backend.aexecute, bei BigQuery ohne blockierenden Thread pro Job)."""
+    backend = get_backend()
+    cached = _cached_result(backend, sql)
+    if cached is not None:
+        return cached
 
-        # Maximal 25 Zeilen zur Vorschau
-        output = [", ".join([field.name for field in headers])]
-        for row in rows[:25]:
-            output.append(", ".join([str(row[field.name]) for field in headers]))
+    try:
+        frame, total_rows, bytes_processed = await backend.aexecute(sql, MAX_FETCH_ROWS)
+    except Exception as e:
+        return _store_result(backend, sql, error=e)
+    return _store_result(backend, sql, frame, total_rows, bytes_processed)
 
-        return "\n".join(output), False, ""
 
-    except Exception as e:
-        return f"Fehler bei der SQL-Ausführung: {str(e)}", True, "execution_error"
+def _cached_result(backend, sql: str) -> Optional[dict]:
+    sql_cache = get_sql_cache()
+    return sql_cache.get(sql, namespace=backend.cache_namespace) if sql_cache is not None else None
+
+
+def _store_result(backend, sql: str, frame: Optional["pd.DataFrame"] = None, total_rows: Optional[int] = None,
+                  bytes_processed: Optional[int] = None, error: Optional[Exception] = None) -> dict:
+    """
+    Baut das Ergebnis-Dict (Text, Fehlertyp, Frame ...) und legt es im SQL-Cache ab.
+    Gecacht werden nur Ergebnisse und leere Ergebnisse; Ausführungsfehler (oft vorübergehend,
+    z.B. Quota oder Netzwerk) werden beim nächsten Aufruf erneut versucht.
+    """
+    if error is not None:
+        result_text, is_error, error_type = f"Fehler bei der SQL-Ausführung: {str(error)}", True, "execution_error"
+    elif total_rows == 0:
+        result_text, is_error, error_type = "Die Abfrage ergab keine Ergebnisse.", True, "no_results"
+    else:
+        try:
+            result_text, is_error, error_type = render_result(frame, total_rows), False, ""
+        except Exception as e:
+            result_text, is_error, error_type = f"Fehler bei der SQL-Ausführung: {str(e)}", True, "execution_error"
+
+    result = {
+        "result_text": result_text,
+        "is_error": is_error,
+        "error_type": error_type,
+        "frame": frame,
+        "total_rows": total_rows,
+        "bytes_processed": bytes_processed,
+    }
+    sql_cache = get_sql_cache()
+    if sql_cache is not None and error_type != "execution_error":
+        sql_cache.set(sql, result, namespace=backend.cache_namespace)
+
+    return result
+
+
+def run_bigquery_sql(sql: str) -> tuple[str, bool, str]:
+    """
+    Führt SQL auf BigQuery aus.
+    Returns:
+        result_text (str): Ausgabe oder Fehlermeldung
+        is_error (bool): True, wenn ein Fehler aufgetreten ist
+        error_type (str): Typ des Fehlers ("no_results", "execution_error")
+    """
+    result = execute_sql(sql)
+    return result["result_text"], result["is_error"], result["error_type"]
 
 
 def run_sql(state: AgentState) -> AgentState:
@@ -41,15 +123,29 @@ def run_sql(state: AgentState) -> AgentState:
     Speichert:
         - executed_sql
         - sql_result
+        - sql_result_frame
+        - sql_total_rows
         - sql_failed
         - sql_error_type
     """
     sql = state.get("sql_query", "")
     #state["executed_sql"] = sql
 
-    result_text, is_error, error_type = run_bigquery_sql(sql)
+    return _apply_sql_result(state, sql, execute_sql(sql))
+
+
+async def arun_sql(state: AgentState) -> AgentState:
+    """Async-Variante von run_sql (aexecute_sql)."""
+    sql = state.get("sql_query", "")
+    return _apply_sql_result(state, sql, await aexecute_sql(sql))
+
+
+def _apply_sql_result(state: AgentState, sql: str, result: dict) -> AgentState:
+    result_text, is_error, error_type = result["result_text"], result["is_error"], result["error_type"]
 
     state["sql_result"] = result_text
+    state["sql_result_frame"] = result.get("frame")
+    state["sql_total_rows"] = result.get("total_rows")
     state["sql_failed"] = is_error
     state["sql_error_type"] = error_type
 
@@ -63,4 +159,4 @@ def run_sql(state: AgentState) -> AgentState:
     #print(f"\n[SQL Result - {status} ({error_type})]\n{result_text}") 
     print(f"\n[SQL Result - {status}]")
 
-    return state
\ No newline at end of file
+    return state
@@ -1,18 +1,19 @@
 from core.state import AgentState
 import json
-from datetime import date
 from core.logger import EvalLogger
+from core.retrieval import preselect_columns, COLUMN_TOP_K
+from core.schema_render import render_schema, SCHEMA_TOKEN_BUDGET
 import re
 
-def select_schema(state: AgentState) -> AgentState:
-    """
-    Sammelt die relevanten Attribute pro Tabelle für die gegebene Frage im Format:
-    {"table_name": "rep_ga4_users_daily", "columns": [...]}
-    """
+def select_schema_messages(state: AgentState) -> list[dict]:
+    """Baut System- und User-Prompt mit den vorausgewählten Kandidaten-Spalten."""
     user_question = state["messages"][-1].content
-    llm = state["llm"]
     enriched_schema = state.get("enriched_schema", [])
 
+    # Vorauswahl: nur Schlüsselspalten + die top-k passendsten Spalten pro Tabelle gehen in den Prompt
+    candidate_schema = preselect_columns(user_question, enriched_schema, state.get("column_top_k") or COLUMN_TOP_K)
+    schema_text, _ = render_schema(candidate_schema, state.get("schema_token_budget") or SCHEMA_TOKEN_BUDGET)
+
     retry_note = ""
     if state.get("retry_count", 0) > 0 and state.get("prev_sql_error"):
         retry_note = (
@@ -39,13 +40,21 @@ def select_schema(state: AgentState) -> AgentState:
     )
 
     # === USER-PROMPT ===
-    user_prompt = retry_note + f"Nutzerfrage: {user_question}\n\nVerfügbare Tabellen und Spalten inkl Beschreibungen und Beispielwerten:\n{enriched_schema}\nBitte gib deine Auswahl ausschließlich im definierten JSON-Format zurück."
+    user_prompt = retry_note + f"Nutzerfrage: {user_question}\n\nVerfügbare Tabellen und Spalten inkl Beschreibungen und Beispielwerten (Format: tabelle( spalte TYP -- Beschreibung | Bsp: Beispielwerte )):\n{schema_text}\nBitte gib deine Auswahl ausschließlich im definierten JSON-Format zurück."
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def _apply_schema_response(state: AgentState, response) -> AgentState:
+    """Übernimmt die ausgewählten Spalten aus der LLM-Antwort; response=None oder ungültige Antwort -> Fallback."""
+    enriched_schema = state.get("enriched_schema", [])
 
     try:
-        response = llm.invoke([
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ])
+        if response is None:
+            raise ValueError("Keine Antwort vom LLM")
 
         response_text = response.content.strip()
         if response_text.startswith('```'):
@@ -58,9 +67,19 @@ def select_schema(state: AgentState) -> AgentState:
             raise ValueError("Antwort ist kein JSON-Array")
 
         # Weitere Validierung: Struktur prüfen
+        # Beschreibungen und Beispielwerte kommen aus dem enriched_schema (im Prompt ggf. gekürzt)
+        enriched_columns = {
+            (entry.get("table_name"), column.get("name")): column
+            for entry in enriched_schema for column in entry.get("columns", [])
+        }
         validated_schema = []
         for table_entry in selected_schema:
             if isinstance(table_entry, dict) and "table_name" in table_entry and "columns" in table_entry:
+                table_entry["columns"] = [
+                    enriched_columns.get((table_entry["table_name"], column.get("name")), column)
+                    if isinstance(column, dict) else column
+                    for column in table_entry["columns"]
+                ]
                 validated_schema.append(table_entry)
         
         if not validated_schema:
@@ -89,3 +108,24 @@ def select_schema(state: AgentState) -> AgentState:
         eval_logger.current_session["agent_id"] = agent_id
 
     return state
+
+
+def select_schema(state: AgentState) -> AgentState:
+    """
+    Sammelt die relevanten Attribute pro Tabelle für die gegebene Frage im Format:
+    {"table_name": "rep_ga4_users_daily", "columns": [...]}
+    """
+    try:
+        response = state["llm"].invoke(select_schema_messages(state))
+    except Exception:
+        response = None
+    return _apply_schema_response(state, response)
+
+
+async def aselect_schema(state: AgentState) -> AgentState:
+    """Async-Variante von select_schema (llm.ainvoke)."""
+    try:
+        response = await state["llm"].ainvoke(select_schema_messages(state))
+    except Exception:
+        response = None
+    return _apply_schema_response(state, response)
@@ -0,0 +1,132 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Optional, TYPE_CHECKING
+
+from core.state import AgentState
+from core.nodes.run_sql import render_result
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SAMPLE_ROWS = 5            # Beispielzeilen in der Zusammenfassung
+MAX_SUMMARY_COLUMNS = 20   # breitere Ergebnisse: weitere Spalten nur mit Namen
+TOP_VALUES = 3             # häufigste Werte pro Text-Spalte
+MAX_VALUE_CHARS = 40       # längere Werte werden abgeschnitten
+
+
+def _short(value) -> str:
+    text = str(value)
+    return text if len(text) <= MAX_VALUE_CHARS else text[:MAX_VALUE_CHARS - 1] + "…"
+
+
+def _number(value) -> str:
+    return f"{value:,.4g}" if isinstance(value, float) and not float(value).is_integer() else f"{value:,.0f}"
+
+
+def _date_columns(frame: "pd.DataFrame") -> List[str]:
+    """Spalten mit Datums-/Zeitwerten (datetime64 oder Python-date-Objekte, wie BigQuery DATE liefert)."""
+    import pandas as pd
+
+    columns = []
+    for column in frame.columns:
+        series = frame[column]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            columns.append(column)
+        elif series.dtype == object:
+            first = series.dropna().head(1)
+            if len(first) and isinstance(first.iloc[0], (date, datetime)):
+                columns.append(column)
+    return columns
+
+
+def _decimals_to_numeric(frame: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Object-Spalten, deren Werte alle Decimal sind, als Zahlen-Spalten. Die Backends liefern NUMERIC bereits
+    als float; das gilt für Frames aus eigenen Backends oder älteren Cache-Einträgen.
+    """
+    import pandas as pd
+
+    converted = None
+    for column in frame.columns:
+        series = frame[column]
+        if series.dtype != object:
+            continue
+        values = series.dropna()
+        if len(values) and all(isinstance(value, Decimal) for value in values):
+            converted = frame.copy() if converted is None else converted
+            converted[column] = pd.to_numeric(series, errors="coerce")
+    return frame if converted is None else converted
+
+
+def summarize_frame(frame: "pd.DataFrame", total_rows: Optional[int] = None, sample_rows: int = SAMPLE_ROWS) -> str:
+    """
+    Kompakte Zusammenfassung eines Abfrageergebnisses für den Antwort-Prompt (Größe unabhängig von der Zeilenzahl):
+    Zeilenzahl, pro Zahlen-Spalte min/max/Summe/Mittelwert, pro Text-Spalte die häufigsten Werte,
+    pro Datums-Spalte Zeitraum und Abdeckung, dazu einige Beispielzeilen.
+    Die Kennzahlen werden spaltenweise (vektorisiert) über alle abgeholten Zeilen berechnet.
+    """
+    import pandas as pd
+
+    total_rows = len(frame) if total_rows is None else total_rows
+    lines = [f"Zeilen: {total_rows}"]
+    if total_rows > len(frame):
+        lines.append(f"(Kennzahlen über die ersten {len(frame)} abgeholten Zeilen)")
+
+    columns = list(frame.columns[:MAX_SUMMARY_COLUMNS])
+    summarized = _decimals_to_numeric(frame[columns])
+    date_columns = set(_date_columns(summarized))
+    numeric_columns = [c for c in summarized.select_dtypes(include="number").columns if c not in date_columns]
+
+    numeric_stats = summarized[numeric_columns].agg(["min", "max", "sum", "mean"]) if numeric_columns else None
+
+    lines.append("Spalten:")
+    for column in columns:
+        series = summarized[column]
+        nulls = int(series.isna().sum())
+        null_text = f", {nulls} leer" if nulls else ""
+        if column in numeric_columns:
+            stats = numeric_stats[column]
+            lines.append(
+                f"- {column} (Zahl{null_text}): min {_number(stats['min'])}, max {_number(stats['max'])}, "
+                f"Summe {_number(stats['sum'])}, Mittel {_number(stats['mean'])}"
+            )
+        elif column in date_columns:
+            dates = pd.to_datetime(series, errors="coerce").dropna()
+            if dates.empty:
+                lines.append(f"- {column} (Datum{null_text}): keine Werte")
+                continue
+            start, end = dates.min(), dates.max()
+            span_days = (end.normalize() - start.normalize()).days + 1
+            covered_days = dates.dt.normalize().nunique()
+            lines.append(
+                f"- {column} (Datum{null_text}): {start.date()} bis {end.date()}, "
+                f"{covered_days} von {span_days} Tagen vorhanden"
+            )
+        else:
+            counts = series.astype(str).value_counts(dropna=True)
+            top = ", ".join(f"{_short(value)} ({count})" for value, count in counts.head(TOP_VALUES).items())
+            lines.append(f"- {column} (Text, {len(counts)} verschiedene{null_text}): {top}")
+
+    if len(frame.columns) > MAX_SUMMARY_COLUMNS:
+        rest = [str(c) for c in frame.columns[MAX_SUMMARY_COLUMNS:]]
+        lines.append(f"- weitere Spalten ohne Kennzahlen: {', '.join(rest)}")
+
+    lines.append(f"Beispielzeilen:\n{render_result(frame[columns], total_rows, max_rows=sample_rows)}")
+    return "\n".join(lines)
+
+
+def summarize_result(state: AgentState) -> AgentState:
+    """
+    Fasst das Ergebnis (sql_result_frame) für answer_from_result zusammen, statt es auf die ersten
+    Zeilen zu kürzen. Speichert sql_summary (None bei Fehlern oder ohne Frame -> Antwort aus sql_result).
+    """
+    frame = state.get("sql_result_frame")
+    state["sql_summary"] = None
+    if state.get("sql_failed", False) or frame is None or frame.empty:
+        return state
+
+    try:
+        state["sql_summary"] = summarize_frame(frame, state.get("sql_total_rows"))
+    except Exception as e:
+        print(f"[Warning] Ergebnis-Zusammenfassung fehlgeschlagen: {e}")
+    return state
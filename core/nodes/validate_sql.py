@@ -0,0 +1,63 @@
+from core.state import AgentState
+from core.context_store import get_context_store
+from core.sql_validator import validate_sql as validate_sql_statically
+import itertools
+
+
+def allowed_table_names(state: AgentState) -> dict:
+    """Vollständige Tabellennamen (bq_tables und Wildcards aus bq_base_tables) -> Basis-Tabellenname."""
+    table_lookup = get_context_store().table_lookup()
+    allowed = {}
+    for base_name in state.get("relevant_tables", []):
+        suffix = table_lookup.get(base_name, {}).get("suffix", "")
+        allowed[f"bachelor_mlh.{base_name}_*{suffix}"] = base_name
+        for brand in state.get("brand", []):
+            allowed[f"bachelor_mlh.{base_name}_{brand}{suffix}"] = base_name
+    # nur Namen, die auch wirklich im State stehen (bzw. als Brückentabelle eines JOIN-Pfads genannt sind)
+    listed = set(state.get("bq_tables", [])) | set(state.get("bq_base_tables", []))
+    allowed = {name: base for name, base in allowed.items() if name in listed}
+
+    for entry in state.get("relationship_info", []):
+        for base_name, name in itertools.product(entry.get("bridge_tables", []), entry.get("bridge_bq_tables", [])):
+            if name.startswith(f"bachelor_mlh.{base_name}_"):
+                allowed.setdefault(name, base_name)
+    return allowed
+
+
+def validate_sql(state: AgentState) -> AgentState:
+    """
+    Prüft die generierte SQL offline gegen die erlaubten Tabellen (bq_tables/bq_base_tables) und die
+    Spalten aus schema.json, bevor sie an BigQuery geht. Unbekannte Tabellen oder Spalten werden als
+    fehlgeschlagener Versuch markiert (sql_error_type "unknown_table"/"unknown_column"), die Fehlermeldung
+    nennt die unbekannten Bezeichner, damit der Retry-Prompt sie zitieren kann.
+    """
+    sql = state.get("sql_query", "")
+    table_columns = get_context_store().derived(
+        "schema.json", "table_columns",
+        lambda data: {entry["table_name"]: [c.get("name", "") for c in entry.get("columns", [])] for entry in data}
+    )
+
+    try:
+        result = validate_sql_statically(sql, allowed_table_names(state), table_columns)
+    except Exception as e:
+        # Die Prüfung darf nie eine gültige Abfrage blockieren
+        print(f"[Warning] Statische SQL-Prüfung fehlgeschlagen: {e}")
+        result = {"valid": True, "error_type": ""}
+
+    state["sql_failed"] = not result["valid"]
+    state["sql_error_type"] = result["error_type"]
+
+    if not result["valid"]:
+        state["sql_result"] = result["message"]
+        state["sql_result_frame"] = None
+        state["sql_total_rows"] = None
+        state["prev_sql_error"] = result["message"]
+        state["prev_sql"] = sql
+        print(f"\n[SQL Result - Fehler ({result['error_type']})]")
+
+    return state
+
+
+def route_after_validation(state: AgentState) -> str:
+    """Ungültige SQL geht direkt zum Logging (und damit ggf. in den Retry), sonst zur Kostenprüfung."""
+    return "invalid" if state.get("sql_failed", False) else "valid"
@@ -0,0 +1,192 @@
+import argparse
+import json
+import re
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from core.context_store import get_context_store
+
+TABLE_TOP_K = 10  # Anzahl Kandidaten-Tabellen, die identify_relevant_tables an das LLM weitergibt
+COLUMN_TOP_K = 30  # Anzahl Kandidaten-Spalten pro Tabelle, die select_schema an das LLM weitergibt
+KEY_COLUMNS = ("date", "product", "brand")  # werden unabhängig vom Score immer mitgegeben
+
+_TOKEN_RE = re.compile(r"[a-z0-9äöüß]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Kleinschreibung und Zerlegung an allem, was kein Buchstabe/Ziffer ist (auch '_' in Tabellennamen)."""
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def _flatten_text(value: Any) -> Iterable[str]:
+    """Sammelt alle String-Werte eines (verschachtelten) Metadaten-Eintrags."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _flatten_text(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            yield from _flatten_text(v)
+    elif value is not None:
+        yield str(value)
+
+
+class BM25Index:
+    """
+    Vorberechneter BM25-Index über eine Liste von Dokumenten.
+    Die Gewichtsmatrix (Dokumente x Vokabular) wird einmal aufgebaut, eine Anfrage ist dann
+    eine vektorisierte Summe über die Spalten der Anfrage-Terme.
+    """
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        tokenized = [tokenize(doc) for doc in documents]
+        self.vocabulary: Dict[str, int] = {}
+        for tokens in tokenized:
+            for token in tokens:
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+
+        n_docs, n_terms = len(tokenized), len(self.vocabulary)
+        tf = np.zeros((n_docs, n_terms), dtype=np.float32)
+        for i, tokens in enumerate(tokenized):
+            for token in tokens:
+                tf[i, self.vocabulary[token]] += 1.0
+
+        doc_len = tf.sum(axis=1, keepdims=True)
+        avg_len = float(doc_len.mean()) if n_docs else 0.0
+        df = (tf > 0).sum(axis=0)
+        idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1.0 - b + b * doc_len / (avg_len or 1.0))
+        self.weights = idf * tf * (k1 + 1.0) / (tf + norm)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25-Score jedes Dokuments für die Anfrage."""
+        term_ids = [self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary]
+        if not term_ids:
+            return np.zeros(self.weights.shape[0], dtype=np.float32)
+        return self.weights[:, term_ids].sum(axis=1)
+
+    def top_k(self, query: str, k: int) -> List[int]:
+        """Indizes der k besten Dokumente (absteigend nach Score, stabil bei Gleichstand)."""
+        scores = self.scores(query)
+        order = np.argsort(-scores, kind="stable")
+        return order[:k].tolist()
+
+
+def _build_table_index(table_metadata: List[dict]) -> BM25Index:
+    # Tabellenname + alle Beschreibungstexte der Tabelle als Dokument
+    documents = [" ".join(_flatten_text(entry)) for entry in table_metadata]
+    return BM25Index(documents)
+
+
+def retrieve_tables(question: str, k: int = TABLE_TOP_K) -> List[dict]:
+    """Gibt die k zur Frage passendsten Einträge aus tables_enriched.json zurück (Reihenfolge nach Score)."""
+    context_store = get_context_store()
+    table_metadata = context_store.tables()
+    if len(table_metadata) <= k:
+        return table_metadata
+
+    index = context_store.derived("tables_enriched.json", "bm25_index", _build_table_index)
+    return [table_metadata[i] for i in index.top_k(question, k)]
+
+
+def _build_attribute_index(attributes_list: List[dict]) -> tuple:
+    # Attributname + Beschreibung + Beispielwerte als Dokument; zusätzlich Name -> Zeilenindex
+    documents = [
+        " ".join([item["attribute_name"], item.get("description", "") or ""]
+                 + [str(v) for v in item.get("value_examples", []) or []])
+        for item in attributes_list
+    ]
+    positions = {item["attribute_name"]: i for i, item in enumerate(attributes_list)}
+    return BM25Index(documents), positions
+
+
+def preselect_columns(question: str, enriched_schema: List[dict], k: int = COLUMN_TOP_K) -> List[dict]:
+    """
+    Begrenzt die Spalten jeder Tabelle auf die Schlüsselspalten (KEY_COLUMNS) plus die k
+    zur Frage passendsten Spalten (BM25 über attributes.json). Tabellen mit höchstens k Spalten
+    bleiben unverändert. Die Spalten stehen danach nach Relevanz sortiert (Schlüsselspalten zuerst).
+    """
+    if all(len(entry.get("columns", [])) <= k for entry in enriched_schema):
+        return enriched_schema
+
+    index, positions = get_context_store().derived("attributes.json", "bm25_index", _build_attribute_index)
+    scores = index.scores(question)  # ein Score pro Attribut, einmal pro Frage
+
+    candidate_schema = []
+    for entry in enriched_schema:
+        columns = entry.get("columns", [])
+        if len(columns) <= k:
+            candidate_schema.append(entry)
+            continue
+
+        key_columns = [c for c in columns if c.get("name") in KEY_COLUMNS]
+        other_columns = [c for c in columns if c.get("name") not in KEY_COLUMNS]
+        column_scores = np.array(
+            [scores[positions[c.get("name")]] if c.get("name") in positions else 0.0 for c in other_columns],
+            dtype=np.float32
+        )
+        order = np.argsort(-column_scores, kind="stable")[:k]
+        candidate_schema.append({
+            **entry,
+            "columns": key_columns + [other_columns[i] for i in order]
+        })
+
+    return candidate_schema
+
+
+def build_indexes():
+    """Baut die BM25-Indizes für Tabellen und Spalten vorab auf (z.B. in warm_up)."""
+    context_store = get_context_store()
+    context_store.derived("tables_enriched.json", "bm25_index", _build_table_index)
+    context_store.derived("attributes.json", "bm25_index", _build_attribute_index)
+
+
+def gold_tables_from_sql(sql: str, table_names: Iterable[str]) -> List[str]:
+    """
+    Basis-Tabellen, die in einer Grundwahrheit-SQL (bachelor_mlh.<base>_<brand><suffix> oder
+    bachelor_mlh.<base>_*<suffix>) vorkommen. Längere Basisnamen werden zuerst versucht, damit
+    rep_ga4_sessions_daily_<brand> nicht auch rep_ga4_sessions zählt.
+    """
+    table_names = list(table_names)
+    if not sql or not table_names:
+        return []
+    alternatives = "|".join(re.escape(name) for name in sorted(table_names, key=len, reverse=True))
+    found = set(re.findall(rf"\bbachelor_mlh\.({alternatives})_[\w*]", sql))
+    return [name for name in table_names if name in found]
+
+
+def recall_at_k(questions: List[str], gold: List[List[str]], k: int) -> float:
+    """Anteil der Grundwahrheit-Tabellen, die unter den top-k Kandidaten sind (gemittelt über alle Fragen)."""
+    recalls = []
+    for question, gold_tables in zip(questions, gold):
+        if not gold_tables:
+            continue
+        candidates = {entry["table_name"] for entry in retrieve_tables(question, k)}
+        recalls.append(len(candidates & set(gold_tables)) / len(gold_tables))
+    return sum(recalls) / len(recalls) if recalls else 0.0
+
+
+def evaluate_table_recall(fragen_path: str, k_values: Sequence[int] = (3, 5, 10),
+                          question_key: str = "frage", sql_key: str = "sql") -> Dict[int, float]:
+    """Berechnet Recall@k des Tabellen-Retrievals auf dem Grundwahrheit-Datensatz (z.B. fragen.json)."""
+    with open(fragen_path, "r", encoding="utf-8") as f:
+        fragen = json.load(f)
+
+    table_names = list(get_context_store().table_lookup())
+    questions = [item[question_key] for item in fragen]
+    gold = [gold_tables_from_sql(item.get(sql_key, ""), table_names) for item in fragen]
+    return {k: recall_at_k(questions, gold, k) for k in k_values}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k des Tabellen-Retrievals")
+    parser.add_argument("fragen_path")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--question-key", default="frage")
+    parser.add_argument("--sql-key", default="sql")
+    args = parser.parse_args()
+
+    for k, recall in evaluate_table_recall(args.fragen_path, args.k, args.question_key, args.sql_key).items():
+        print(f"Recall@{k}: {recall:.3f}")
@@ -0,0 +1,115 @@
+from typing import Iterable, List, Optional, Tuple
+
+from core.retrieval import KEY_COLUMNS
+from core.tracing import CHARS_PER_TOKEN, estimate_tokens
+
+SCHEMA_TOKEN_BUDGET = 4000  # Standard-Budget (geschätzte Tokens) für die Schema-Übersicht eines Prompts
+MAX_VALUE_EXAMPLES = 3      # höchstens so viele Beispielwerte pro Spalte
+MAX_EXAMPLE_CHARS = 40      # längere Beispielwerte werden abgeschnitten
+
+
+def _short(value) -> str:
+    text = str(value)
+    return text if len(text) <= MAX_EXAMPLE_CHARS else text[:MAX_EXAMPLE_CHARS - 1] + "…"
+
+
+def _column_line(column: dict, with_description: bool, with_examples: bool) -> str:
+    line = f"  {column.get('name', '')} {column.get('type', '')}".rstrip()
+    parts = []
+    if with_description and column.get("description"):
+        parts.append(str(column["description"]).strip())
+    examples = column.get("value_examples") or []
+    if with_examples and examples:
+        parts.append("Bsp: " + ", ".join(_short(v) for v in examples[:MAX_VALUE_EXAMPLES]))
+    if parts:
+        line += " -- " + " | ".join(parts)
+    return line
+
+
+def render_schema(schema: List[dict], token_budget: Optional[int] = None,
+                  protected_columns: Iterable[str] = KEY_COLUMNS) -> Tuple[str, dict]:
+    """
+    Kompakte, DDL-artige Textform eines Schemas ([{"table_name", "columns": [...]}]) für Prompts:
+        rep_ga4_users_daily(
+          date DATE -- Datum | Bsp: 2025-06-24
+        )
+    Die Reihenfolge der Spalten gilt als Rang (vorne = relevanter). Überschreitet der Text das
+    Token-Budget, werden nacheinander Beispielwerte, dann Beschreibungen, dann die am niedrigsten
+    gerankten Spalten entfernt (jeweils von hinten; Spalten aus protected_columns bleiben immer).
+    Gibt (text, report) zurück; report nennt geschätzte Tokens und alles Entfernte als "tabelle.spalte".
+    """
+    protected = set(protected_columns)
+    # Zeilen pro Spalte: [Tabellen-Index, Rang, Spalte, mit Beschreibung, mit Beispielen, behalten]
+    entries = []
+    for table_index, table in enumerate(schema):
+        for rank, column in enumerate(table.get("columns", [])):
+            entries.append([table_index, rank, column, True, True, True])
+
+    def table_lines(table_index: int) -> Tuple[str, str]:
+        table = schema[table_index]
+        suffix = f" -- {table['error']}" if table.get("error") else ""
+        return f"{table.get('table_name', '')}({suffix}", ")"
+
+    fixed_chars = sum(len(line) + 1 for i in range(len(schema)) for line in table_lines(i))
+    line_chars = [len(_column_line(e[2], e[3], e[4])) + 1 for e in entries]
+    total_chars = fixed_chars + sum(line_chars)
+
+    report = {"budget": token_budget, "dropped_value_examples": [], "dropped_descriptions": [], "dropped_columns": []}
+
+    def qualified(entry) -> str:
+        return f"{schema[entry[0]].get('table_name', '')}.{entry[2].get('name', '')}"
+
+    if token_budget is not None:
+        budget_chars = token_budget * CHARS_PER_TOKEN
+        # niedrigster Rang zuerst (Rang-Position über alle Tabellen hinweg, hintere Tabellen zuerst)
+        order = sorted(range(len(entries)), key=lambda i: (entries[i][1], entries[i][0]), reverse=True)
+        for stage in ("value_examples", "descriptions", "columns"):
+            for i in order:
+                if total_chars <= budget_chars:
+                    break
+                entry = entries[i]
+                if not entry[5]:
+                    continue
+                if stage == "value_examples" and entry[4] and entry[2].get("value_examples"):
+                    entry[4] = False
+                    report["dropped_value_examples"].append(qualified(entry))
+                elif stage == "descriptions" and entry[3] and entry[2].get("description"):
+                    entry[3] = False
+                    report["dropped_descriptions"].append(qualified(entry))
+                elif stage == "columns" and entry[2].get("name") not in protected:
+                    entry[5] = False
+                    report["dropped_columns"].append(qualified(entry))
+                else:
+                    continue
+                new_chars = len(_column_line(entry[2], entry[3], entry[4])) + 1 if entry[5] else 0
+                total_chars += new_chars - line_chars[i]
+                line_chars[i] = new_chars
+
+    lines = []
+    position = 0
+    for table_index in range(len(schema)):
+        header, footer = table_lines(table_index)
+        lines.append(header)
+        while position < len(entries) and entries[position][0] == table_index:
+            entry = entries[position]
+            if entry[5]:
+                lines.append(_column_line(entry[2], entry[3], entry[4]))
+            position += 1
+        lines.append(footer)
+
+    text = "\n".join(lines)
+    report["tokens"] = estimate_tokens(text)
+    return text, report
+
+
+def describe_trimming(report: dict) -> str:
+    """Kurze Zusammenfassung für Logs, leer wenn nichts gekürzt wurde."""
+    dropped_columns = report.get("dropped_columns", [])
+    counts = (len(report.get("dropped_value_examples", [])), len(report.get("dropped_descriptions", [])), len(dropped_columns))
+    if not any(counts):
+        return ""
+    text = (f"Schema auf ~{report['tokens']} Tokens gekürzt (Budget {report['budget']}): "
+            f"{counts[0]} Beispielwerte, {counts[1]} Beschreibungen, {counts[2]} Spalten entfernt")
+    if dropped_columns:
+        text += f" ({', '.join(dropped_columns[:10])}{', …' if len(dropped_columns) > 10 else ''})"
+    return text
@@ -0,0 +1,137 @@
+import re
+import threading
+from typing import Optional
+
+from core.cache import LRUCache, SQLiteCache
+
+# SQL-Schlüsselwörter, die für den Cache-Schlüssel auf Großschreibung normalisiert werden
+SQL_KEYWORDS = {
+    "select", "from", "where", "group", "by", "order", "having", "limit", "offset", "as", "on",
+    "join", "inner", "left", "right", "full", "outer", "cross", "using", "and", "or", "not",
+    "in", "is", "null", "like", "between", "case", "when", "then", "else", "end", "distinct",
+    "union", "all", "intersect", "except", "with", "asc", "desc", "nulls", "first", "last",
+    "interval", "day", "week", "month", "quarter", "year", "date", "timestamp", "extract",
+    "cast", "safe_cast", "true", "false", "over", "partition", "rows", "range", "unnest",
+    "count", "sum", "avg", "min", "max", "lower", "upper", "round", "coalesce", "ifnull",
+    "date_trunc", "date_sub", "date_add", "date_diff", "format_date", "parse_date",
+    "current_date", "countif", "safe_divide", "qualify", "exists", "any_value",
+}
+
+# Reihenfolge ist wichtig: Kommentare und Literale vor Wörtern erkennen
+_TOKEN_RE = re.compile(
+    r"(?P<comment>--[^\n]*|#[^\n]*|/\*.*?\*/)"
+    # Präfixe r/b/rb/br (Raw-/Byte-Strings) und dreifache Anführungszeichen gehören zum Literal
+    r"|(?P<string>(?:[rR][bB]?|[bB][rR]?)?(?:'''.*?'''|\"\"\".*?\"\"\"|'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"))"
+    r"|(?P<quoted>`[^`]*`)"
+    # Zahlen samt Exponent (1e3, 2.5E-4) und Hex-Literale als ein Token
+    r"|(?P<number>0[xX][0-9A-Fa-f]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)"
+    r"|(?P<word>[A-Za-z_][A-Za-z_0-9]*)"
+    r"|(?P<space>\s+)"
+    r"|(?P<other>.)",
+    re.DOTALL
+)
+
+
+def iter_sql_tokens(sql: str):
+    """Zerlegt SQL in (Art, Text)-Tokens; Arten: comment, string, quoted, number, word, space, other."""
+    for match in _TOKEN_RE.finditer(sql or ""):
+        yield match.lastgroup, match.group(0)
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Kanonische Form einer SQL-Abfrage für den Cache-Schlüssel:
+    Schlüsselwörter in Großbuchstaben, Kommentare entfernt, Whitespace zu einem Leerzeichen
+    zusammengefasst, kein abschließendes Semikolon. String-Literale und Bezeichner bleiben unverändert.
+    """
+    parts = []
+    pending_space = False
+
+    for kind, token in iter_sql_tokens(sql):
+        if kind in ("comment", "space"):
+            pending_space = True
+            continue
+        if kind == "word" and token.lower() in SQL_KEYWORDS:
+            token = token.upper()
+
+        if pending_space and parts:
+            parts.append(" ")
+        pending_space = False
+        parts.append(token)
+
+    normalized = "".join(parts).strip()
+    while normalized.endswith(";"):
+        normalized = normalized[:-1].rstrip()
+    return normalized
+
+
+class SQLResultCache:
+    """
+    Ergebnis-Cache vor der Warehouse-Ausführung, Schlüssel ist die normalisierte SQL.
+    Gespeichert wird pro Abfrage das formatierte Ergebnis, is_error und error_type.
+    Mit path wird eine SQLite-Datei verwendet, sonst ein In-Memory-LRU.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: Optional[float] = 3600, path: Optional[str] = None):
+        if path:
+            self.backend = SQLiteCache(path, max_entries=max_entries, ttl_seconds=ttl_seconds)
+        else:
+            self.backend = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0  # von BigQuery gemeldete total_bytes_processed der eingesparten Abfragen
+        self._lock = threading.Lock()
+
+    def get(self, sql: str, namespace: str = "") -> Optional[dict]:
+        """namespace trennt Ergebnisse verschiedener Ausführungs-Backends."""
+        entry = self.backend.get(f"{namespace}:{normalize_sql(sql)}")
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.bytes_saved += entry.get("bytes_processed") or 0
+        return entry
+
+    def peek(self, sql: str, namespace: str = "") -> Optional[dict]:
+        """Wie get, aber ohne die Trefferstatistik zu ändern (z.B. für check_sql_cost vor run_sql)."""
+        return self.backend.get(f"{namespace}:{normalize_sql(sql)}")
+
+    def set(self, sql: str, entry: dict, namespace: str = ""):
+        self.backend.set(f"{namespace}:{normalize_sql(sql)}", entry)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self.hits = self.misses = self.bytes_saved = 0
+
+    def stats(self) -> dict:
+        """Trefferstatistik: wie viele Warehouse-Roundtrips und Bytes eingespart wurden."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "entries": len(self.backend),
+            }
+
+
+_sql_cache: Optional[SQLResultCache] = SQLResultCache()
+
+
+def get_sql_cache() -> Optional[SQLResultCache]:
+    """Gibt den prozessweiten SQL-Ergebnis-Cache zurück (None, wenn deaktiviert)."""
+    return _sql_cache
+
+
+def configure_sql_cache(enabled: bool = True, max_entries: int = 512,
+                        ttl_seconds: Optional[float] = 3600, path: Optional[str] = None) -> Optional[SQLResultCache]:
+    """
+    Ersetzt den prozessweiten SQL-Ergebnis-Cache, z.B. mit SQLite-Datei:
+    configure_sql_cache(path="output/sql_cache.sqlite", ttl_seconds=24 * 3600)
+    """
+    global _sql_cache
+    _sql_cache = SQLResultCache(max_entries=max_entries, ttl_seconds=ttl_seconds, path=path) if enabled else None
+    return _sql_cache
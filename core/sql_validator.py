@@ -0,0 +1,205 @@
+from typing import Dict, Iterable, List, Optional, Set
+
+from core.sql_cache import iter_sql_tokens
+
+# Wörter, die in BigQuery-SQL keine Spalten sind (Schlüsselwörter, Typen, Datumsteile, Literale)
+NON_COLUMN_WORDS = {
+    "select", "from", "where", "group", "by", "order", "having", "limit", "offset", "as", "on",
+    "join", "inner", "left", "right", "full", "outer", "cross", "using", "and", "or", "not",
+    "in", "is", "null", "like", "between", "case", "when", "then", "else", "end", "distinct",
+    "union", "all", "intersect", "except", "with", "recursive", "asc", "desc", "nulls", "first",
+    "last", "interval", "extract", "cast", "safe_cast", "true", "false", "over", "partition",
+    "rows", "range", "unbounded", "preceding", "following", "current", "row", "window",
+    "qualify", "exists", "any", "some", "escape", "at", "time", "zone", "struct", "array",
+    "unnest", "safe", "ignore", "respect", "lateral", "tablesample", "system", "percent",
+    "extract_from", "grouping", "sets", "rollup", "cube", "pivot", "unpivot", "for",
+    # Funktionen ohne Klammern (CURRENT_DATE etc.)
+    "current_date", "current_timestamp", "current_datetime", "current_time",
+    # Datumsteile
+    "microsecond", "millisecond", "second", "minute", "hour", "day", "dayofweek", "dayofyear",
+    "week", "isoweek", "month", "quarter", "year", "isoyear", "sunday", "monday", "tuesday",
+    "wednesday", "thursday", "friday", "saturday",
+    # Typen
+    "int64", "int", "integer", "bigint", "smallint", "float64", "float", "numeric", "bignumeric",
+    "decimal", "bool", "boolean", "string", "bytes", "date", "datetime", "timestamp", "json",
+    "geography",
+    # Pseudo-Spalten
+    "_table_suffix", "_partitiontime", "_partitiondate",
+}
+
+# Wörter nach denen ein Tabellenname folgt
+_TABLE_INTRODUCERS = {"from", "join"}
+# Wörter, die nach einem Tabellennamen kein Alias sind
+_NOT_ALIAS = NON_COLUMN_WORDS | {"left", "right", "inner", "full", "cross", "join", "where", "group",
+                                 "order", "limit", "on", "using", "union", "window", "qualify", "having"}
+
+
+def _tokens(sql: str) -> List[tuple]:
+    return [(kind, text) for kind, text in iter_sql_tokens(sql) if kind not in ("comment", "space")]
+
+
+def _extract_from_positions(tokens: List[tuple]) -> Set[int]:
+    """Positionen von FROM innerhalb von EXTRACT(teil FROM ausdruck) – dort folgt keine Tabelle."""
+    positions, stack = set(), []
+    for i, (kind, text) in enumerate(tokens):
+        if text == "(":
+            stack.append(tokens[i - 1][1].lower() if i > 0 and tokens[i - 1][0] == "word" else "")
+        elif text == ")" and stack:
+            stack.pop()
+        elif kind == "word" and text.lower() == "from" and stack and stack[-1] == "extract":
+            positions.add(i)
+    return positions
+
+
+def _strip_quotes(text: str) -> str:
+    return text[1:-1] if text.startswith("`") and text.endswith("`") else text
+
+
+def _read_name(tokens: List[tuple], i: int) -> tuple:
+    """Liest einen (ggf. mit Punkten zusammengesetzten) Namen ab Position i; gibt (Name, nächste Position)."""
+    parts = []
+    while i < len(tokens) and tokens[i][0] in ("word", "quoted"):
+        parts.append(_strip_quotes(tokens[i][1]))
+        if i + 1 < len(tokens) and tokens[i + 1][1] == ".":
+            i += 2
+        else:
+            i += 1
+            break
+    return ".".join(parts), i
+
+
+def _table_key(name: str) -> str:
+    """Projektpräfix entfernen: projekt.bachelor_mlh.tabelle -> bachelor_mlh.tabelle"""
+    parts = name.split(".")
+    return ".".join(parts[-2:]) if len(parts) > 2 else name
+
+
+def validate_sql(sql: str, allowed_tables: Dict[str, str], table_columns: Dict[str, Iterable[str]]) -> dict:
+    """
+    Prüft SQL offline gegen die erlaubten Tabellen und deren Spalten aus schema.json.
+    Im Zweifel (keine Schema-Infos, UNNEST) gilt die SQL als gültig – BigQuery meldet echte Fehler ohnehin.
+    :param allowed_tables: vollständiger Tabellenname (auch Wildcard) -> Basis-Tabellenname
+    :param table_columns: Basis-Tabellenname -> Spaltennamen
+    :return: {"valid", "error_type" ("unknown_table", "unknown_column", ""), "unknown_tables", "unknown_columns", "message"}
+    """
+    tokens = _tokens(sql)
+    lowered = [text.lower() if kind == "word" else text for kind, text in tokens]
+    # FROM in EXTRACT(...) leitet keine Tabelle ein
+    for i in _extract_from_positions(tokens):
+        lowered[i] = "extract_from"
+
+    cte_names: Set[str] = set()
+    aliases: Set[str] = set()          # Spalten- und Tabellen-Aliase (klein geschrieben)
+    alias_tables: Dict[str, Optional[str]] = {}  # Tabellen-Alias -> Basis-Tabelle (None = CTE/Subquery)
+    referenced_bases: List[str] = []
+    unknown_tables: List[str] = []
+
+    # --- 1. Durchlauf: CTEs, Tabellen, Aliase ---
+    for i, (kind, text) in enumerate(tokens):
+        word = lowered[i]
+
+        # CTE: name AS (
+        if kind in ("word", "quoted") and i + 2 < len(tokens) and lowered[i + 1] == "as" and tokens[i + 2][1] == "(":
+            if i > 0 and (lowered[i - 1] in ("with", "recursive") or tokens[i - 1][1] == ","):
+                cte_names.add(_strip_quotes(text).lower())
+
+        # Alias: ... AS name
+        if word == "as" and i + 1 < len(tokens) and tokens[i + 1][0] in ("word", "quoted"):
+            aliases.add(_strip_quotes(tokens[i + 1][1]).lower())
+
+        # implizite Aliase: "SUM(x) total", "spalte kurz", "CASE ... END label"
+        if kind == "word" and word not in NON_COLUMN_WORDS and i > 0:
+            prev_kind, prev_text = tokens[i - 1]
+            if prev_text == ")" or lowered[i - 1] == "end" or (
+                    prev_kind in ("word", "quoted") and lowered[i - 1] not in NON_COLUMN_WORDS
+                    and lowered[i - 1] not in _TABLE_INTRODUCERS):
+                aliases.add(word)
+
+        # Tabellenreferenzen nach FROM / JOIN
+        if word in _TABLE_INTRODUCERS and i + 1 < len(tokens) and tokens[i + 1][0] in ("word", "quoted"):
+            if lowered[i + 1] == "unnest":
+                continue
+            name, j = _read_name(tokens, i + 1)
+            key = _table_key(name)
+            base = None
+            if key.lower() in cte_names:
+                pass
+            elif key in allowed_tables:
+                base = allowed_tables[key]
+                referenced_bases.append(base)
+            else:
+                unknown_tables.append(name)
+
+            # Tabellen-Alias
+            if j < len(tokens) and lowered[j] == "as":
+                j += 1
+            if j < len(tokens) and tokens[j][0] in ("word", "quoted") and lowered[j] not in _NOT_ALIAS:
+                alias = _strip_quotes(tokens[j][1]).lower()
+                alias_tables[alias] = base
+                aliases.add(alias)
+            alias_tables[key.lower()] = base
+            alias_tables[key.split(".")[-1].lower()] = base
+            # Tabellen- und Datasetnamen dürfen als Qualifier (tabelle.spalte) vorkommen
+            aliases.update(part.lower() for part in key.split("."))
+
+    if unknown_tables:
+        names = ", ".join(dict.fromkeys(unknown_tables))
+        allowed = ", ".join(allowed_tables)
+        return {
+            "valid": False,
+            "error_type": "unknown_table",
+            "unknown_tables": list(dict.fromkeys(unknown_tables)),
+            "unknown_columns": [],
+            "message": f"Statische SQL-Prüfung: unbekannte Tabelle(n): {names}. Erlaubt sind: {allowed}",
+        }
+
+    known_columns = {
+        base: {column.lower() for column in table_columns.get(base, [])}
+        for base in referenced_bases
+    }
+    all_known = set().union(*known_columns.values()) if known_columns else set()
+    # ohne Schema-Informationen zu den Tabellen lässt sich nichts sicher prüfen
+    if not all_known:
+        return {"valid": True, "error_type": "", "unknown_tables": [], "unknown_columns": [], "message": ""}
+
+    # --- 2. Durchlauf: Spaltenreferenzen ---
+    unknown_columns: List[str] = []
+    has_unnest = "unnest" in lowered
+    skip_until = -1
+    for i, (kind, text) in enumerate(tokens):
+        if i <= skip_until or kind != "word":
+            continue
+        word = lowered[i]
+
+        # Tabellennamen nach FROM/JOIN überspringen
+        if i > 0 and lowered[i - 1] in _TABLE_INTRODUCERS:
+            _, j = _read_name(tokens, i)
+            skip_until = j - 1
+            continue
+        # Funktionsaufrufe, Schlüsselwörter, Aliase, CTE-Namen
+        if (i + 1 < len(tokens) and tokens[i + 1][1] == "(") or word in NON_COLUMN_WORDS \
+                or word in aliases or word in cte_names:
+            continue
+        # Feldzugriff nach Punkt (alias.spalte oder struct.feld): über den Qualifier geprüft
+        if i > 0 and tokens[i - 1][1] == ".":
+            qualifier = lowered[i - 2] if i >= 2 else ""
+            base = alias_tables.get(qualifier)
+            if base is not None and word not in known_columns.get(base, set()):
+                unknown_columns.append(f"{tokens[i - 2][1]}.{text}")
+            continue
+        # Qualifier selbst (alias.spalte): Aliase sind oben bereits übersprungen
+        # mit UNNEST können unqualifizierte Struct-Felder vorkommen -> im Zweifel durchlassen
+        if word not in all_known and not has_unnest:
+            unknown_columns.append(text)
+
+    if unknown_columns:
+        names = ", ".join(dict.fromkeys(unknown_columns))
+        return {
+            "valid": False,
+            "error_type": "unknown_column",
+            "unknown_tables": [],
+            "unknown_columns": list(dict.fromkeys(unknown_columns)),
+            "message": f"Statische SQL-Prüfung: unbekannte Spalte(n): {names}. Verwende nur Spalten aus dem Schema.",
+        }
+
+    return {"valid": True, "error_type": "", "unknown_tables": [], "unknown_columns": [], "message": ""}
@@ -1,7 +1,12 @@
-from typing import TypedDict, List, Any, Optional
+from typing import TypedDict, List, Any, Optional, Annotated
 from langchain_core.messages import HumanMessage
 
 
+def merge_dicts(left: Optional[dict], right: Optional[dict]) -> dict:
+    """Reducer: Updates paralleler Zweige werden zusammengeführt statt überschrieben."""
+    return {**(left or {}), **(right or {})}
+
+
 class AgentState(TypedDict):
     """Repräsentiert den State des Agents, der zwischen den Nodes weitergegeben wird."""
     
@@ -10,11 +15,15 @@ class AgentState(TypedDict):
     # SQL-Informationen
     sql_query: str     
     sql_result: str         
+    sql_result_frame: Optional[Any]  # abgeholte Ergebniszeilen als pandas.DataFrame (höchstens MAX_FETCH_ROWS)
+    sql_total_rows: Optional[int]    # tatsächliche Zeilenzahl des Ergebnisses laut Job
+    sql_summary: Optional[str]       # Kennzahlen + Beispielzeilen des Ergebnisses für die Antwort (summarize_result)
     generated_sql: str      
     #executed_sql: str  
     sql_analyse: Optional[str] #nicht irgendwo bzgl logging eingebaut  
     sql_failed: bool  
     sql_error_type: str  
+    sql_bytes_estimate: Optional[int]  # Dry-Run: zu verarbeitende Bytes der generierten SQL
     prev_sql_error: Optional[str]
     prev_sql: Optional[str]
     
@@ -30,10 +39,20 @@ class AgentState(TypedDict):
 
     llm: Any
     agent_id: str
+    table_top_k: Optional[int]  # Anzahl Kandidaten-Tabellen aus dem Retrieval (None = TABLE_TOP_K)
+    max_bytes_budget: Optional[int]  # Byte-Budget pro Frage für check_sql_cost (None = MAX_BYTES_PER_QUESTION)
+    column_top_k: Optional[int]  # Anzahl Kandidaten-Spalten pro Tabelle für select_schema (None = COLUMN_TOP_K)
+    schema_token_budget: Optional[int]  # Token-Budget der Schema-Übersicht pro Prompt (None = SCHEMA_TOKEN_BUDGET)
+    schema_render_info: Optional[dict]  # was render_schema für den SQL-Prompt gekürzt hat
+    sql_variant_hint: Optional[str]  # Zusatzhinweis im SQL-Prompt für einen von mehreren Kandidaten
+    sql_candidates: Optional[List[dict]]  # SQL-Kandidaten der parallelen Generierung (SQL, Variante, Fehlertyp)
 
     natural_answer: str
+    answer_cache_key: Optional[str]  # Schlüssel im Antwort-Cache (None = Cache deaktiviert)
+    answer_cache_hit: bool  # Antwort kam aus dem Antwort-Cache
     
     retry_count: int
+    stage_inputs: Annotated[dict, merge_dicts]  # Stage -> Fingerprint der Eingaben beim letzten Lauf (siehe reuse_if_unchanged)
 
 
 
@@ -0,0 +1,178 @@
+import functools
+import inspect
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Iterator, List
+
+from langchain_core.messages import BaseMessage
+
+from core.logger import EvalLogger
+
+CHARS_PER_TOKEN = 4  # grobe Faustregel für die Token-Schätzung
+
+
+def estimate_tokens(text: str) -> int:
+    """Grobe Token-Schätzung (ca. 4 Zeichen pro Token), falls das LLM keine Usage-Daten liefert."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _messages_text(messages: List[Any]) -> str:
+    parts = []
+    for message in messages:
+        if isinstance(message, dict):
+            parts.append(str(message.get("content", "")))
+        elif isinstance(message, BaseMessage):
+            parts.append(str(message.content))
+        else:
+            parts.append(str(message))
+    return "\n".join(parts)
+
+
+class TracingLLM:
+    """Misst Dauer, Prompt- und Antwortgröße aller LLM-Aufrufe eines Nodes und schreibt sie in den Span."""
+
+    def __init__(self, llm: Any, span: dict):
+        self.llm = llm
+        self.span = span
+        self._lock = threading.Lock()  # parallele Aufrufe innerhalb eines Nodes (z.B. SQL-Kandidaten)
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def _record(self, prompt: str, response: Any, seconds: float):
+        content = str(getattr(response, "content", "") or "")
+        usage = getattr(response, "usage_metadata", None) or {}
+
+        with self._lock:
+            self._add(prompt, content, usage, seconds)
+
+    def _add(self, prompt: str, content: str, usage: dict, seconds: float):
+        span = self.span
+        span["llm_calls"] += 1
+        span["llm_seconds"] += seconds
+        span["prompt_chars"] += len(prompt)
+        span["response_chars"] += len(content)
+        if usage.get("input_tokens") is not None:
+            span["prompt_tokens"] += usage["input_tokens"]
+            span["response_tokens"] += usage.get("output_tokens", 0)
+        else:
+            span["prompt_tokens"] += estimate_tokens(prompt)
+            span["response_tokens"] += estimate_tokens(content)
+            span["tokens_estimated"] = True
+
+    def invoke(self, messages: List[Any], *args, **kwargs) -> Any:
+        start = time.perf_counter()
+        response = self.llm.invoke(messages, *args, **kwargs)
+        self._record(_messages_text(messages), response, time.perf_counter() - start)
+        return response
+
+    async def ainvoke(self, messages: List[Any], *args, **kwargs) -> Any:
+        start = time.perf_counter()
+        response = await self.llm.ainvoke(messages, *args, **kwargs)
+        self._record(_messages_text(messages), response, time.perf_counter() - start)
+        return response
+
+    def stream(self, messages: List[Any], *args, **kwargs) -> Iterator[Any]:
+        # gemessen wird bis zum letzten Chunk; Usage-Daten stehen meist nur im letzten
+        start = time.perf_counter()
+        parts, usage = [], {}
+        for chunk in self.llm.stream(messages, *args, **kwargs):
+            parts.append(str(getattr(chunk, "content", "") or ""))
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            yield chunk
+        with self._lock:
+            self._add(_messages_text(messages), "".join(parts), usage, time.perf_counter() - start)
+
+
+def _new_span(node_name: str, state: dict) -> dict:
+    return {
+        "node": node_name,
+        "retry_count": state.get("retry_count", 0),
+        "start": datetime.now().isoformat(),
+        "end": None,
+        "seconds": 0.0,
+        "llm_calls": 0,
+        "llm_seconds": 0.0,
+        "prompt_chars": 0,
+        "prompt_tokens": 0,
+        "response_chars": 0,
+        "response_tokens": 0,
+        "tokens_estimated": False,
+    }
+
+
+def _finish_span(span: dict, start: float):
+    span["seconds"] = time.perf_counter() - start
+    span["end"] = datetime.now().isoformat()
+    EvalLogger().log_span(span)
+
+
+def traced(node_name: str, node: Callable[[dict], Any]) -> Callable[[dict], Any]:
+    """
+    Umhüllt einen Node: misst Wall-Time, Zeit in llm.invoke sowie Prompt-/Antwortgröße und
+    hängt den Span an die aktuelle EvalLogger-Session (exportiert über to_json/to_csv).
+    Async-Nodes (async def) bleiben async.
+    """
+    def enter(state):
+        span = _new_span(node_name, state)
+        llm = state.get("llm")
+        if llm is not None:
+            state["llm"] = TracingLLM(llm, span)
+        return span, llm, time.perf_counter()
+
+    def leave(state, span: dict, llm: Any, start: float):
+        if llm is not None:
+            state["llm"] = llm
+        _finish_span(span, start)
+
+    def restore(result, llm: Any):
+        # Nodes geben meist den State selbst zurück – das ursprüngliche LLM muss darin stehen bleiben
+        if llm is not None and isinstance(result, dict) and isinstance(result.get("llm"), TracingLLM):
+            result["llm"] = llm
+        return result
+
+    if inspect.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(state):
+            span, llm, start = enter(state)
+            try:
+                result = await node(state)
+            finally:
+                leave(state, span, llm, start)
+            return restore(result, llm)
+
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(state):
+        span, llm, start = enter(state)
+        try:
+            result = node(state)
+        finally:
+            leave(state, span, llm, start)
+        return restore(result, llm)
+
+    return wrapper
+
+
+def traced_stream(node_name: str, node: Callable[[dict], Iterator[Any]]) -> Callable[[dict], Iterator[Any]]:
+    """Wie traced, aber für Generator-Schritte (z.B. stream_answer): der Span endet mit dem Generator."""
+    @functools.wraps(node)
+    def wrapper(state):
+        span = _new_span(node_name, state)
+        llm = state.get("llm")
+        if llm is not None:
+            state["llm"] = TracingLLM(llm, span)
+
+        start = time.perf_counter()
+        try:
+            yield from node(state)
+        finally:
+            if llm is not None:
+                state["llm"] = llm
+            _finish_span(span, start)
+
+    return wrapper
@@ -0,0 +1,127 @@
+from datetime import date
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+import core.answer_cache
+import core.cache
+from core.answer_cache import AnswerCache, configure_answer_cache, date_bucket, get_answer_cache, normalize_question
+from core.logger import EvalLogger
+from core.nodes.answer_cache import check_answer_cache, route_after_answer_cache, store_answer_cache
+
+ENTRY = {"sql_query": "SELECT 1", "sql_result": "1", "sql_total_rows": 1, "natural_answer": "Eins."}
+
+
+@pytest.fixture
+def answer_cache():
+    previous = get_answer_cache()
+    cache = configure_answer_cache()
+    yield cache
+    core.answer_cache._answer_cache = previous
+
+
+@pytest.fixture
+def no_session():
+    logger = EvalLogger()
+    previous = logger.current_session
+    logger.current_session = None
+    yield logger
+    logger.current_session = previous
+
+
+def _state(question, brands=("eltern",), **extra):
+    return {"messages": [HumanMessage(content=question)], "brand": list(brands), "agent_id": "A", **extra}
+
+
+def test_normalize_question():
+    assert normalize_question("  Wie viele   Nutzer?\n") == "wie viele nutzer"
+    assert normalize_question("WIE VIELE NUTZER") == normalize_question("wie viele nutzer?!")
+    assert normalize_question("Nutzer im März") != normalize_question("Nutzer im April")
+
+
+def test_key_ignores_brand_order_but_not_agent():
+    cache = AnswerCache()
+    day = date(2025, 6, 1)
+    assert cache.key("Frage?", ["b", "a"], "A", day) == cache.key("frage", ["a", "b", "a"], "A", day)
+    assert cache.key("Frage", ["a"], "A", day) != cache.key("Frage", ["a"], "E", day)
+    assert cache.key("Frage", ["a"], "A", day) != cache.key("Frage", ["b"], "A", day)
+
+
+def test_date_bucket_rollover():
+    assert date_bucket(date(2025, 6, 1)) != date_bucket(date(2025, 6, 2))
+    week = [date_bucket(date.fromordinal(day), window_days=7) for day in range(7 * 100000, 7 * 100000 + 8)]
+    assert len(set(week[:7])) == 1 and week[7] != week[6]
+
+    cache = AnswerCache()
+    key_today = cache.key("Frage", ["a"], "A", date(2025, 6, 1))
+    cache.set(key_today, ENTRY)
+    assert cache.get(cache.key("Frage", ["a"], "A", date(2025, 6, 2))) is None
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(core.cache.time, "time", lambda: now[0])
+    cache = AnswerCache(ttl_seconds=60)
+    cache.set("k", ENTRY)
+    now[0] += 59
+    assert cache.get("k") == ENTRY
+    now[0] += 2
+    assert cache.get("k") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_store_only_successful_answers(answer_cache, no_session):
+    state = check_answer_cache(_state("Wie viele Nutzer?"))
+    assert route_after_answer_cache(state) == "miss"
+
+    store_answer_cache({**state, **ENTRY, "sql_failed": True})
+    assert answer_cache.get(state["answer_cache_key"]) is None
+
+    store_answer_cache({**state, **ENTRY, "sql_failed": False})
+    assert answer_cache.get(state["answer_cache_key"]) == ENTRY
+
+
+def test_hit_applies_entry_without_session(answer_cache, no_session, monkeypatch):
+    logged = []
+    monkeypatch.setattr(EvalLogger, "log_final_answer", lambda self, answer: logged.append(answer))
+    answer_cache.set(answer_cache.key("Wie viele Nutzer", ["eltern"], "A"), ENTRY)
+
+    state = check_answer_cache(_state("wie viele nutzer?"))
+    assert route_after_answer_cache(state) == "hit"
+    assert (state["sql_query"], state["natural_answer"], state["sql_failed"]) == ("SELECT 1", "Eins.", False)
+    assert logged == []
+
+
+def test_hit_is_logged_as_cached_attempt(answer_cache, no_session):
+    answer_cache.set(answer_cache.key("Wie viele Nutzer", ["eltern"], "A"), ENTRY)
+    no_session.start_session("Wie viele Nutzer")
+    check_answer_cache(_state("Wie viele Nutzer"))
+    session = no_session.current_session
+    assert session["attempts"][-1]["cached"] is True
+    assert session["final_answer"] == "Eins."
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_hit_short_circuits_graph(answer_cache, no_session, monkeypatch, parallel):
+    graph_utils = pytest.importorskip("core.graph_utils")
+    from langgraph.graph import END, StateGraph
+    from core.state import AgentState
+
+    def identify_brand(state):
+        return {**state, "brand": ["eltern"]} if not parallel else {"brand": ["eltern"]}
+
+    def not_reached(state):
+        raise AssertionError("Node darf nach einem Cache-Treffer nicht laufen")
+
+    monkeypatch.setattr(graph_utils, "identify_brand", identify_brand)
+    monkeypatch.setattr(graph_utils, "identify_relevant_tables", not_reached)
+    answer_cache.set(answer_cache.key("Wie viele Nutzer", ["eltern"], "A"), ENTRY)
+
+    graph = StateGraph(AgentState)
+    graph.add_node("next", not_reached)
+    graph.add_edge("next", END)
+    graph_utils.add_context_stages(graph, "next", parallel=parallel, answer_cache=True)
+
+    result = graph.compile().invoke(_state("Wie viele Nutzer?", brands=()))
+    assert result["answer_cache_hit"] is True
+    assert result["natural_answer"] == "Eins."
@@ -0,0 +1,178 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from core.backends import BigQueryBackend, ExecutionBackend
+from core.benchmark import FakeBigQueryClient, FakeQueryJob, LatencyModel
+
+
+def test_client_is_shared_across_threads():
+    created = []
+
+    def factory(project):
+        created.append(project)
+        return FakeBigQueryClient()
+
+    backend = BigQueryBackend(project="test", client_factory=factory)
+    client = backend.client  # z.B. in warm_up
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        clients = list(executor.map(lambda _: backend.client, range(8)))
+
+    assert all(c is client for c in clients)
+    assert created == ["test"]
+
+
+class FailingQueryJob(FakeQueryJob):
+    def result(self, page_size=None, max_results=None):
+        raise RuntimeError("Syntax error: Unexpected keyword FROM")
+
+
+class FailingClient(FakeBigQueryClient):
+    def query(self, sql, job_config=None):
+        self.queries.append((sql, job_config))
+        return FailingQueryJob("failing_job", self.frame, 0.0, 0)
+
+
+def _backend(client, **options):
+    return BigQueryBackend(project="test", client_factory=lambda project: client, **options)
+
+
+def test_submit_uses_job_config():
+    client = FakeBigQueryClient(frame=pd.DataFrame({"users": [1, 2, 3]}), bytes_processed=2048)
+    backend = _backend(client, priority="BATCH", labels={"app": "text_to_sql"}, maximum_bytes_billed=10 ** 9)
+
+    frame, total_rows, bytes_processed = backend.execute("SELECT users FROM t", max_rows=2)
+
+    assert list(frame["users"]) == [1, 2]
+    assert (total_rows, bytes_processed) == (3, 2048)
+    sql, job_config = client.queries[0]
+    assert sql == "SELECT users FROM t"
+    assert job_config.priority == "BATCH"
+    assert job_config.labels == {"app": "text_to_sql"}
+    assert job_config.maximum_bytes_billed == 10 ** 9
+
+
+def test_dry_run_job_config():
+    client = FakeBigQueryClient(bytes_processed=4096)
+    backend = _backend(client, labels={"app": "text_to_sql"})
+
+    assert backend.dry_run("SELECT 1") == 4096
+    job_config = client.queries[0][1]
+    assert job_config.dry_run and not job_config.use_query_cache
+    assert job_config.labels == {"app": "text_to_sql"}
+
+
+def test_job_config_without_bigquery_package(monkeypatch):
+    # Import von google.cloud.bigquery schlägt fehl, als wäre das Paket nicht installiert
+    monkeypatch.setitem(sys.modules, "google.cloud.bigquery", None)
+    if "google.cloud" in sys.modules:
+        monkeypatch.delattr(sys.modules["google.cloud"], "bigquery", raising=False)
+    client = FakeBigQueryClient()
+    backend = _backend(client, maximum_bytes_billed=100)
+
+    backend.execute("SELECT 1", max_rows=10)
+    assert client.queries[0][1].maximum_bytes_billed == 100
+    with pytest.raises(ImportError):
+        BigQueryBackend(project="test").job_config()
+
+
+def test_aexecute_polls_with_backoff(monkeypatch):
+    client = FakeBigQueryClient(latency=LatencyModel("constant:0.3"))
+    backend = _backend(client)
+    backend.poll_initial, backend.poll_factor, backend.poll_max = 0.01, 2.0, 0.04
+
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def recording_sleep(delay):
+        sleeps.append(delay)
+        await real_sleep(delay)
+
+    monkeypatch.setattr(asyncio, "sleep", recording_sleep)
+    frame, total_rows, _ = asyncio.run(backend.aexecute("SELECT 1", max_rows=10))
+
+    assert total_rows == 1
+    assert sleeps[:3] == [0.01, 0.02, 0.04]
+    assert max(sleeps) == 0.04
+
+
+def test_aexecute_timeout_cancels_job():
+    client = FakeBigQueryClient(latency=LatencyModel("constant:5"))
+    backend = _backend(client)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(backend.aexecute("SELECT 1", max_rows=10, timeout=0.05))
+
+
+def test_errors_propagate():
+    backend = _backend(FailingClient())
+    with pytest.raises(RuntimeError, match="Syntax error"):
+        backend.execute("SELECT FROM", max_rows=10)
+    with pytest.raises(RuntimeError, match="Syntax error"):
+        asyncio.run(backend.aexecute("SELECT FROM", max_rows=10))
+
+
+def test_fetch_types_columns_from_bigquery_schema():
+    from datetime import date, datetime, timezone
+    from decimal import Decimal
+    from types import SimpleNamespace
+
+    from core.backends import _typed_frame
+
+    schema = [SimpleNamespace(name=name, field_type=field_type, mode="NULLABLE") for name, field_type in [
+        ("day", "DATE"), ("revenue", "NUMERIC"), ("users", "INTEGER"), ("ts", "TIMESTAMP"), ("flag", "BOOLEAN"),
+    ]] + [SimpleNamespace(name="items", field_type="STRING", mode="REPEATED")]
+    frame = pd.DataFrame.from_records([
+        (date(2024, 1, 1), Decimal("1.50"), 3, datetime(2024, 1, 1, tzinfo=timezone.utc), True, ["a"]),
+        (date(2024, 1, 2), None, None, None, None, []),
+    ], columns=["day", "revenue", "users", "ts", "flag", "items"])
+
+    typed = _typed_frame(frame, schema)
+
+    assert pd.api.types.is_datetime64_any_dtype(typed["day"])
+    assert typed["revenue"].dtype == "float64"
+    assert str(typed["users"].dtype) == "Int64" and typed["users"].isna().iloc[1]
+    assert str(typed["ts"].dtype).startswith("datetime64") and typed["ts"].dt.tz is not None
+    assert str(typed["flag"].dtype) == "boolean"
+    assert typed["items"].dtype == object
+
+
+def test_duckdb_keeps_types_and_counts_all_rows():
+    from core.backends import DuckDBBackend
+
+    backend = DuckDBBackend()
+    backend.add_table("rep_test_eltern", pd.DataFrame({
+        "date": pd.date_range("2024-01-01", periods=5000), "users": range(5000),
+    }))
+
+    frame, total_rows, _ = backend.execute("SELECT date, users FROM `bachelor_mlh.rep_test_eltern` ORDER BY users DESC", 1000)
+    assert (len(frame), total_rows) == (1000, 5000)
+    assert frame["users"].iloc[0] == 4999
+    assert pd.api.types.is_datetime64_any_dtype(frame["date"])
+
+    frame, total_rows, _ = backend.execute("SELECT users FROM `bachelor_mlh.rep_test_eltern` WHERE users < 0", 1000)
+    assert (len(frame), total_rows, list(frame.columns)) == (0, 0, ["users"])
+
+
+def test_execution_backend_requires_execute_and_dry_run():
+    class OnlyExecute(ExecutionBackend):
+        def execute(self, sql, max_rows):
+            return pd.DataFrame(), 0, None
+
+    with pytest.raises(TypeError):
+        OnlyExecute()
+
+
+def test_cache_namespace_separates_projects_and_fixtures(tmp_path):
+    from core.backends import DuckDBBackend
+
+    assert BigQueryBackend(project="a").cache_namespace != BigQueryBackend(project="b").cache_namespace
+    assert BigQueryBackend(project="a").cache_namespace == BigQueryBackend(project="a").cache_namespace
+
+    (tmp_path / "x").mkdir()
+    (tmp_path / "y").mkdir()
+    assert DuckDBBackend(str(tmp_path / "x")).cache_namespace != DuckDBBackend(str(tmp_path / "y")).cache_namespace
+    assert DuckDBBackend().cache_namespace != DuckDBBackend().cache_namespace
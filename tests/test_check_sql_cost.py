@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import core.sql_cache
+from core.backends import get_backend
+from core.nodes.check_sql_cost import (
+    MAX_BYTES_PER_QUESTION, acheck_sql_cost, check_sql_cost, route_after_cost_check, set_cost_estimator,
+)
+from core.sql_cache import configure_sql_cache, get_sql_cache
+
+
+@pytest.fixture(autouse=True)
+def estimator():
+    previous_cache = get_sql_cache()
+    configure_sql_cache()
+    calls = []
+
+    def set_bytes(num_bytes):
+        def estimate(sql):
+            calls.append(sql)
+            if isinstance(num_bytes, Exception):
+                raise num_bytes
+            return num_bytes
+        set_cost_estimator(estimate)
+        return calls
+
+    yield set_bytes
+    set_cost_estimator(None)
+    core.sql_cache._sql_cache = previous_cache
+
+
+def _state(**extra):
+    return {"sql_query": "SELECT users FROM t", "sql_failed": False, **extra}
+
+
+def test_within_budget_runs(estimator):
+    estimator(1024)
+    state = check_sql_cost(_state())
+    assert state["sql_bytes_estimate"] == 1024
+    assert not state["sql_failed"]
+    assert route_after_cost_check(state) == "run"
+
+
+def test_over_budget_is_rejected(estimator):
+    estimator(MAX_BYTES_PER_QUESTION + 1)
+    state = check_sql_cost(_state())
+    assert state["sql_error_type"] == "over_budget"
+    assert state["prev_sql"] == "SELECT users FROM t"
+    assert "Budget" in state["prev_sql_error"]
+    assert route_after_cost_check(state) == "rejected"
+
+
+def test_budget_from_state(estimator):
+    estimator(2048)
+    assert check_sql_cost(_state(max_bytes_budget=1024))["sql_error_type"] == "over_budget"
+
+
+def test_failing_dry_run_is_execution_error(estimator):
+    estimator(RuntimeError("Unrecognized name: userz"))
+    state = check_sql_cost(_state())
+    assert state["sql_error_type"] == "execution_error"
+    assert state["sql_bytes_estimate"] is None
+    assert "Unrecognized name" in state["sql_result"]
+    assert route_after_cost_check(state) == "rejected"
+
+
+def test_cached_sql_skips_dry_run(estimator):
+    calls = estimator(MAX_BYTES_PER_QUESTION + 1)
+    get_sql_cache().set("SELECT users FROM t", {"result_text": "users\n1", "is_error": False},
+                        namespace=get_backend().cache_namespace)
+
+    state = check_sql_cost(_state())
+    assert state["sql_bytes_estimate"] == 0
+    assert route_after_cost_check(state) == "run"
+    state = asyncio.run(acheck_sql_cost(_state()))
+    assert route_after_cost_check(state) == "run"
+    assert calls == []
+    assert get_sql_cache().stats()["hits"] == 0
+
+
+def test_async_over_budget(estimator):
+    estimator(MAX_BYTES_PER_QUESTION + 1)
+    state = asyncio.run(acheck_sql_cost(_state()))
+    assert state["sql_error_type"] == "over_budget"
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import pandas as pd
+import pytest
+
+import core.nodes.generate_sql_candidates as generate_sql_candidates_module
+import core.sql_cache
+from core.backends import ExecutionBackend, get_backend, set_backend
+from core.nodes.generate_sql_candidates import (
+    SQL_VARIANT_HINTS, _generate_and_check, _majority, _result_fingerprint, make_generate_sql_candidates,
+)
+from core.sql_cache import configure_sql_cache, get_sql_cache
+
+
+def _result(frame):
+    return {"is_error": False, "frame": frame, "result_text": frame.to_string()}
+
+
+def test_fingerprint_equal_for_equal_frames():
+    a = _result(pd.DataFrame({"product": ["eltern"], "users": [3]}))
+    b = _result(pd.DataFrame({"product": ["eltern"], "users": [3]}))
+    assert _result_fingerprint(a) == _result_fingerprint(b)
+
+
+def test_fingerprint_with_array_and_struct_cells():
+    frame = pd.DataFrame({"items": [["a", "b"], ["c"]], "meta": [{"k": 1}, {"k": 2}]})
+    same = pd.DataFrame({"items": [["a", "b"], ["c"]], "meta": [{"k": 1}, {"k": 2}]})
+    other = pd.DataFrame({"items": [["a"], ["c"]], "meta": [{"k": 1}, {"k": 2}]})
+    assert _result_fingerprint(_result(frame)) == _result_fingerprint(_result(same))
+    assert _result_fingerprint(_result(frame)) != _result_fingerprint(_result(other))
+
+
+def test_fingerprint_of_error_is_empty():
+    assert _result_fingerprint({"is_error": True, "frame": None, "result_text": "Fehler"}) == ""
+
+
+def test_majority_prefers_largest_group():
+    valid = [{"sql_query": "a"}, {"sql_query": "b"}, {"sql_query": "c"}]
+    assert valid[_majority(valid, ["x", "y", "y"])]["sql_query"] == "b"
+    assert valid[_majority(valid, ["", "", ""])]["sql_query"] == "a"
+
+
+def test_cancelled_candidate_does_not_call_llm():
+    calls = []
+    cancelled = threading.Event()
+    cancelled.set()
+    assert _generate_and_check(lambda s: calls.append(s) or s, {"messages": []}, "", cancelled) is None
+    assert calls == []
+
+
+class CountingBackend(ExecutionBackend):
+    name = "counting"
+
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, sql, max_rows):
+        self.executed.append(sql)
+        users = 3 if "good" in sql else 4
+        return pd.DataFrame({"users": [users]}), 1, 10
+
+    def dry_run(self, sql):
+        return 0
+
+
+@pytest.fixture
+def counting_backend(monkeypatch):
+    previous_backend, previous_cache = get_backend(), get_sql_cache()
+    backend = CountingBackend()
+    set_backend(backend)
+    configure_sql_cache(enabled=False)
+    monkeypatch.setattr(generate_sql_candidates_module, "validate_sql", lambda state: state)
+    yield backend
+    set_backend(previous_backend)
+    core.sql_cache._sql_cache = previous_cache
+
+
+def _generate(state):
+    # Variante 0 und 1 liefern dasselbe Ergebnis, Variante 2 ein anderes
+    sql = {"": "SELECT good_a", SQL_VARIANT_HINTS[1]: "SELECT good_b"}.get(state["sql_variant_hint"], "SELECT other")
+    return {**state, "sql_query": sql, "sql_failed": False}
+
+
+def test_majority_applies_result_without_sql_cache(counting_backend):
+    node = make_generate_sql_candidates(_generate, n_candidates=3, selection="majority")
+    state = node({"messages": [], "sql_query": ""})
+
+    assert state["sql_query"] == "SELECT good_a"
+    assert state["sql_result"] == "users\n3"
+    assert not state["sql_failed"]
+    # jeder Kandidat genau einmal ausgeführt, die gewählte SQL nicht ein zweites Mal
+    assert sorted(counting_backend.executed) == ["SELECT good_a", "SELECT good_b", "SELECT other"]
+
+
+def test_majority_applies_result_async(counting_backend):
+    async def agenerate(state):
+        return _generate(state)
+
+    node = make_generate_sql_candidates(agenerate, n_candidates=3, selection="majority")
+    state = asyncio.run(node({"messages": [], "sql_query": ""}))
+
+    assert state["sql_result"] == "users\n3"
+    assert len(counting_backend.executed) == 3
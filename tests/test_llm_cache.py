@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from core.cache import SQLiteCache
+from core.llm_cache import CachingLLM, messages_key
+
+MESSAGES = [{"role": "system", "content": "Du bist ein SQL-Experte."}, {"role": "user", "content": "Wie viele Nutzer?"}]
+
+
+class CountingLLM:
+    model_name = "test-model"
+
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, messages, *args, **kwargs):
+        self.calls.append(kwargs)
+        return AIMessage(content=f"Antwort {len(self.calls)}")
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        return self.invoke(messages, *args, **kwargs)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteCache(str(tmp_path / "llm_cache.sqlite"))
+
+
+def test_same_call_is_served_from_cache(store):
+    llm = CountingLLM()
+    cached = CachingLLM(llm, store=store)
+
+    assert cached.invoke(MESSAGES).content == "Antwort 1"
+    assert cached.invoke(MESSAGES).content == "Antwort 1"
+    assert len(llm.calls) == 1
+    assert cached.stats()["hits"] == 1
+
+
+def test_options_are_part_of_the_key(store):
+    llm = CountingLLM()
+    cached = CachingLLM(llm, store=store)
+
+    cached.invoke(MESSAGES, stop=["```"])
+    cached.invoke(MESSAGES, stop=[";"])
+    cached.invoke(MESSAGES, temperature=0.7)
+    cached.invoke(MESSAGES, stop=["```"])
+    cached.invoke(MESSAGES, stop=["```"], config={"tags": ["eval"]})
+
+    assert len(llm.calls) == 3
+
+
+def test_key_without_options_is_unchanged():
+    assert messages_key("m", MESSAGES) == messages_key("m", MESSAGES, {})
+    assert messages_key("m", MESSAGES) != messages_key("m", MESSAGES, {"stop": ["x"]})
+
+
+def test_ainvoke_does_not_touch_sqlite_on_the_event_loop(store):
+    threads = []
+    get, set_ = store.get, store.set
+
+    def recording_get(key):
+        threads.append(threading.current_thread())
+        return get(key)
+
+    def recording_set(key, value):
+        threads.append(threading.current_thread())
+        return set_(key, value)
+
+    store.get, store.set = recording_get, recording_set
+    cached = CachingLLM(CountingLLM(), store=store)
+
+    async def run():
+        loop_thread = threading.current_thread()
+        first = await cached.ainvoke(MESSAGES)
+        second = await cached.ainvoke(MESSAGES)
+        return loop_thread, first, second
+
+    loop_thread, first, second = asyncio.run(run())
+    assert first.content == second.content == "Antwort 1"
+    assert len(threads) == 3 and loop_thread not in threads
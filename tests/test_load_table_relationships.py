@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+import core.nodes.load_table_relationships as load_table_relationships_module
+from core.context_store import ContextStore
+from core.nodes.load_table_relationships import load_table_relationships
+
+
+def _join(table1, table2):
+    return {"tables_for_join": [table1, table2], "join_condition": f"{table1}.id = {table2}.id"}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # a - bridge1 - c, a - bridge2 - d, c - d direkt
+    relationships = [_join("a", "bridge1"), _join("bridge1", "c"), _join("a", "bridge2"),
+                     _join("bridge2", "d"), _join("c", "d")]
+    (tmp_path / "relationships.json").write_text(json.dumps(relationships))
+    (tmp_path / "tables_enriched.json").write_text(json.dumps([]))
+    context_store = ContextStore(str(tmp_path))
+    monkeypatch.setattr(load_table_relationships_module, "get_context_store", lambda: context_store)
+    return context_store
+
+
+def test_join_paths_reuse_join_graph(store):
+    assert store.join_paths()[("a", "d")] == ["a", "bridge2", "d"]
+    assert store.join_graph()["a"]["bridge1"]["tables_for_join"] == ["a", "bridge1"]
+
+
+def test_bridges_are_merged_across_pairs(store):
+    state = load_table_relationships({"relevant_tables": ["a", "c", "d"], "brand": ["eltern"]})
+    bridges = [info["bridge_tables"] for info in state["relationship_info"] if "bridge_tables" in info]
+    # a-c über bridge1 verbindet auch a-d (über c-d); bridge2 kommt nicht zusätzlich hinzu
+    assert bridges == [["bridge1"]]
+    assert {tuple(info["tables_for_join"]) for info in state["relationship_info"] if "tables_for_join" in info} == {
+        ("c", "d"), ("a", "bridge1"), ("bridge1", "c")}
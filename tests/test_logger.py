@@ -0,0 +1,89 @@
+import csv
+import json
+
+import pytest
+
+from core.logger import EvalLogger
+
+
+@pytest.fixture
+def make_logger(tmp_path):
+    previous = EvalLogger._instance
+
+    def make(max_buffered_sessions=1000):
+        EvalLogger._instance = None
+        return EvalLogger(agent_id="test", log_dir=str(tmp_path), max_buffered_sessions=max_buffered_sessions)
+
+    yield make
+    EvalLogger._instance = previous
+
+
+def _run_sessions(logger, n, offset=0):
+    for i in range(offset, offset + n):
+        logger.start_session(f"Frage {i}")
+        logger.log_attempt(generated_sql=f"SELECT {i}", execution_success=True, sql_result=str(i))
+        logger.log_span({"node": "run_sql", "seconds": 0.1})
+        logger.log_final_answer(f"Antwort {i}")
+        logger.end_session()
+
+
+def _csv_questions(path):
+    with open(path, encoding="utf-8") as f:
+        return [row["user_question"] for row in csv.DictReader(f)]
+
+
+def _jsonl_questions(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["user_question"] for line in f]
+
+
+def test_spilled_sessions_reach_every_sink(make_logger, tmp_path):
+    logger = make_logger(max_buffered_sessions=3)
+    _run_sessions(logger, 5)
+    logger.to_csv(append=True)
+    logger.to_json(append=True)
+
+    expected = [f"Frage {i}" for i in range(5)]
+    output = tmp_path / "output"
+    assert _csv_questions(output / "eval_log_test.csv") == expected
+    assert _csv_questions(output / "eval_spans_test.csv") == expected
+    assert _jsonl_questions(output / "eval_log_test.jsonl") == expected
+    assert len(logger.logs) == 3
+
+
+def test_spill_covers_custom_append_sinks(make_logger, tmp_path):
+    logger = make_logger(max_buffered_sessions=2)
+    _run_sessions(logger, 1)
+    logger.to_json("custom.jsonl", append=True)
+    _run_sessions(logger, 4, offset=1)
+    logger.to_json("custom.jsonl", append=True)
+
+    assert _jsonl_questions(tmp_path / "output" / "custom.jsonl") == [f"Frage {i}" for i in range(5)]
+
+
+def test_append_writes_only_new_sessions(make_logger, tmp_path):
+    logger = make_logger()
+    _run_sessions(logger, 2)
+    logger.to_csv(append=True)
+    _run_sessions(logger, 1, offset=2)
+    logger.to_csv(append=True)
+    logger.to_csv(append=True)
+
+    assert _csv_questions(tmp_path / "output" / "eval_log_test.csv") == ["Frage 0", "Frage 1", "Frage 2"]
+
+
+def test_stream_to_writes_on_session_end(make_logger, tmp_path):
+    logger = make_logger()
+    logger.stream_to("json")
+    _run_sessions(logger, 2)
+    logger.flush()
+
+    assert _jsonl_questions(tmp_path / "output" / "eval_log_test.jsonl") == ["Frage 0", "Frage 1"]
+
+
+def test_session_ids_are_unique(make_logger):
+    logger = make_logger()
+    _run_sessions(logger, 20)
+    logger._drain()
+
+    assert len({session["session_id"] for session in logger.logs}) == 20
@@ -0,0 +1,20 @@
+from core.retrieval import gold_tables_from_sql
+
+TABLES = ["rep_ga4_sessions", "rep_ga4_sessions_daily", "rep_orders"]
+
+
+def test_longer_base_name_is_not_counted_twice():
+    sql = "SELECT SUM(sessions) FROM `bachelor_mlh.rep_ga4_sessions_daily_eltern`"
+    assert gold_tables_from_sql(sql, TABLES) == ["rep_ga4_sessions_daily"]
+
+
+def test_full_and_wildcard_names():
+    sql = ("SELECT * FROM `projekt.bachelor_mlh.rep_ga4_sessions_eltern` s "
+           "JOIN `bachelor_mlh.rep_orders_*_v2` o USING (date)")
+    assert gold_tables_from_sql(sql, TABLES) == ["rep_ga4_sessions", "rep_orders"]
+
+
+def test_only_whole_table_names_match():
+    assert gold_tables_from_sql("SELECT * FROM `xbachelor_mlh.rep_orders_eltern`", TABLES) == []
+    assert gold_tables_from_sql("SELECT * FROM `bachelor_mlh.rep_orders`", TABLES) == []
+    assert gold_tables_from_sql("", TABLES) == []
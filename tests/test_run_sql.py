@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+import core.sql_cache
+from core.backends import ExecutionBackend, get_backend, set_backend
+from core.nodes.run_sql import execute_sql
+from core.sql_cache import configure_sql_cache, get_sql_cache
+
+
+class FlakyBackend(ExecutionBackend):
+    """Schlägt beim ersten Aufruf fehl, danach liefert es eine Zeile."""
+
+    name = "flaky"
+
+    def __init__(self):
+        self.calls = 0
+
+    def execute(self, sql, max_rows):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("quotaExceeded")
+        return pd.DataFrame({"users": [3]}), 1, 10
+
+    def dry_run(self, sql):
+        return 0
+
+
+@pytest.fixture
+def flaky_backend():
+    previous_backend, previous_cache = get_backend(), get_sql_cache()
+    backend = FlakyBackend()
+    set_backend(backend)
+    configure_sql_cache()
+    yield backend
+    set_backend(previous_backend)
+    core.sql_cache._sql_cache = previous_cache
+
+
+def test_failed_execution_is_not_cached(flaky_backend):
+    first = execute_sql("SELECT 1")
+    assert first["error_type"] == "execution_error"
+
+    second = execute_sql("SELECT 1")
+    assert not second["is_error"]
+    assert flaky_backend.calls == 2
+
+
+def test_successful_execution_is_cached(flaky_backend):
+    execute_sql("SELECT 1")
+    execute_sql("SELECT 1")
+    execute_sql("select 1;")
+    assert flaky_backend.calls == 2
+    assert get_sql_cache().stats()["hits"] == 1
+
+
+def test_render_result_formats_dates_and_nulls():
+    from core.nodes.run_sql import render_result
+
+    frame = pd.DataFrame({"date": pd.to_datetime(["2024-01-01", None]), "users": pd.array([3, None], dtype="Int64")})
+    assert render_result(frame) == "date, users\n2024-01-01, 3\nNone, None"
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import core.agent_A.runner as runner_a
+import core.agent_E.runner as runner_e
+from core.logger import EvalLogger
+
+
+@pytest.fixture
+def logger(tmp_path):
+    previous = EvalLogger._instance
+    EvalLogger._instance = None
+    yield EvalLogger(agent_id="test", log_dir=str(tmp_path))
+    EvalLogger._instance = previous
+
+
+def _fake_iter_questions(agent, questions, llm, agent_id, max_workers=1):
+    eval_logger = EvalLogger()
+    for i, question in enumerate(questions):
+        eval_logger.start_session(question)
+        eval_logger.log_final_answer(f"Antwort {i}")
+        eval_logger.end_session()
+        yield {"index": i, "question": question, "answer": f"Antwort {i}"}
+
+
+def _fake_stream_question(agent, question, llm, agent_id, eval_logger):
+    eval_logger.start_session(question)
+    try:
+        yield "Ant"
+        yield "wort"
+    finally:
+        eval_logger.end_session()
+
+
+def _logged_questions(tmp_path):
+    with open(tmp_path / "output" / "eval_log_test.jsonl", encoding="utf-8") as f:
+        return [json.loads(line)["user_question"] for line in f]
+
+
+@pytest.mark.parametrize("runner", [runner_a, runner_e])
+def test_iter_batch_questions_writes_logs_on_early_break(runner, logger, tmp_path, monkeypatch):
+    monkeypatch.setattr(runner, "get_agent", lambda *args, **kwargs: None)
+    monkeypatch.setattr(runner, "iter_questions", _fake_iter_questions)
+    monkeypatch.setattr(runner, "get_default_llm", lambda: None)
+
+    results = runner.iter_batch_questions(["a", "b", "c"], agent_id="test")
+    for result in results:
+        if result["index"] == 1:
+            break
+    results.close()
+
+    assert _logged_questions(tmp_path) == ["a", "b"]
+    assert (tmp_path / "output" / "eval_log_test.csv").exists()
+
+
+@pytest.mark.parametrize("runner", [runner_a, runner_e])
+def test_stream_answer_writes_logs(runner, logger, tmp_path, monkeypatch):
+    monkeypatch.setattr(runner, "get_agent", lambda *args, **kwargs: None)
+    monkeypatch.setattr(runner, "stream_question", _fake_stream_question)
+    monkeypatch.setattr(runner, "get_default_llm", lambda: None)
+
+    assert "".join(runner.stream_answer("Wie viele Nutzer?", agent_id="test")) == "Antwort"
+    assert _logged_questions(tmp_path) == ["Wie viele Nutzer?"]
+
+
+def test_stream_answer_without_append_logs(logger, tmp_path, monkeypatch):
+    monkeypatch.setattr(runner_a, "get_agent", lambda *args, **kwargs: None)
+    monkeypatch.setattr(runner_a, "stream_question", _fake_stream_question)
+    monkeypatch.setattr(runner_a, "get_default_llm", lambda: None)
+
+    list(runner_a.stream_answer("Frage", append_logs=False, agent_id="test"))
+    assert not (tmp_path / "output" / "eval_log_test.jsonl").exists()
@@ -0,0 +1,118 @@
+from core.sql_validator import validate_sql
+
+ALLOWED = {
+    "bachelor_mlh.rep_ga4_users_daily_eltern": "rep_ga4_users_daily",
+    "bachelor_mlh.rep_ga4_users_daily_*": "rep_ga4_users_daily",
+}
+COLUMNS = {"rep_ga4_users_daily": ["date", "product", "users", "sessions"]}
+
+
+def assert_valid(sql):
+    result = validate_sql(sql, ALLOWED, COLUMNS)
+    assert result["valid"], result["message"]
+
+
+def test_cte():
+    assert_valid("""
+        WITH daily AS (
+            SELECT date, SUM(users) AS total_users
+            FROM `bachelor_mlh.rep_ga4_users_daily_eltern`
+            GROUP BY date
+        )
+        SELECT date, total_users FROM daily ORDER BY date
+    """)
+
+
+def test_window_function_with_qualify():
+    assert_valid("""
+        SELECT date, product, users
+        FROM bachelor_mlh.rep_ga4_users_daily_eltern
+        WHERE TRUE
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY product ORDER BY users DESC) = 1
+    """)
+
+
+def test_table_suffix():
+    assert_valid("""
+        SELECT _TABLE_SUFFIX AS brand, SUM(users) AS users
+        FROM `bachelor_mlh.rep_ga4_users_daily_*`
+        WHERE _TABLE_SUFFIX IN ('eltern', 'geo')
+        GROUP BY brand
+    """)
+
+
+def test_extract_from():
+    assert_valid("""
+        SELECT EXTRACT(MONTH FROM date) AS month, SUM(sessions) AS sessions
+        FROM bachelor_mlh.rep_ga4_users_daily_eltern
+        GROUP BY month
+    """)
+
+
+def test_current_date_without_parentheses():
+    assert_valid("""
+        SELECT SUM(users) FROM bachelor_mlh.rep_ga4_users_daily_eltern
+        WHERE date BETWEEN DATE_SUB(CURRENT_DATE, INTERVAL 7 DAY) AND CURRENT_DATE - 1
+    """)
+    assert_valid("SELECT CURRENT_TIMESTAMP AS now, users FROM bachelor_mlh.rep_ga4_users_daily_eltern")
+
+
+def test_unknown_column_is_reported():
+    result = validate_sql("SELECT revenue FROM bachelor_mlh.rep_ga4_users_daily_eltern", ALLOWED, COLUMNS)
+    assert not result["valid"]
+    assert result["error_type"] == "unknown_column"
+    assert result["unknown_columns"] == ["revenue"]
+
+
+def test_unknown_table_is_reported():
+    result = validate_sql("SELECT users FROM bachelor_mlh.other_table", ALLOWED, COLUMNS)
+    assert result["error_type"] == "unknown_table"
+
+
+def test_unnest_fails_open():
+    assert_valid("""
+        SELECT date, item
+        FROM bachelor_mlh.rep_ga4_users_daily_eltern, UNNEST(['a', 'b']) AS item
+        WHERE some_struct_field IS NOT NULL
+    """)
+
+
+def test_raw_and_byte_strings():
+    assert_valid("""
+        SELECT date, users
+        FROM bachelor_mlh.rep_ga4_users_daily_eltern
+        WHERE REGEXP_CONTAINS(product, r'^elt') AND NOT REGEXP_CONTAINS(product, R"test$")
+          AND product != b'x' AND product != rb'\\d' AND product != BR'y'
+    """)
+
+
+def test_grouping_sets_rollup_cube():
+    assert_valid("""
+        SELECT date, product, SUM(users) AS users
+        FROM bachelor_mlh.rep_ga4_users_daily_eltern
+        GROUP BY GROUPING SETS ((date, product), (date))
+    """)
+    assert_valid("SELECT date, product, SUM(users) FROM bachelor_mlh.rep_ga4_users_daily_eltern GROUP BY ROLLUP (date, product)")
+    assert_valid("SELECT date, product, SUM(users) FROM bachelor_mlh.rep_ga4_users_daily_eltern GROUP BY CUBE (date, product)")
+
+
+def test_pivot():
+    assert_valid("""
+        SELECT * FROM (SELECT date, product, users FROM bachelor_mlh.rep_ga4_users_daily_eltern)
+        PIVOT (SUM(users) FOR product IN ('eltern' AS eltern_users))
+    """)
+
+
+def test_exponent_numbers():
+    assert_valid("""
+        SELECT date, users * 1e3 AS users_k, sessions / 2.5E-4 AS ratio
+        FROM bachelor_mlh.rep_ga4_users_daily_eltern
+        WHERE users > 0x10
+    """)
+
+
+def test_unknown_column_next_to_raw_string_is_reported():
+    result = validate_sql(
+        "SELECT userz FROM bachelor_mlh.rep_ga4_users_daily_eltern WHERE REGEXP_CONTAINS(product, r'^elt')",
+        ALLOWED, COLUMNS)
+    assert result["unknown_columns"] == ["userz"]
@@ -0,0 +1,25 @@
+from datetime import date
+from decimal import Decimal
+
+import pandas as pd
+
+from core.nodes.summarize_result import summarize_frame
+
+
+def test_decimal_columns_are_numeric():
+    frame = pd.DataFrame({"revenue": [Decimal("1.5"), Decimal("2.25"), None], "product": ["a", "b", "a"]})
+    summary = summarize_frame(frame)
+    assert "- revenue (Zahl, 1 leer): min 1.5, max 2.25, Summe 3.75" in summary
+    assert "- product (Text, 2 verschiedene)" in summary
+
+
+def test_date_columns_report_coverage():
+    frame = pd.DataFrame({"date": [date(2024, 1, 1), date(2024, 1, 3)], "users": [1, 2]})
+    summary = summarize_frame(frame)
+    assert "- date (Datum): 2024-01-01 bis 2024-01-03, 2 von 3 Tagen vorhanden" in summary
+    assert "- users (Zahl): min 1, max 2, Summe 3" in summary
+
+
+def test_total_rows_beyond_fetched_rows():
+    summary = summarize_frame(pd.DataFrame({"users": [1, 2]}), total_rows=5000)
+    assert summary.startswith("Zeilen: 5000\n(Kennzahlen über die ersten 2 abgeholten Zeilen)")